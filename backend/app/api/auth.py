@@ -3,9 +3,15 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr
 from app.models.user import UserCreate, UserDB, Token
 from app.models.service_code import ServiceCode
-from app.core.security import get_password_hash, verify_password, create_access_token, create_refresh_token
+from app.core.security import (
+    get_password_hash_async, verify_password_async, create_access_token, create_refresh_token, HasherBusyError,
+)
 from app.core.database import db
-from app.services.cache import cache_service
+from app.core.config import settings
+from app.services.cache import InMemoryCache, shared_cache
+from app.services.user_directory import user_search_terms
+from jose import jwt, JWTError
+from pymongo.errors import DuplicateKeyError
 import uuid
 from datetime import datetime, timezone
 
@@ -34,6 +40,14 @@ class RegisterRequest(BaseModel):
     service_code: str
 
 
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy. Please try again in a moment.",
+        headers={"Retry-After": "1"},
+    )
+
+
 # ─── OTP Endpoints ────────────────────────────────────────────────────────────
 
 @router.post("/otp/send")
@@ -42,7 +56,7 @@ async def send_otp(req: OtpSendRequest):
     Send an OTP to the given email.
     Currently mocked — the OTP is always 123456.
     """
-    cache_service.set(f"otp_{req.email}", MOCK_OTP, ttl=OTP_TTL)
+    await shared_cache.set(f"otp_{req.email}", MOCK_OTP, ttl=OTP_TTL)
     # TODO: replace with real email sending (e.g. SendGrid / SMTP)
     return {"message": "OTP sent to your email address."}
 
@@ -50,14 +64,14 @@ async def send_otp(req: OtpSendRequest):
 @router.post("/otp/verify")
 async def verify_otp(req: OtpVerifyRequest):
     """Verify the OTP for an email. Marks email as verified in cache."""
-    stored = cache_service.get(f"otp_{req.email}")
+    stored = await shared_cache.get(f"otp_{req.email}", bypass_local=True)
     if stored is None:
         raise HTTPException(status_code=400, detail="OTP expired or not requested. Please request a new OTP.")
     if stored != req.otp:
         raise HTTPException(status_code=400, detail="Invalid OTP.")
     # Mark email as OTP-verified so the register endpoint can proceed
-    cache_service.set(f"otp_verified_{req.email}", True, ttl=OTP_VERIFIED_TTL)
-    cache_service.delete(f"otp_{req.email}")  # consume the OTP
+    await shared_cache.set(f"otp_verified_{req.email}", True, ttl=OTP_VERIFIED_TTL)
+    await shared_cache.delete(f"otp_{req.email}")  # consume the OTP
     return {"verified": True}
 
 
@@ -66,7 +80,7 @@ async def verify_otp(req: OtpVerifyRequest):
 @router.post("/register", response_model=UserDB)
 async def register(req: RegisterRequest):
     # 1. Check email OTP was verified
-    if not cache_service.get(f"otp_verified_{req.email}"):
+    if not await shared_cache.get(f"otp_verified_{req.email}", bypass_local=True):
         raise HTTPException(
             status_code=400,
             detail="Email not verified. Please verify via OTP before registering."
@@ -86,7 +100,10 @@ async def register(req: RegisterRequest):
         raise HTTPException(status_code=400, detail="Invalid or already used service code.")
 
     # 5. Create user
-    hashed_password = get_password_hash(req.password)
+    try:
+        hashed_password = await get_password_hash_async(req.password)
+    except HasherBusyError:
+        raise _hasher_busy()
     user_id = str(uuid.uuid4())
     user_db = UserDB(
         id=user_id,
@@ -95,7 +112,16 @@ async def register(req: RegisterRequest):
         full_name=req.full_name,
         hashed_password=hashed_password,
     )
-    await db.db["users"].insert_one(user_db.dict())
+    try:
+        await db.db["users"].insert_one({
+            **user_db.dict(),
+            "search_terms": user_search_terms(user_db.username, user_db.email, user_db.full_name),
+        })
+    except DuplicateKeyError as e:
+        # A concurrent registration won the race past the checks above
+        taken = (e.details or {}).get("keyPattern", {})
+        detail = "Email already registered." if "email" in taken else "Username already taken."
+        raise HTTPException(status_code=400, detail=detail)
 
     # 6. Mark service code as used
     await db.db["service_codes"].update_one(
@@ -104,7 +130,7 @@ async def register(req: RegisterRequest):
     )
 
     # 7. Consume OTP verification
-    cache_service.delete(f"otp_verified_{req.email}")
+    await shared_cache.delete(f"otp_verified_{req.email}")
 
     return user_db
 
@@ -120,7 +146,11 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     if not user_dict:
         raise HTTPException(status_code=400, detail="Incorrect email/username or password.")
 
-    if not verify_password(form_data.password, user_dict["hashed_password"]):
+    try:
+        password_ok = await verify_password_async(form_data.password, user_dict["hashed_password"])
+    except HasherBusyError:
+        raise _hasher_busy()
+    if not password_ok:
         raise HTTPException(status_code=400, detail="Incorrect email/username or password.")
 
     access_token = create_access_token(data={"sub": user_dict["id"]})
@@ -130,9 +160,33 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 
 # ─── Auth Dependency ──────────────────────────────────────────────────────────
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    from jose import jwt, JWTError
-    from app.core.config import settings
+class TokenPrincipal(BaseModel):
+    """The caller as proven by the JWT alone, without loading the user document."""
+    id: str
+
+
+# Short-lived per-worker cache of validated UserDB objects, keyed by user id.
+# Writes on this worker invalidate immediately; other workers catch up within the TTL.
+principal_cache = InMemoryCache(maxsize=10000, ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+def invalidate_principal(*user_ids: str) -> None:
+    """Drop cached principals after a write to their user documents."""
+    for user_id in user_ids:
+        principal_cache.delete(user_id)
+
+
+def remember_principal(user: UserDB) -> None:
+    """Replace a cached principal with the state a write just returned."""
+    principal_cache.set(user.id, user)
+
+
+def principal_cache_stats() -> dict:
+    info = principal_cache.info
+    return {**info, "db_round_trips_saved": info["hits"]}
+
+
+def _token_subject(token: str) -> str:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -145,8 +199,27 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    return user_id
+
+
+async def get_token_principal(token: str = Depends(oauth2_scheme)) -> TokenPrincipal:
+    """Auth for read-only endpoints that only need the caller's id: no DB hit at all."""
+    return TokenPrincipal(id=_token_subject(token))
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserDB:
+    user_id = _token_subject(token)
+    cached = principal_cache.get(user_id)
+    if cached is not None:
+        return cached
 
     user = await db.db["users"].find_one({"id": user_id})
     if user is None:
-        raise credentials_exception
-    return UserDB(**user)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user_db = UserDB(**user)
+    principal_cache.set(user_id, user_db)
+    return user_db
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List
-from app.models.user import UserDB
-from app.api.auth import get_current_user
+from app.models.user import UserDB, UserProfileSettings
+from app.api.auth import get_current_user, get_token_principal, invalidate_principal, TokenPrincipal
 from app.core.database import db
+from app.services import user_directory
+from app.services.user_directory import CREW_MEMBER_PROJECTION, UserLoader, get_user_loader
 from pydantic import BaseModel
 from datetime import datetime
 import uuid
@@ -22,24 +24,13 @@ class SearchResult(BaseModel):
     email: str
 
 @router.get("/search", response_model=List[SearchResult])
-async def search_users(query: str, current_user: UserDB = Depends(get_current_user)):
-    # Search by email or username, exclude self
-    cursor = db.db["users"].find({
-        "$and": [
-            {"id": {"$ne": current_user.id}},
-            {"$or": [
-                {"email": {"$regex": query, "$options": "i"}},
-                {"username": {"$regex": query, "$options": "i"}}
-            ]}
-        ]
-    }).limit(20)
-    
-    users = await cursor.to_list(length=20)
-    return [SearchResult(**u) for u in users]
+async def search_users(query: str, current_user: TokenPrincipal = Depends(get_token_principal)):
+    # Prefix search on username, email or name (indexed, input escaped), exclude self
+    return await user_directory.search_users(query, exclude_id=current_user.id)
 
 @router.post("/requests/{user_id}")
 async def send_crew_request(user_id: str, current_user: UserDB = Depends(get_current_user)):
-    receiver = await db.db["users"].find_one({"id": user_id})
+    receiver = await db.db["users"].find_one({"id": user_id}, {"id": 1})
     if not receiver:
         raise HTTPException(status_code=404, detail="User not found")
         
@@ -63,21 +54,23 @@ async def send_crew_request(user_id: str, current_user: UserDB = Depends(get_cur
     return {"message": "Request sent"}
 
 @router.get("/requests/pending")
-async def get_pending_requests(current_user: UserDB = Depends(get_current_user)):
+async def get_pending_requests(
+    current_user: TokenPrincipal = Depends(get_token_principal),
+    users: UserLoader = Depends(get_user_loader),
+):
     cursor = db.db["crew_requests"].find({
         "receiver_id": current_user.id,
         "status": "pending"
     })
     requests = await cursor.to_list(length=100)
 
-    # Enrich each request with sender's display info
-    enriched = []
+    # Enrich each request with sender's display info (one batched lookup for all senders)
+    senders = await users.load_many(req["sender_id"] for req in requests)
     for req in requests:
-        sender = await db.db["users"].find_one({"id": req["sender_id"]})
+        sender = senders.get(req["sender_id"])
         req["sender_email"] = sender["email"] if sender else req["sender_id"]
         req["sender_full_name"] = sender.get("full_name") if sender else None
-        enriched.append(req)
-    return enriched
+    return requests
 
 @router.post("/requests/{request_id}/accept")
 async def accept_request(request_id: str, current_user: UserDB = Depends(get_current_user)):
@@ -100,49 +93,20 @@ async def accept_request(request_id: str, current_user: UserDB = Depends(get_cur
         {"id": req["sender_id"]},
         {"$addToSet": {"crew_ids": current_user.id}}
     )
+    invalidate_principal(current_user.id, req["sender_id"])
     
     return {"message": "Request accepted"}
 
 @router.get("/")
 async def get_my_crew(current_user: UserDB = Depends(get_current_user)):
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    crew_ids = current_user.crew_ids or []
-    # Ensure current user is included
-    member_ids = list(set([str(cid) for cid in crew_ids] + [str(current_user.id)]))
-    
-    logger.info(f"get_my_crew: ID search list: {member_ids}")
-    
-    cursor = db.db["users"].find({"id": {"$in": member_ids}})
-    db_members = await cursor.to_list(length=100)
-    
-    logger.info(f"get_my_crew: Found {len(db_members)} members in DB")
-    
-    # We want to return a list of UserDB-compatible dicts
-    result = []
-    found_me = False
-    
-    for member in db_members:
-        try:
-            user_obj = UserDB(**member)
-            d = user_obj.dict(exclude={"hashed_password"})
-            is_me = (user_obj.id == current_user.id)
-            d["is_me"] = is_me
-            if is_me:
-                found_me = True
-            
-            v_count = len(user_obj.profile_settings.vehicles)
-            logger.info(f"User {user_obj.username} (id={user_obj.id}, is_me={is_me}) has {v_count} vehicles")
-            result.append(d)
-        except Exception as e:
-            logger.error(f"Error parsing user {member.get('username')}: {e}")
+    """The caller (`is_me`) followed by their crew, with display info and vehicles."""
+    member_ids = [current_user.id] + [str(cid) for cid in current_user.crew_ids or []]
+    members = await UserLoader(CREW_MEMBER_PROJECTION).load_many(member_ids)
+    # The caller always exists; use the session copy if the read raced an account change
+    me = members.pop(current_user.id, None) or current_user.dict(include=set(CREW_MEMBER_PROJECTION))
 
-    # Fallback: if current_user wasn't found in DB (unlikely but safe)
-    if not found_me:
-        logger.warning(f"Current user {current_user.id} not found in DB cursor! Adding from session.")
-        d = current_user.dict(exclude={"hashed_password"})
-        d["is_me"] = True
-        result.insert(0, d)
-        
-    return result
+    default_settings = UserProfileSettings().dict()
+    return [
+        {"profile_settings": default_settings, **member, "is_me": i == 0}
+        for i, member in enumerate([me, *members.values()])
+    ]
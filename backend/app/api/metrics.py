@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends
+from app.api.auth import get_token_principal, principal_cache_stats, TokenPrincipal
+from app.core.security import hash_pool
+from app.services.autocomplete_index import autocomplete_index
+from app.services.chat_store import chat_writer
+from app.services.cache import shared_cache
+from app.services.geomaps import geomaps_client
+from app.services.persistent_cache import persistent_cache
+from app.services.track_recorder import track_recorder
+from app.services.trip_planner import TripPlannerService
+from app.services import trip_search, user_directory
+from app.websockets.chat import locations as ws_locations, manager as ws_manager
+
+router = APIRouter()
+
+@router.get("/")
+async def get_metrics(current_user: TokenPrincipal = Depends(get_token_principal)):
+    """Per-worker runtime statistics for caches and upstream clients."""
+    return {
+        "cache": shared_cache.info,
+        "password_hashing": hash_pool.info,
+        "principal_cache": principal_cache_stats(),
+        "persistent_cache": persistent_cache.info,
+        "geomaps": geomaps_client.stats,
+        "route_cache": TripPlannerService.route_cache_stats(),
+        "single_flight": TripPlannerService.single_flight_stats(),
+        "autocomplete_index": autocomplete_index.info,
+        "user_search_cache": user_directory.search_cache_stats(),
+        "feed_search_cache": trip_search.search_cache_stats(),
+        "websockets": ws_manager.stats,
+        "live_locations": ws_locations.stats,
+        "chat_writer": chat_writer.info,
+        "track_recorder": track_recorder.info,
+    }
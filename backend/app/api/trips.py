@@ -1,16 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Dict, Any
-from app.models.trip import TripDB, TripCreate, Location, Expense
+from app.models.trip import TripDB, TripCreate, TripSummary, TripComment, TRIP_SUMMARY_PROJECTION, Location, Expense
 from app.models.user import UserDB
-from app.api.auth import get_current_user
+from app.api.auth import get_current_user, get_token_principal, TokenPrincipal
 from app.core.database import db
+from app.core.pagination import fetch_page, DEFAULT_PAGE_SIZE, NEXT_CURSOR_HEADER
 from app.services.trip_planner import TripPlannerService
+from app.services.autocomplete_index import autocomplete_index
+from app.services.trip_search import search_completed_trips, trip_search_terms
+from app.services.trip_index import trip_index, CATEGORIES
+from app.services.track_recorder import track_recorder, decode_chunk
+from app.services.trip_access import TripAccess, get_trip_access, access_filter, VIEW, MEMBER, ORGANIZER
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+import asyncio
+import json
 import uuid
 from datetime import datetime
 from pydantic import BaseModel
 
 router = APIRouter()
 
+# Comments and expenses live in their own collections, keyed by trip_id
+TRIP_ACTIVITY_FIELDS = {"expenses", "comments"}
+TRIP_DETAIL_PROJECTION = {field: 0 for field in TRIP_ACTIVITY_FIELDS | {"search_terms"}}
+TRIP_DETAIL_ACTIVITY_LIMIT = 50  # most recent comments/expenses embedded in GET /{trip_id}
+
 # ─── SPECIFIC / LITERAL ROUTES (must come before wildcard /{trip_id}) ───────
 
 @router.post("/", response_model=TripDB)
@@ -21,69 +37,83 @@ async def create_trip(trip: TripCreate, current_user: UserDB = Depends(get_curre
         organizer_id=current_user.id,
         status="planned"
     )
-    await db.db["trips"].insert_one(trip_db.dict())
+    trip_doc = trip_db.dict(exclude=TRIP_ACTIVITY_FIELDS)
+    await db.db["trips"].insert_one({**trip_doc, "search_terms": trip_search_terms(trip_doc)})
+    await trip_index.sync_trip(trip_db.dict())
+    autocomplete_index.add_places([trip_db.source.dict(), trip_db.destination.dict(), *(stop.dict() for stop in trip_db.stops)])
     return trip_db
 
 @router.get("/user/categories")
-async def get_user_trips(current_user: UserDB = Depends(get_current_user)):
+async def get_user_trips(limit: int = DEFAULT_PAGE_SIZE, current_user: TokenPrincipal = Depends(get_token_principal)):
     """
-    Returns trips in categories:
+    Returns the first page of trip summaries in each category:
     - planned_by_me
     - completed_by_me
     - participant_active
     - participant_completed
+
+    `next_cursors[category]` continues that category via /user/categories/{category};
+    `counts[category]` is the category's total size.
     """
-    all_trips_cursor = db.db["trips"].find({
-        "$or": [
-            {"organizer_id": current_user.id},
-            {"participants.user_id": current_user.id}
-        ]
-    }).sort("created_at", -1)
-    
-    trips = await all_trips_cursor.to_list(length=100)
-    
-    categorized = {
-        "planned_by_me": [],
-        "completed_by_me": [],
-        "participant_active": [],
-        "participant_completed": []
+    pages, counts = await asyncio.gather(
+        asyncio.gather(*(
+            trip_index.list_category(current_user.id, category, limit=limit) for category in CATEGORIES
+        )),
+        trip_index.counts(current_user.id),
+    )
+    categorized: Dict[str, Any] = {
+        category: [TripSummary(**t) for t in docs]
+        for category, (docs, _) in zip(CATEGORIES, pages)
     }
-    
-    for t in trips:
-        trip = TripDB(**t)
-        if trip.organizer_id == current_user.id:
-            if trip.status == "completed":
-                categorized["completed_by_me"].append(trip)
-            else:
-                categorized["planned_by_me"].append(trip)
-        else:
-            if trip.status == "completed":
-                categorized["participant_completed"].append(trip)
-            else:
-                categorized["participant_active"].append(trip)
-                
+    categorized["next_cursors"] = {
+        category: next_cursor for category, (_, next_cursor) in zip(CATEGORIES, pages)
+    }
+    categorized["counts"] = counts
     return categorized
 
-@router.get("/feed/completed", response_model=List[TripDB])
-async def get_completed_trips_feed(search: Optional[str] = None, current_user: UserDB = Depends(get_current_user)):
-    """Home feed showing completed trips of others"""
-    query: Dict[str, Any] = {"status": "completed"}
-    
+@router.get("/user/categories/{category}", response_model=List[TripSummary])
+async def get_user_trips_page(
+    category: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    current_user: TokenPrincipal = Depends(get_token_principal),
+):
+    """One page of a single category. The next page's token is in the X-Next-Cursor header."""
+    if category not in CATEGORIES:
+        raise HTTPException(status_code=404, detail="Unknown trip category")
+    docs, next_cursor = await trip_index.list_category(current_user.id, category, cursor=cursor, limit=limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [TripSummary(**t) for t in docs]
+
+@router.get("/feed/completed", response_model=List[TripSummary])
+async def get_completed_trips_feed(
+    response: Response,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    current_user: TokenPrincipal = Depends(get_token_principal),
+):
+    """
+    Home feed showing completed trips of others, newest first. With `search`, trips
+    are ranked by text relevance and recency instead. The next page's token is in
+    the X-Next-Cursor header.
+    """
     if search:
-        search_regex = {"$regex": search, "$options": "i"}
-        query["$or"] = [
-            {"title": search_regex},
-            {"destination.name": search_regex}
-        ]
-        
-    cursor = db.db["trips"].find(query).sort("updated_at", -1).limit(50)
-    
-    trips = await cursor.to_list(length=50)
-    return [TripDB(**t) for t in trips]
+        docs, next_cursor = await search_completed_trips(search, cursor=cursor, limit=limit)
+    else:
+        docs, next_cursor = await fetch_page(
+            db.db["trips"], {"status": "completed"}, cursor=cursor, limit=limit,
+            projection=TRIP_SUMMARY_PROJECTION,
+        )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [TripSummary(**t) for t in docs]
 
 @router.get("/autocomplete")
-async def autocomplete_location(query: str, current_user: UserDB = Depends(get_current_user)):
-    return TripPlannerService.get_autocomplete(query)
+async def autocomplete_location(query: str, current_user: TokenPrincipal = Depends(get_token_principal)):
+    return await TripPlannerService.get_autocomplete(query)
 
 class VehicleForPlan(BaseModel):
     id: str
@@ -107,7 +137,7 @@ async def generate_trip_plan(req: PlanRequest, current_user: UserDB = Depends(ge
         candidate_days_dists = [v.avg_distance_per_day for v in current_user.profile_settings.vehicles]
     avg_daily = max(candidate_days_dists) if candidate_days_dists else 500.0
 
-    plan = TripPlannerService.calculate_trip_itinerary(
+    plan = await TripPlannerService.calculate_trip_itinerary(
         source=req.source,
         destination=req.destination,
         stops=req.stops,
@@ -147,75 +177,147 @@ async def generate_trip_plan(req: PlanRequest, current_user: UserDB = Depends(ge
 
 # ─── WILDCARD ROUTES (must come AFTER all literal routes) ────────────────────
 
+async def _recent_activity(collection: str, trip_id: str, sort_field: str) -> List[dict]:
+    """Latest page of a trip's comments/expenses, oldest first (the order they were appended in)."""
+    docs, _ = await fetch_page(
+        db.db[collection], {"trip_id": trip_id}, limit=TRIP_DETAIL_ACTIVITY_LIMIT, sort_field=sort_field
+    )
+    return docs[::-1]
+
+async def _insert_activity(collection: str, document: dict, undo_inc: dict) -> None:
+    """Insert a comment/expense whose trip counters were already bumped; undo the bump if the insert fails."""
+    try:
+        await db.db[collection].insert_one(document)
+    except PyMongoError:
+        await db.db["trips"].update_one({"id": document["trip_id"]}, {"$inc": undo_inc})
+        raise
+
 @router.get("/{trip_id}", response_model=TripDB)
-async def get_trip(trip_id: str, current_user: UserDB = Depends(get_current_user)):
-    trip_data = await db.db["trips"].find_one({"id": trip_id})
-    if not trip_data:
-        raise HTTPException(status_code=404, detail="Trip not found")
-        
+async def get_trip(
+    trip_id: str,
+    current_user: TokenPrincipal = Depends(get_token_principal),
+    access: TripAccess = Depends(get_trip_access),
+):
+    # One read serves both the permission check and the response
+    trip_data = await db.db["trips"].find_one({"id": trip_id}, TRIP_DETAIL_PROJECTION)
+    access.remember(trip_id, trip_data)
     # Anyone can view completed trips, otherwise only participants
-    if trip_data["status"] != "completed":
-        participant_ids = [p["user_id"] for p in trip_data.get("participants", [])]
-        if current_user.id != trip_data["organizer_id"] and current_user.id not in participant_ids:
-            raise HTTPException(status_code=403, detail="Not authorized to view this active trip")
-            
+    await access.require(trip_id, current_user.id, VIEW)
+
+    trip_data["expenses"], trip_data["comments"] = await asyncio.gather(
+        _recent_activity("trip_expenses", trip_id, "date"),
+        _recent_activity("trip_comments", trip_id, "timestamp"),
+    )
     return TripDB(**trip_data)
 
-@router.put("/{trip_id}/status")
-async def update_trip_status(trip_id: str, status: str, current_user: UserDB = Depends(get_current_user)):
+@router.put("/{trip_id}/status", response_model=TripDB)
+async def update_trip_status(
+    trip_id: str,
+    status: str,
+    current_user: UserDB = Depends(get_current_user),
+    access: TripAccess = Depends(get_trip_access),
+):
     if status not in ["planned", "in_progress", "completed"]:
         raise HTTPException(status_code=400, detail="Invalid status")
-        
-    trip_data = await db.db["trips"].find_one({"id": trip_id})
-    if not trip_data:
-        raise HTTPException(status_code=404, detail="Trip not found")
-        
-    if trip_data["organizer_id"] != current_user.id:
-        raise HTTPException(status_code=403, detail="Only organizer can change status")
-        
-    await db.db["trips"].update_one(
-        {"id": trip_id},
-        {"$set": {"status": status, "updated_at": datetime.utcnow()}}
+
+    # Organizer check is part of the filter, so the write and the read-back are one atomic round trip
+    updated_trip = await db.db["trips"].find_one_and_update(
+        access_filter(trip_id, current_user.id, ORGANIZER),
+        {"$set": {"status": status, "updated_at": datetime.utcnow()}},
+        TRIP_DETAIL_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
+    if not updated_trip:
+        # Only failures pay for a second read, to tell 404 from 403
+        await access.deny(trip_id, current_user.id, ORGANIZER, "Only organizer can change status")
+    # Same body as GET /{trip_id}: the projection left out the activity, so attach the latest page
+    _, updated_trip["expenses"], updated_trip["comments"] = await asyncio.gather(
+        trip_index.sync_trip(updated_trip),
+        _recent_activity("trip_expenses", trip_id, "date"),
+        _recent_activity("trip_comments", trip_id, "timestamp"),
     )
-    
-    updated_trip = await db.db["trips"].find_one({"id": trip_id})
     return TripDB(**updated_trip)
 
+@router.get("/{trip_id}/expenses", response_model=List[Expense])
+async def get_expenses(
+    trip_id: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    current_user: TokenPrincipal = Depends(get_token_principal),
+    access: TripAccess = Depends(get_trip_access),
+):
+    """Expenses newest first. The next page's token is in the X-Next-Cursor header."""
+    # Same rule as the expenses embedded in GET /{trip_id}: whoever can view the trip
+    await access.require(trip_id, current_user.id, VIEW, "Not authorized to view expenses")
+
+    docs, next_cursor = await fetch_page(
+        db.db["trip_expenses"], {"trip_id": trip_id}, cursor=cursor, limit=limit, sort_field="date"
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [Expense(**e) for e in docs]
+
 @router.post("/{trip_id}/expenses", response_model=Expense)
-async def add_expense(trip_id: str, expense: Expense, current_user: UserDB = Depends(get_current_user)):
-    trip_data = await db.db["trips"].find_one({"id": trip_id})
-    if not trip_data:
-        raise HTTPException(status_code=404, detail="Trip not found")
-        
-    participant_ids = [p["user_id"] for p in trip_data.get("participants", [])]
-    if current_user.id != trip_data["organizer_id"] and current_user.id not in participant_ids:
-        raise HTTPException(status_code=403, detail="Not authorized to add expenses")
-        
+async def add_expense(
+    trip_id: str,
+    expense: Expense,
+    current_user: UserDB = Depends(get_current_user),
+    access: TripAccess = Depends(get_trip_access),
+):
     expense.id = str(uuid.uuid4())
     if not expense.paid_by:
         expense.paid_by = current_user.id
-        
-    await db.db["trips"].update_one(
-        {"id": trip_id},
-        {"$push": {"expenses": expense.dict()}}
+
+    # The membership check is the counter update's filter: one round trip for check + write
+    result = await db.db["trips"].update_one(
+        access_filter(trip_id, current_user.id, MEMBER),
+        {"$inc": {"expense_count": 1, "expense_total": expense.amount}}
     )
+    if not result.matched_count:
+        await access.deny(trip_id, current_user.id, MEMBER, "Not authorized to add expenses")
+
+    await _insert_activity("trip_expenses", {**expense.dict(), "trip_id": trip_id},
+                           {"expense_count": -1, "expense_total": -expense.amount})
     return expense
 
 class CommentCreate(BaseModel):
     text: str
 
+@router.get("/{trip_id}/comments", response_model=List[TripComment])
+async def get_comments(
+    trip_id: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    current_user: TokenPrincipal = Depends(get_token_principal),
+    access: TripAccess = Depends(get_trip_access),
+):
+    """Comments newest first. The next page's token is in the X-Next-Cursor header."""
+    await access.require(trip_id, current_user.id, VIEW, "Not authorized to view comments")
+
+    docs, next_cursor = await fetch_page(
+        db.db["trip_comments"], {"trip_id": trip_id}, cursor=cursor, limit=limit, sort_field="timestamp"
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [TripComment(**c) for c in docs]
+
 @router.post("/{trip_id}/comments")
-async def add_comment(trip_id: str, comment: CommentCreate, current_user: UserDB = Depends(get_current_user)):
-    trip_data = await db.db["trips"].find_one({"id": trip_id})
-    if not trip_data:
-        raise HTTPException(status_code=404, detail="Trip not found")
-        
+async def add_comment(
+    trip_id: str,
+    comment: CommentCreate,
+    current_user: UserDB = Depends(get_current_user),
+    access: TripAccess = Depends(get_trip_access),
+):
     # Anyone can comment on completed public trips, else only participants
-    if trip_data["status"] != "completed":
-        participant_ids = [p["user_id"] for p in trip_data.get("participants", [])]
-        if current_user.id != trip_data["organizer_id"] and current_user.id not in participant_ids:
-            raise HTTPException(status_code=403, detail="Not authorized to comment")
-            
+    result = await db.db["trips"].update_one(
+        access_filter(trip_id, current_user.id, VIEW),
+        {"$inc": {"comment_count": 1}}
+    )
+    if not result.matched_count:
+        await access.deny(trip_id, current_user.id, VIEW, "Not authorized to comment")
+
     comment_data = {
         "id": str(uuid.uuid4()),
         "user_id": current_user.id,
@@ -223,9 +325,31 @@ async def add_comment(trip_id: str, comment: CommentCreate, current_user: UserDB
         "text": comment.text,
         "timestamp": datetime.utcnow()
     }
-    
-    await db.db["trips"].update_one(
-        {"id": trip_id},
-        {"$push": {"comments": comment_data}}
-    )
+    await _insert_activity("trip_comments", {**comment_data, "trip_id": trip_id}, {"comment_count": -1})
     return comment_data
+
+@router.get("/{trip_id}/track")
+async def get_track(
+    trip_id: str,
+    user_id: Optional[str] = None,
+    encoded: bool = False,
+    current_user: UserDB = Depends(get_current_user),
+    access: TripAccess = Depends(get_trip_access),
+):
+    """Recorded route history as NDJSON, one line per stored chunk, grouped by user and oldest first.
+
+    Each line has user_id, start, end and `points` ([{lat, lng, timestamp}, ...]). With
+    `encoded=true` it carries the stored polyline (`path`) and time deltas (`times`) instead.
+    """
+    await access.require(trip_id, current_user.id, MEMBER, "Not authorized to view the route history")
+
+    async def lines():
+        async for chunk in track_recorder.stream(trip_id, user_id):
+            line = {"user_id": chunk["user_id"], "start": chunk["start"].isoformat(), "end": chunk["end"].isoformat()}
+            if encoded:
+                line.update(path=chunk["path"], times=chunk["times"])
+            else:
+                line["points"] = decode_chunk(chunk)
+            yield json.dumps(line) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
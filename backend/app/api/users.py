@@ -2,11 +2,29 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from app.models.user import UserDB, UserProfileSettings, Vehicle, UserProfileUpdate
 import os
 import uuid
-from app.api.auth import get_current_user
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.api.auth import get_current_user, remember_principal
 from app.core.database import db
+from app.services.user_directory import user_search_terms
 
 router = APIRouter()
 
+async def _update_me(user_id: str, update: dict) -> UserDB:
+    """Apply `update` and return the new user state in one atomic round trip."""
+    try:
+        updated_user = await db.db["users"].find_one_and_update(
+            {"id": user_id}, update, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Only username is both unique and user-editable
+        raise HTTPException(status_code=400, detail="Username already taken.")
+    if not updated_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    user = UserDB(**updated_user)
+    remember_principal(user)
+    return user
+
 @router.get("/me", response_model=UserDB)
 async def get_my_profile(current_user: UserDB = Depends(get_current_user)):
     return current_user
@@ -16,66 +34,46 @@ async def update_my_profile(profile_update: UserProfileUpdate, current_user: Use
     update_data = {k: v for k, v in profile_update.dict().items() if v is not None}
     if not update_data:
         return current_user
-        
-    await db.db["users"].update_one(
-        {"id": current_user.id},
-        {"$set": update_data}
-    )
-    updated_user = await db.db["users"].find_one({"id": current_user.id})
-    return UserDB(**updated_user)
+
+    if "username" in update_data or "full_name" in update_data:
+        update_data["search_terms"] = user_search_terms(
+            update_data.get("username", current_user.username),
+            current_user.email,
+            update_data.get("full_name", current_user.full_name),
+        )
+    return await _update_me(current_user.id, {"$set": update_data})
 
 @router.post("/me/photo", response_model=UserDB)
 async def upload_profile_photo(file: UploadFile = File(...), current_user: UserDB = Depends(get_current_user)):
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File provided is not an image.")
-    
+
     # Generate unique filename
     ext = os.path.splitext(file.filename)[1].lstrip(".")
     filename = f"{current_user.id}_{uuid.uuid4().hex[:8]}.{ext}"
     filepath = os.path.join("uploads", "profiles", filename)
-    
+
     # Save the file
     content = await file.read()
     with open(filepath, "wb") as f:
         f.write(content)
-        
+
     # Update user record with relative URL
     photo_url = f"/uploads/profiles/{filename}"
-    await db.db["users"].update_one(
-        {"id": current_user.id},
-        {"$set": {"profile_photo": photo_url}}
-    )
-    
-    updated_user = await db.db["users"].find_one({"id": current_user.id})
-    return UserDB(**updated_user)
+    return await _update_me(current_user.id, {"$set": {"profile_photo": photo_url}})
 
 @router.put("/me/settings", response_model=UserDB)
 async def update_my_settings(settings: UserProfileSettings, current_user: UserDB = Depends(get_current_user)):
-    await db.db["users"].update_one(
-        {"id": current_user.id},
-        {"$set": {"profile_settings": settings.dict()}}
-    )
-    updated_user = await db.db["users"].find_one({"id": current_user.id})
-    return UserDB(**updated_user)
+    return await _update_me(current_user.id, {"$set": {"profile_settings": settings.dict()}})
 
 @router.post("/me/vehicles", response_model=UserDB)
 async def add_vehicle(vehicle: Vehicle, current_user: UserDB = Depends(get_current_user)):
     # Motorcycles must have exactly 2 seats
     if vehicle.type.lower() == "motorcycle":
         vehicle.seats = 2
-        
-    await db.db["users"].update_one(
-        {"id": current_user.id},
-        {"$push": {"profile_settings.vehicles": vehicle.dict()}}
-    )
-    updated_user = await db.db["users"].find_one({"id": current_user.id})
-    return UserDB(**updated_user)
+
+    return await _update_me(current_user.id, {"$push": {"profile_settings.vehicles": vehicle.dict()}})
 
 @router.delete("/me/vehicles/{vehicle_id}", response_model=UserDB)
 async def remove_vehicle(vehicle_id: str, current_user: UserDB = Depends(get_current_user)):
-    await db.db["users"].update_one(
-        {"id": current_user.id},
-        {"$pull": {"profile_settings.vehicles": {"id": vehicle_id}}}
-    )
-    updated_user = await db.db["users"].find_one({"id": current_user.id})
-    return UserDB(**updated_user)
+    return await _update_me(current_user.id, {"$pull": {"profile_settings.vehicles": {"id": vehicle_id}}})
@@ -6,10 +6,56 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30   # how long an authenticated user is reused without a DB read
+    BCRYPT_ROUNDS: int = 12                 # bcrypt cost factor (each +1 doubles hash time)
+    PASSWORD_HASH_WORKERS: int = 2          # threads dedicated to bcrypt
+    PASSWORD_HASH_MAX_QUEUE: int = 32       # queued hashes beyond the workers before 503
+    USER_SEARCH_CACHE_TTL_SECONDS: int = 15  # per-worker reuse of crew search prefixes
     MONGODB_URL: str = "mongodb://localhost:27017"
     MONGODB_DB_NAME: str = "triptracks"
     GEOMAPS_API_KEY: str = ""
+    GEOMAPS_BASE_URL: str = "https://api.geoapify.com"
+    GEOMAPS_MAX_CONNECTIONS: int = 20           # pooled connections to the GeoMaps host
+    GEOMAPS_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    GEOMAPS_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    GEOMAPS_HTTP_TIMEOUT_SECONDS: float = 10.0
     MEMCACHED_SERVER: str = "localhost:11211"
+    MEMCACHED_POOL_SIZE: int = 8
+    MEMCACHED_TIMEOUT_SECONDS: float = 0.5
+    CACHE_BACKEND: str = "memory"           # memory, memcached or tiered
+    CACHE_L1_TTL_SECONDS: int = 30          # local tier lifetime in tiered mode
+    CACHE_KEY_PREFIX: str = "triptracks:"
+    GEOMAPS_ROUTE_CONCURRENCY: int = 4      # max legs routed upstream at once per plan
+    GEOMAPS_LEG_TIMEOUT_SECONDS: float = 8.0  # per-leg upstream budget before haversine fallback
+    ROUTE_CACHE_KEY_MODE: str = "decimal"   # decimal or geohash
+    ROUTE_CACHE_PRECISION: int = 4          # decimal places kept (4 ≈ 11 m)
+    ROUTE_CACHE_GEOHASH_LENGTH: int = 7     # geohash cell size (7 ≈ 150 m)
+    ROUTE_CACHE_SYMMETRIC: bool = False     # share one entry for A→B and B→A
+    PLANNER_STALE_WHILE_REVALIDATE_SECONDS: int = 600  # serve expired results while one refresh runs
+    GEO_CACHE_PERSIST_ENABLED: bool = True  # keep GeoMaps results in Mongo across restarts
+    GEO_CACHE_PERSIST_TTL_SECONDS: int = 30 * 24 * 3600
+    GEO_CACHE_PREWARM_ENTRIES: int = 500    # hottest entries loaded into the cache at startup
+    WS_SEND_QUEUE_SIZE: int = 64            # frames buffered per socket before the slow-consumer policy applies
+    WS_SLOW_CONSUMER_POLICY: str = "drop_oldest"  # drop_oldest, drop_newest or disconnect
+    WS_SEND_TIMEOUT_SECONDS: float = 5.0    # a send stuck longer than this evicts the socket
+    WS_BROKER: str = "mongo"                # mongo (rooms span workers/nodes) or memory (single worker only)
+    WORKERS: int = 1                        # uvicorn worker count, exported by start.sh
+    WS_BROKER_CAPPED_BYTES: int = 16 * 1024 * 1024  # size of the capped ws_events collection
+    WS_BROKER_PUBLISH_QUEUE_SIZE: int = 10000  # events waiting for Mongo before the oldest are dropped
+    WS_BROKER_PUBLISH_BATCH_SIZE: int = 500    # events per insert_many into ws_events
+    LOCATION_FLUSH_INTERVAL_SECONDS: float = 1.0  # one batched location snapshot per trip per tick; 0 = per-fix broadcast
+    LOCATION_MIN_MOVE_METERS: float = 5.0   # fixes closer than this to the user's last one are dropped
+    CHAT_WRITE_BATCH_SIZE: int = 100        # chat messages per insert_many
+    CHAT_WRITE_FLUSH_MS: int = 200          # max wait for a batch to fill
+    CHAT_WRITE_QUEUE_SIZE: int = 5000       # queued messages before senders wait (backpressure)
+    CHAT_WRITE_ORDERED: bool = True         # ordered inserts: history stored in send order per trip
+    TRACK_RECORDING_ENABLED: bool = True    # keep live location fixes as route history
+    TRACK_CHUNK_POINTS: int = 600           # fixes buffered per user before a chunk is written
+    TRACK_FLUSH_SECONDS: int = 120          # max age of a buffer before it is written anyway
+    TRACK_SIMPLIFY_METERS: float = 5.0      # Douglas-Peucker tolerance applied to each chunk
+    FEED_SEARCH_CACHE_TTL_SECONDS: int = 60 # per-worker reuse of a search query's ranking
+    FEED_SEARCH_MAX_RESULTS: int = 500      # ranked matches kept (and pageable) per query
+    FEED_SEARCH_RECENCY_DAYS: int = 30      # recency worth an e-times better text match
 
     class Config:
         env_file = ".env"
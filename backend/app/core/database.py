@@ -1,5 +1,6 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 from app.core.config import settings
+from app.core.indexes import ensure_indexes
 import certifi
 
 
@@ -21,6 +22,10 @@ class _CollectionWrapper:
         proj = {**(projection or {}), **self._NO_ID}
         return self._col.find(filter, proj, *args, **kwargs)
 
+    def aggregate(self, pipeline, *args, **kwargs):
+        # Pipelines control their own output shape; end them with a $project that drops _id
+        return self._col.aggregate(pipeline, *args, **kwargs)
+
     async def insert_one(self, document, **kwargs):
         # Work on a copy so PyMongo's in-place _id mutation doesn't pollute callers
         return await self._col.insert_one(dict(document), **kwargs)
@@ -34,6 +39,11 @@ class _CollectionWrapper:
     async def update_many(self, filter, update, **kwargs):
         return await self._col.update_many(filter, update, **kwargs)
 
+    async def find_one_and_update(self, filter, update, projection=None, **kwargs):
+        # Pass return_document=ReturnDocument.AFTER to get the updated state in the same round trip
+        proj = {**(projection or {}), **self._NO_ID}
+        return await self._col.find_one_and_update(filter, update, proj, **kwargs)
+
     async def delete_one(self, filter, **kwargs):
         return await self._col.delete_one(filter, **kwargs)
 
@@ -43,6 +53,12 @@ class _CollectionWrapper:
     async def count_documents(self, filter, **kwargs):
         return await self._col.count_documents(filter, **kwargs)
 
+    async def bulk_write(self, requests, **kwargs):
+        return await self._col.bulk_write(requests, **kwargs)
+
+    async def create_index(self, keys, **kwargs):
+        return await self._col.create_index(keys, **kwargs)
+
 
 class _DatabaseWrapper:
     """Wraps a Motor database so every collection access returns a _CollectionWrapper."""
@@ -79,6 +95,7 @@ async def connect_to_mongo():
     raw_db = db.client[settings.MONGODB_DB_NAME]
     db.db._db = raw_db
     print(f"Connected to MongoDB at {settings.MONGODB_URL}")
+    await ensure_indexes(raw_db)
 
 
 async def close_mongo_connection():
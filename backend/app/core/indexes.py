@@ -0,0 +1,150 @@
+"""
+Declarative MongoDB index registry.
+
+`INDEXES` lists every index the API relies on, per collection. It is applied
+idempotently by `connect_to_mongo` at startup: Mongo treats an identical
+create_index as a no-op. `QUERY_SHAPES` records the filter/sort each route
+sends, so `scripts/check_indexes.py` can `explain()` them and report missing
+or unused indexes.
+
+When adding a query to a route, add its shape here and make sure an index
+below serves it.
+"""
+
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class IndexBuildError(RuntimeError):
+    """Raised at startup when a unique index is missing: writes would silently accept duplicates."""
+
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("username", ASCENDING)], unique=True),
+        # Crew search: anchored prefix regex on normalised terms (multikey)
+        IndexModel([("search_terms", ASCENDING)]),
+    ],
+    "trips": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # Completed feed keyset pagination: status, then (updated_at, id) for the seek
+        IndexModel([("status", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)]),
+        # Feed search, unfinished last term: anchored prefix regex on normalised words (multikey)
+        IndexModel([("status", ASCENDING), ("search_terms", ASCENDING)]),
+        # Feed search (app/services/trip_search.py). Mongo allows one text index per
+        # collection; the `status` prefix means every $text query must pin status.
+        IndexModel(
+            [("status", ASCENDING), ("title", TEXT), ("destination.name", TEXT),
+             ("source.name", TEXT), ("stops.name", TEXT)],
+            name="trips_text",
+            weights={"title": 5, "destination.name": 3, "source.name": 1, "stops.name": 1},
+            default_language="none",        # place names: no stemming or stop words
+            language_override="text_language",
+        ),
+    ],
+    # Per-user home-screen categories (app/services/trip_index.py)
+    "user_trip_index": [
+        IndexModel([("user_id", ASCENDING), ("id", ASCENDING)], unique=True),
+        IndexModel([("id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("category", ASCENDING),
+                    ("updated_at", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "user_trip_counts": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+    ],
+    "crew_requests": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("receiver_id", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("sender_id", ASCENDING), ("receiver_id", ASCENDING), ("status", ASCENDING)]),
+    ],
+    "service_codes": [
+        IndexModel([("code", ASCENDING)], unique=True),
+    ],
+    "trip_comments": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("trip_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "trip_expenses": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("trip_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "trip_chats": [
+        # Makes write-behind retries idempotent (app/services/chat_store.py)
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("trip_id", ASCENDING), ("timestamp", ASCENDING)]),
+    ],
+    "track_chunks": [
+        IndexModel([("trip_id", ASCENDING), ("user_id", ASCENDING), ("start", ASCENDING)]),
+    ],
+    "geo_cache": [
+        IndexModel([("key", ASCENDING)], unique=True),
+        # Mongo's TTL monitor deletes documents once `expires_at` has passed
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        IndexModel([("hits", DESCENDING)]),
+    ],
+}
+
+
+# Representative query per route: (route, collection, filter, sort)
+QUERY_SHAPES = [
+    ("auth dependency",                  "users", {"id": "u"}, None),
+    ("POST /api/auth/login",             "users", {"username": "name"}, None),
+    ("POST /api/auth/login (email)",     "users", {"email": "a@b.c"}, None),
+    ("POST /api/auth/register",          "service_codes", {"code": "ABC123DEF456", "is_used": False}, None),
+    ("GET /api/trips/user/categories",   "user_trip_index",
+        {"user_id": "u", "category": "planned_by_me"}, [("updated_at", -1), ("id", -1)]),
+    ("trip category counts",             "user_trip_counts", {"user_id": "u"}, None),
+    ("trip category sync",               "user_trip_index", {"id": "t"}, None),
+    ("trip summaries by id",             "trips", {"id": {"$in": ["t", "s"]}}, None),
+    ("GET /api/trips/feed/completed",    "trips", {"status": "completed"}, [("updated_at", -1), ("id", -1)]),
+    ("GET /api/trips/feed/completed?search=", "trips", {"status": "completed", "$text": {"$search": "goa"}}, None),
+    ("GET /api/trips/feed/completed?search=go", "trips",
+        {"status": "completed", "search_terms": {"$regex": "^go"}}, None),
+    ("GET /api/trips/{trip_id}",         "trips", {"id": "t"}, None),
+    ("GET /api/trips/{trip_id}/comments", "trip_comments", {"trip_id": "t"}, [("timestamp", -1), ("id", -1)]),
+    ("GET /api/trips/{trip_id}/expenses", "trip_expenses", {"trip_id": "t"}, [("date", -1), ("id", -1)]),
+    ("GET /api/crew/requests/pending",   "crew_requests", {"receiver_id": "u", "status": "pending"}, None),
+    ("POST /api/crew/requests/{user_id}", "crew_requests",
+        {"sender_id": "u", "receiver_id": "v", "status": "pending"}, None),
+    ("POST /api/crew/requests/{id}/accept", "crew_requests",
+        {"id": "r", "receiver_id": "u", "status": "pending"}, None),
+    ("GET /api/crew/search",             "users", {"search_terms": {"$regex": "^jo"}}, None),
+    ("GET /api/crew/",                   "users", {"id": {"$in": ["u", "v"]}}, None),
+    ("geo cache lookup",                 "geo_cache", {"key": "k"}, None),
+    ("geo cache pre-warm",               "geo_cache", {}, [("hits", -1)]),
+]
+
+
+async def ensure_indexes(database) -> None:
+    """Create every registered index on a Motor database.
+
+    A failed lookup index only costs speed, so it is logged and startup goes on.
+    A failed unique index raises IndexBuildError once every index was attempted:
+    the API relies on those for correctness (usernames, chat retries, ...).
+    """
+    created = 0
+    missing_unique = []
+    for collection, models in INDEXES.items():
+        for model in models:
+            spec = dict(model.document)
+            keys = list(spec.pop("key").items())
+            try:
+                await database[collection].create_index(keys, **spec)
+                created += 1
+            except PyMongoError as e:
+                # e.g. duplicate data blocking a unique index
+                logger.error("Index %s.%s could not be created: %s", collection, spec.get("name"), e)
+                if spec.get("unique"):
+                    missing_unique.append(f"{collection}.{spec.get('name')}")
+    print(f"Ensured {created} MongoDB indexes")
+    if missing_unique:
+        raise IndexBuildError(
+            f"Unique indexes missing: {', '.join(missing_unique)}. Remove the duplicate documents and restart."
+        )
@@ -0,0 +1,75 @@
+"""
+Keyset (seek) pagination helpers.
+
+Pages are ordered by `(sort_field, id)` descending. The continuation token
+encodes the last row of the previous page, so fetching page N costs the same
+as page 1: one indexed range scan of `limit + 1` documents, never a skip.
+Every paginated query needs a compound index ending in `(sort_field, id)`
+(see app/core/indexes.py).
+
+Usage:
+    from app.core.pagination import fetch_page
+
+    docs, next_cursor = await fetch_page(db.db["trips"], {"status": "completed"}, cursor, limit)
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(doc: dict, sort_field: str = "updated_at") -> str:
+    value = doc[sort_field]
+    payload = {"v": value, "i": doc["id"]}
+    if isinstance(value, datetime):
+        payload.update(v=value.isoformat(), t="dt")
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[object, str]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, last_id = payload["v"], payload["i"]
+        if payload.get("t") == "dt":
+            value = datetime.fromisoformat(value)
+        return value, last_id
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+async def fetch_page(
+    collection,
+    query: dict,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    projection: Optional[dict] = None,
+    sort_field: str = "updated_at",
+) -> Tuple[List[dict], Optional[str]]:
+    """Return one page of documents and the token for the next page (None on the last page)."""
+    limit = clamp_page_size(limit)
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {sort_field: {"$lt": value}},
+            {sort_field: value, "id": {"$lt": last_id}},
+        ]}]}
+    docs = await collection.find(query, projection).sort(
+        [(sort_field, -1), ("id", -1)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+    if len(docs) > limit:
+        return docs[:limit], encode_cursor(docs[limit - 1], sort_field)
+    return docs, None
@@ -1,11 +1,14 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import jwt
 from pwdlib import PasswordHash
 from pwdlib.hashers.bcrypt import BcryptHasher
 from app.core.config import settings
-from typing import Optional
+from typing import Callable, Optional
 
-pwd_context = PasswordHash([BcryptHasher()])
+pwd_context = PasswordHash([BcryptHasher(rounds=settings.BCRYPT_ROUNDS)])
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -13,6 +16,90 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+
+# ─── Off-loop password hashing ────────────────────────────────────────────────
+
+class HasherBusyError(Exception):
+    """Raised when the password-hash pool already has its maximum backlog."""
+
+
+class PasswordHashPool:
+    """Runs bcrypt on a small dedicated thread pool (bcrypt releases the GIL).
+
+    At most `workers + max_queue` jobs may be pending; beyond that callers get
+    HasherBusyError immediately instead of queueing behind a login burst.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self._workers = workers
+        self._max_pending = workers + max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwhash")
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_ms_total = 0.0
+        self._wait_ms_max = 0.0
+        self._hash_ms_total = 0.0
+
+    async def run(self, fn: Callable, *args):
+        if self._pending >= self._max_pending:
+            self._rejected += 1
+            raise HasherBusyError("Password hashing is saturated")
+        submitted = time.perf_counter()
+
+        def _job():
+            started = time.perf_counter()
+            result = fn(*args)
+            return result, started - submitted, time.perf_counter() - started
+
+        # Release the slot when the job itself ends, not when the caller stops waiting:
+        # a cancelled request (client went away) leaves bcrypt running on the pool
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        try:
+            job = self._executor.submit(_job)
+        except BaseException:
+            # No job exists to release the slot (e.g. the pool was already shut down)
+            self._release()
+            raise
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        result, waited, hashed = await asyncio.wrap_future(job)
+        self._completed += 1
+        self._wait_ms_total += waited * 1000
+        self._wait_ms_max = max(self._wait_ms_max, waited * 1000)
+        self._hash_ms_total += hashed * 1000
+        return result
+
+    def _release(self) -> None:
+        self._pending -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    @property
+    def info(self) -> dict:
+        done = self._completed
+        return {
+            "workers": self._workers,
+            "max_pending": self._max_pending,
+            "pending": self._pending,
+            "completed": done,
+            "rejected": self._rejected,
+            "avg_queue_wait_ms": round(self._wait_ms_total / done, 2) if done else 0.0,
+            "max_queue_wait_ms": round(self._wait_ms_max, 2),
+            "avg_hash_ms": round(self._hash_ms_total / done, 2) if done else 0.0,
+            "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        }
+
+
+hash_pool = PasswordHashPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hash_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await hash_pool.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -3,17 +3,50 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from contextlib import asynccontextmanager
+from app.core.config import settings
 from app.core.database import connect_to_mongo, close_mongo_connection
-from app.api import auth, users, crew, trips
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.security import hash_pool
+from app.api import auth, users, crew, trips, metrics
+from app.services.autocomplete_index import autocomplete_index
+from app.services.chat_store import chat_writer
+from app.services.trip_index import trip_index
+from app.services.track_recorder import track_recorder
+from app.services.cache import shared_cache
+from app.services.geomaps import geomaps_client
+from app.services.persistent_cache import persistent_cache
+from app.services.trip_planner import TripPlannerService
 from app.websockets import chat
+from app.websockets.chat import locations as ws_locations, manager as ws_manager
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup actions
     await connect_to_mongo()
+    await geomaps_client.start()
+    await persistent_cache.start()
+    warmed = await TripPlannerService.prewarm(settings.GEO_CACHE_PREWARM_ENTRIES)
+    print(f"Pre-warmed {warmed} GeoMaps cache entries from MongoDB")
+    places = await autocomplete_index.load_trip_places()
+    print(f"Indexed {places} known places for autocomplete")
+    await ws_manager.broker.start()
+    ws_locations.start()
+    await chat_writer.start()
+    track_recorder.start()
+    rows = await trip_index.ensure_built()
+    if rows:
+        print(f"Built per-user trip category index ({rows} rows)")
     yield
     # Shutdown actions
+    await ws_locations.close()
+    await ws_manager.broker.close()
+    await chat_writer.close()
+    await track_recorder.close()
+    await persistent_cache.close()
+    await geomaps_client.close()
+    await shared_cache.close()
     await close_mongo_connection()
+    hash_pool.shutdown()
 
 app = FastAPI(title="Triptracks API", lifespan=lifespan)
 
@@ -24,12 +57,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],  # keyset pagination token on list endpoints
 )
 
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(crew.router, prefix="/api/crew", tags=["crew"])
 app.include_router(trips.router, prefix="/api/trips", tags=["trips"])
+app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
 app.include_router(chat.router, prefix="/ws/trips", tags=["websockets"])
 
 # Ensure the uploads directory exists before mounting
@@ -26,6 +26,13 @@ class Expense(BaseModel):
     split_ratio: Dict[str, float] = {} # user_id -> ratio or fixed amount
     date: datetime = Field(default_factory=datetime.utcnow)
 
+class TripComment(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    username: str
+    text: str
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
 class TripBase(BaseModel):
     title: str
     source: Location
@@ -46,8 +53,58 @@ class TripDB(TripBase):
     legs: List[Leg] = []
     total_distance_km: float = 0.0
     total_estimated_time_mins: int = 0
+    # Stored in trip_expenses / trip_comments; GET /{trip_id} embeds the most recent page
     expenses: List[Expense] = []
-    comments: List[dict] = [] # Keeping it simple for now -> [{user_id, text, timestamp}]
+    comments: List[TripComment] = []
+    expense_count: int = 0
+    expense_total: float = 0.0
+    comment_count: int = 0
     photos: List[str] = [] # URLs to photos
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+def _count(field: str) -> dict:
+    return {"$size": {"$ifNull": [f"${field}", []]}}
+
+# Card fields only; embedded arrays are reduced to counts on the server
+TRIP_SUMMARY_PROJECTION = {
+    "id": 1,
+    "organizer_id": 1,
+    "title": 1,
+    "status": 1,
+    "source": 1,
+    "destination": 1,
+    "start_date": 1,
+    "end_date": 1,
+    "total_distance_km": 1,
+    "total_estimated_time_mins": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "participant_count": _count("participants"),
+    "stop_count": _count("stops"),
+    "expense_count": 1,
+    "expense_total": 1,
+    "comment_count": 1,
+    "photo_count": _count("photos"),
+}
+
+class TripSummary(BaseModel):
+    """Trip card for list/feed endpoints. Full detail is served by GET /api/trips/{trip_id}."""
+    id: str
+    organizer_id: str
+    title: str
+    status: str = "planned"
+    source: Location
+    destination: Location
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    total_distance_km: float = 0.0
+    total_estimated_time_mins: int = 0
+    participant_count: int = 0
+    stop_count: int = 0
+    expense_count: int = 0
+    expense_total: float = 0.0
+    comment_count: int = 0
+    photo_count: int = 0
+    created_at: datetime
+    updated_at: datetime
@@ -0,0 +1,133 @@
+"""
+Local prefix index for location autocomplete.
+
+Keystroke queries arrive as growing prefixes ("Mum", "Mumb", "Mumba", ...).
+When a shorter prefix already came back from GeoMaps with fewer results than
+the requested limit, that result set is complete. Any longer prefix can then be
+answered by filtering it locally instead of spending another upstream call.
+Place names from stored trips are indexed too, so places the crew has already
+travelled to are suggested without an upstream call.
+
+Usage:
+    from app.services.autocomplete_index import autocomplete_index, normalise_query
+
+    q = normalise_query("  São  Paulo ")               # "sao paulo"
+    results = autocomplete_index.lookup(q, limit=5)     # None -> go upstream
+    autocomplete_index.add_results(q, upstream_results, limit=5)
+    autocomplete_index.add_places([{"name": ..., "lat": ..., "lng": ...}])
+"""
+
+import bisect
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.database import db
+
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIXES = 5000      # cached upstream result sets kept (LRU)
+MAX_PLACES = 20000       # distinct known place names kept from trips
+
+
+def normalise_query(text: str) -> str:
+    """Case-fold, strip accents and collapse whitespace so equivalent queries share a key."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+def _matches(name: str, tokens: List[str]) -> bool:
+    """True when every query token is a prefix of some word in the normalised name."""
+    words = normalise_query(name).replace(",", " ").split()
+    return all(any(w.startswith(t) for w in words) for t in tokens)
+
+
+def _place_key(item: Tuple[str, Dict]) -> str:
+    return item[0]
+
+
+class AutocompleteIndex:
+    def __init__(self, max_prefixes: int = MAX_PREFIXES, max_places: int = MAX_PLACES):
+        self._max_prefixes = max_prefixes
+        self._max_places = max_places
+        # normalised prefix -> upstream results known to be the complete match set
+        self._complete: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        # sorted (normalised name, place) pairs for range scans by prefix
+        self._places: List[Tuple[str, Dict]] = []
+        self._place_names: set = set()
+        self._prefix_hits = 0
+        self._place_hits = 0
+        self._misses = 0
+
+    def lookup(self, query: str, limit: int) -> Optional[List[Dict]]:
+        """Answer `query` (already normalised) locally, or return None to go upstream."""
+        if len(query) < MIN_PREFIX_LENGTH:
+            return None
+
+        tokens = query.replace(",", " ").split()
+        for end in range(len(query), MIN_PREFIX_LENGTH - 1, -1):
+            superset = self._complete.get(query[:end])
+            if superset is not None:
+                self._complete.move_to_end(query[:end])
+                self._prefix_hits += 1
+                return [r for r in superset if _matches(r["name"], tokens)][:limit]
+
+        # A full page of places we have already seen on trips is good enough
+        start = bisect.bisect_left(self._places, query, key=_place_key)
+        found = []
+        for name, place in self._places[start:]:
+            if not name.startswith(query) or len(found) == limit:
+                break
+            found.append(place)
+        if len(found) == limit:
+            self._place_hits += 1
+            return found
+
+        self._misses += 1
+        return None
+
+    def add_results(self, query: str, results: List[Dict], limit: int) -> None:
+        """Record upstream results. Fewer than `limit` results means the set is complete."""
+        if len(query) >= MIN_PREFIX_LENGTH and len(results) < limit:
+            self._complete[query] = results
+            self._complete.move_to_end(query)
+            while len(self._complete) > self._max_prefixes:
+                self._complete.popitem(last=False)
+        self.add_places(results)
+
+    def add_places(self, places: Iterable[Dict]) -> None:
+        for p in places:
+            if not p.get("name") or p.get("lat") is None or p.get("lng") is None:
+                continue
+            name = normalise_query(p["name"])
+            if name in self._place_names or len(self._places) >= self._max_places:
+                continue
+            self._place_names.add(name)
+            bisect.insort(self._places, (name, {"name": p["name"], "lat": p["lat"], "lng": p["lng"]}),
+                          key=_place_key)
+
+    async def load_trip_places(self, max_trips: int = 5000) -> int:
+        """Seed known places from the source/destination/stops of stored trips."""
+        cursor = db.db["trips"].find(
+            {}, {"source": 1, "destination": 1, "stops": 1}
+        ).sort("updated_at", -1).limit(max_trips)
+        before = len(self._places)
+        async for trip in cursor:
+            self.add_places([trip.get("source") or {}, trip.get("destination") or {}, *(trip.get("stops") or [])])
+        return len(self._places) - before
+
+    @property
+    def info(self) -> dict:
+        lookups = self._prefix_hits + self._place_hits + self._misses
+        return {
+            "complete_prefixes": len(self._complete),
+            "known_places": len(self._places),
+            "prefix_hits": self._prefix_hits,
+            "place_hits": self._place_hits,
+            "misses": self._misses,
+            "local_hit_rate": round((self._prefix_hits + self._place_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+# ─── Singleton ────────────────────────────────────────────────────────────────
+autocomplete_index = AutocompleteIndex()
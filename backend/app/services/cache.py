@@ -1,9 +1,10 @@
 """
-In-memory cache service using cachetools.
+In-memory cache service, plus pluggable async cache backends.
 
-Provides a singleton TTLCache with configurable:
-  - maxsize: maximum number of entries before LRU eviction
-  - ttl:     seconds until each entry expires automatically
+Provides a singleton TTL+LRU cache with configurable:
+  - maxsize:   maximum number of entries before LRU eviction
+  - max_bytes: approximate memory budget before LRU eviction
+  - ttl:       default seconds until each entry expires (overridable per entry)
 
 Usage:
     from app.services.cache import cache_service
@@ -12,87 +13,352 @@ Usage:
     value = cache_service.get("my_key")            # None if missing or expired
     cache_service.delete("my_key")
     cache_service.clear()
+
+Data that must be visible to every uvicorn worker (OTPs, route and
+autocomplete results) goes through `shared_cache` instead. Its backend is
+selected by `settings.CACHE_BACKEND`:
+  - "memory":    the per-process `cache_service` above (default)
+  - "memcached": MEMCACHED_SERVER shared by all workers
+  - "tiered":    a short-lived local L1 in front of the memcached L2
+
+    from app.services.cache import shared_cache
+
+    await shared_cache.set("my_key", value, ttl=300)
+    value = await shared_cache.get("my_key")
+    value = await shared_cache.get("otp_key", bypass_local=True)  # skip the L1
 """
 
+import heapq
+import sys
 import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from typing import Any, Optional
-from cachetools import TTLCache
+
+from app.core.config import settings
+from app.services.memcached import MemcachedClient, dumps, loads, safe_key
 
 
 # ─── Configuration ────────────────────────────────────────────────────────────
 DEFAULT_TTL_SECONDS = 3600       # 1 hour
 MAX_ENTRIES = 1000               # max items before LRU eviction kicks in
+MAX_BYTES = 32 * 1024 * 1024     # approximate memory budget across all entries
 # ─────────────────────────────────────────────────────────────────────────────
 
 
+class _Entry:
+    __slots__ = ("value", "expires_at", "size", "seq")
+
+    def __init__(self, value: Any, expires_at: float, size: int, seq: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.seq = seq
+
+
+def _approx_size(value: Any, _depth: int = 0) -> int:
+    """Cheap recursive estimate of a value's footprint in bytes."""
+    size = sys.getsizeof(value)
+    if _depth >= 3:
+        return size
+    if isinstance(value, dict):
+        size += sum(_approx_size(k, _depth + 1) + _approx_size(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(_approx_size(v, _depth + 1) for v in value)
+    return size
+
+
 class InMemoryCache:
-    """Thread-safe TTL+LRU in-memory cache backed by cachetools.TTLCache."""
+    """Thread-safe TTL+LRU in-memory cache.
 
-    def __init__(self, maxsize: int = MAX_ENTRIES, ttl: int = DEFAULT_TTL_SECONDS):
+    One key→entry map (kept in LRU order) plus a min-heap of expiry times, so a
+    lookup is a single dict probe regardless of how many distinct TTLs are in
+    use. Size is bounded globally by entry count and by approximate bytes.
+    """
+
+    def __init__(self, maxsize: int = MAX_ENTRIES, ttl: int = DEFAULT_TTL_SECONDS, max_bytes: int = MAX_BYTES):
         self._default_ttl = ttl
         self._maxsize = maxsize
+        self._max_bytes = max_bytes
         self._lock = threading.Lock()
-        # Primary cache with default TTL
-        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
-        # Per-key custom-TTL caches (keyed by ttl value)
-        self._ttl_caches: dict[int, TTLCache] = {}
-
-    def _get_cache_for_ttl(self, ttl: int) -> TTLCache:
-        """Return (or create) a TTLCache bucket for a specific TTL."""
-        if ttl == self._default_ttl:
-            return self._cache
-        if ttl not in self._ttl_caches:
-            self._ttl_caches[ttl] = TTLCache(maxsize=self._maxsize, ttl=ttl)
-        return self._ttl_caches[ttl]
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        # (expires_at, seq, key); entries left behind by overwrites/deletes are skipped lazily
+        self._expiry_heap: list[tuple[float, int, str]] = []
+        self._seq = 0
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def _remove(self, key: str) -> Optional[_Entry]:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+        return entry
+
+    def _purge_expired(self, now: float) -> None:
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            _, seq, key = heapq.heappop(heap)
+            entry = self._data.get(key)
+            if entry is not None and entry.seq == seq:
+                self._remove(key)
+                self._expirations += 1
+        # Overwrites leave stale heap nodes behind; compact once they dominate.
+        if len(heap) > 2 * len(self._data) + 64:
+            self._expiry_heap = [(e.expires_at, e.seq, k) for k, e in self._data.items()]
+            heapq.heapify(self._expiry_heap)
 
     def get(self, key: str) -> Optional[Any]:
         """Return cached value or None if missing/expired."""
         with self._lock:
-            # Check primary cache first
-            value = self._cache.get(key)
-            if value is not None:
-                return value
-            # Check custom-TTL buckets
-            for ttl_cache in self._ttl_caches.values():
-                value = ttl_cache.get(key)
-                if value is not None:
-                    return value
-            return None
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return entry.value
 
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         """Store a value with an optional per-entry TTL (defaults to class TTL)."""
         effective_ttl = ttl if ttl is not None else self._default_ttl
+        size = _approx_size(key) + _approx_size(value)
         with self._lock:
-            cache = self._get_cache_for_ttl(effective_ttl)
-            cache[key] = value
+            now = time.monotonic()
+            self._remove(key)
+            self._seq += 1
+            entry = _Entry(value, now + effective_ttl, size, self._seq)
+            self._data[key] = entry
+            self._bytes += size
+            heapq.heappush(self._expiry_heap, (entry.expires_at, entry.seq, key))
+
+            self._purge_expired(now)
+            # LRU eviction until both bounds hold (always keep the entry just written)
+            while len(self._data) > 1 and (len(self._data) > self._maxsize or self._bytes > self._max_bytes):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self._evictions += 1
 
     def delete(self, key: str) -> None:
-        """Remove a key from all cache buckets."""
+        """Remove a key from the cache."""
         with self._lock:
-            self._cache.pop(key, None)
-            for ttl_cache in self._ttl_caches.values():
-                ttl_cache.pop(key, None)
+            self._remove(key)
 
     def clear(self) -> None:
-        """Evict all entries from all buckets."""
+        """Evict all entries."""
         with self._lock:
-            self._cache.clear()
-            for ttl_cache in self._ttl_caches.values():
-                ttl_cache.clear()
+            self._data.clear()
+            self._expiry_heap.clear()
+            self._bytes = 0
 
     @property
     def info(self) -> dict:
         """Return current cache statistics."""
         with self._lock:
-            total = len(self._cache)
-            for c in self._ttl_caches.values():
-                total += len(c)
+            self._purge_expired(time.monotonic())
+            lookups = self._hits + self._misses
             return {
-                "entries": total,
+                "entries": len(self._data),
                 "maxsize": self._maxsize,
+                "approx_bytes": self._bytes,
+                "max_bytes": self._max_bytes,
                 "default_ttl_seconds": self._default_ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
             }
 
 
 # ─── Singleton ────────────────────────────────────────────────────────────────
-cache_service = InMemoryCache(maxsize=MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS)
+cache_service = InMemoryCache(maxsize=MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS, max_bytes=MAX_BYTES)
+
+
+# ─── Async backends ───────────────────────────────────────────────────────────
+
+class CacheBackend(ABC):
+    """Async cache interface. A miss and a backend failure both return None."""
+
+    @abstractmethod
+    async def get(self, key: str, bypass_local: bool = False) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+    @property
+    def info(self) -> dict:
+        return {}
+
+
+class LocalCacheBackend(CacheBackend):
+    """Adapts a per-process InMemoryCache to the async interface."""
+
+    def __init__(self, cache: InMemoryCache):
+        self._cache = cache
+
+    async def get(self, key: str, bypass_local: bool = False) -> Optional[Any]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    async def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    async def clear(self) -> None:
+        self._cache.clear()
+
+    @property
+    def info(self) -> dict:
+        return {"backend": "memory", **self._cache.info}
+
+
+class MemcachedCacheBackend(CacheBackend):
+    """Cache shared across workers through memcached. Failures degrade to misses."""
+
+    def __init__(self, client: MemcachedClient, default_ttl: int = DEFAULT_TTL_SECONDS, prefix: str = ""):
+        self._client = client
+        self._default_ttl = default_ttl
+        self._prefix = prefix
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+
+    async def get(self, key: str, bypass_local: bool = False) -> Optional[Any]:
+        try:
+            hit = await self._client.get(safe_key(key, self._prefix))
+        except Exception as e:
+            self._errors += 1
+            print(f"Memcached get error: {e}")
+            return None
+        if hit is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return loads(*hit)
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        try:
+            flags, payload = dumps(value)
+            await self._client.set(
+                safe_key(key, self._prefix), flags, payload,
+                exptime=ttl if ttl is not None else self._default_ttl,
+            )
+        except Exception as e:
+            self._errors += 1
+            print(f"Memcached set error: {e}")
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self._client.delete(safe_key(key, self._prefix))
+        except Exception as e:
+            self._errors += 1
+            print(f"Memcached delete error: {e}")
+
+    async def clear(self) -> None:
+        await self._client.flush_all()
+
+    async def close(self) -> None:
+        await self._client.close()
+
+    @property
+    def info(self) -> dict:
+        return {
+            "backend": "memcached",
+            "hits": self._hits,
+            "misses": self._misses,
+            "errors": self._errors,
+            **self._client.info,
+        }
+
+
+class TieredCacheBackend(CacheBackend):
+    """Local L1 in front of a shared L2.
+
+    L1 entries live for at most `l1_ttl` seconds, which bounds how long another
+    worker's delete can go unnoticed. Pass `bypass_local=True` for keys that
+    must always be read from the shared tier (e.g. single-use OTPs).
+    """
+
+    def __init__(self, l1: CacheBackend, l2: CacheBackend, l1_ttl: int):
+        self._l1 = l1
+        self._l2 = l2
+        self._l1_ttl = l1_ttl
+
+    def _local_ttl(self, ttl: Optional[int]) -> int:
+        return min(ttl, self._l1_ttl) if ttl is not None else self._l1_ttl
+
+    async def get(self, key: str, bypass_local: bool = False) -> Optional[Any]:
+        if not bypass_local:
+            value = await self._l1.get(key)
+            if value is not None:
+                return value
+        value = await self._l2.get(key)
+        if value is not None and not bypass_local:
+            await self._l1.set(key, value, ttl=self._l1_ttl)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        await self._l2.set(key, value, ttl=ttl)
+        await self._l1.set(key, value, ttl=self._local_ttl(ttl))
+
+    async def delete(self, key: str) -> None:
+        await self._l1.delete(key)
+        await self._l2.delete(key)
+
+    async def clear(self) -> None:
+        await self._l1.clear()
+        await self._l2.clear()
+
+    async def close(self) -> None:
+        await self._l1.close()
+        await self._l2.close()
+
+    @property
+    def info(self) -> dict:
+        return {"backend": "tiered", "l1": self._l1.info, "l2": self._l2.info}
+
+
+def build_cache_backend(kind: str) -> CacheBackend:
+    """Create the backend named by `kind` ("memory", "memcached" or "tiered")."""
+    if kind == "memory":
+        return LocalCacheBackend(cache_service)
+    shared = MemcachedCacheBackend(
+        MemcachedClient(
+            settings.MEMCACHED_SERVER,
+            pool_size=settings.MEMCACHED_POOL_SIZE,
+            timeout=settings.MEMCACHED_TIMEOUT_SECONDS,
+        ),
+        default_ttl=DEFAULT_TTL_SECONDS,
+        prefix=settings.CACHE_KEY_PREFIX,
+    )
+    if kind == "memcached":
+        return shared
+    if kind == "tiered":
+        return TieredCacheBackend(LocalCacheBackend(cache_service), shared, settings.CACHE_L1_TTL_SECONDS)
+    raise ValueError(f"Unknown CACHE_BACKEND: {kind!r}")
+
+
+shared_cache = build_cache_backend(settings.CACHE_BACKEND)
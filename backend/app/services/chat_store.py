@@ -0,0 +1,195 @@
+"""
+Write-behind persistence for trip chat messages.
+
+The websocket endpoint broadcasts a chat message first and then hands it to
+`chat_writer.submit()`. One writer task drains a bounded queue and stores
+the messages in `trip_chats` with `insert_many`. A batch is sent when it
+reaches CHAT_WRITE_BATCH_SIZE or when CHAT_WRITE_FLUSH_MS has passed since
+its first message, whichever comes first. No chat frame waits on a database
+round trip, and a busy room writes a few large batches instead of a flood
+of single inserts.
+
+Backpressure: the queue holds at most CHAT_WRITE_QUEUE_SIZE messages. If the
+database falls that far behind, `submit()` waits for room. That slows only
+the senders, and never silently drops history.
+
+Ordering: there is a single writer and batches are written one after
+another, so messages reach Mongo in the order they were submitted. With
+CHAT_WRITE_ORDERED (the default) each batch is an ordered insert, so every
+trip's history is stored in send order. If one message fails, the rest of
+its batch is retried from that point. Unordered lets the server apply a
+batch in any order and keep going past bad documents, which is faster on
+sharded clusters.
+
+Failed batches are retried with backoff. The unique index on `id` makes a
+retry of an insert that actually succeeded harmless: duplicate-key errors
+count as written.
+
+Usage:
+    from app.services.chat_store import chat_writer
+
+    await chat_writer.start()          # app startup
+    await chat_writer.submit(doc)      # returns once queued, not once written
+    await chat_writer.close()          # app shutdown: flushes everything queued
+"""
+
+import asyncio
+import time
+from typing import List, Optional
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+from app.core.config import settings
+from app.core.database import db
+
+COLLECTION = "trip_chats"
+DUPLICATE_KEY = 11000
+MAX_ATTEMPTS = 5
+CLOSE_TIMEOUT_SECONDS = 10.0
+
+
+class ChatWriter:
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_ms: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        ordered: Optional[bool] = None,
+    ):
+        self._batch_size = batch_size or settings.CHAT_WRITE_BATCH_SIZE
+        self._flush_seconds = (flush_ms or settings.CHAT_WRITE_FLUSH_MS) / 1000
+        self._queue_size = queue_size or settings.CHAT_WRITE_QUEUE_SIZE
+        self._ordered = settings.CHAT_WRITE_ORDERED if ordered is None else ordered
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._submitted = 0
+        self._written = 0
+        self._batches = 0
+        self._retries = 0
+        self._failed = 0
+        self._blocked = 0
+
+    async def start(self) -> None:
+        if self._writer is None:
+            self._queue = asyncio.Queue(maxsize=self._queue_size)
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def close(self) -> None:
+        """Write out everything queued, then stop the writer."""
+        if self._writer is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), CLOSE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"Chat writer shut down with {self._queue.qsize()} messages unwritten")
+        self._writer.cancel()
+        await asyncio.gather(self._writer, return_exceptions=True)
+        self._writer = None
+
+    async def submit(self, doc: dict) -> None:
+        """Queue `doc` for the next batch; waits only while the queue is full."""
+        if self._writer is None:
+            # Not started (scripts, tests): write through
+            await db.db[COLLECTION].insert_one(doc)
+            return
+        if self._queue.full():
+            self._blocked += 1
+        await self._queue.put(doc)
+        self._submitted += 1
+
+    async def _next_batch(self) -> List[dict]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self._flush_seconds
+        while len(batch) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write_loop(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._write(batch)
+            except Exception as e:
+                # Last resort: the writer must outlive any batch, or senders block on a full queue
+                self._failed += len(batch)
+                print(f"Chat batch of {len(batch)} dropped: {e!r}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch: List[dict]) -> None:
+        pending, attempt = batch, 0
+        self._batches += 1
+        while pending:
+            try:
+                await db.db[COLLECTION].insert_many(pending, ordered=self._ordered)
+                self._written += len(pending)
+                return
+            except BulkWriteError as e:
+                # Per-document errors: carry on with whatever was not attempted yet
+                pending = self._after_bulk_error(pending, e.details)
+            except PyMongoError as e:
+                attempt += 1
+                if attempt >= MAX_ATTEMPTS:
+                    self._failed += len(pending)
+                    print(f"Dropped {len(pending)} chat messages after {MAX_ATTEMPTS} attempts: {e}")
+                    return
+                self._retries += 1
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 5.0))
+            except Exception as e:
+                # Client-side encoding errors (e.g. an int too large for BSON) fail the same way on
+                # every retry; isolate the bad documents instead of losing the whole batch
+                print(f"Chat batch could not be encoded, writing one by one: {e!r}")
+                await self._write_each(pending)
+                return
+
+    async def _write_each(self, docs: List[dict]) -> None:
+        for doc in docs:
+            try:
+                await db.db[COLLECTION].insert_one(doc)
+                self._written += 1
+            except DuplicateKeyError:
+                self._written += 1  # stored by an earlier attempt
+            except Exception as e:
+                self._failed += 1
+                print(f"Chat message {doc.get('id')} dropped: {e!r}")
+
+    def _after_bulk_error(self, pending: List[dict], details: dict) -> List[dict]:
+        """Account for a partial write and return the documents still worth retrying."""
+        errors = details.get("writeErrors", [])
+        duplicates = [err for err in errors if err.get("code") == DUPLICATE_KEY]
+        rejected = [err for err in errors if err.get("code") != DUPLICATE_KEY]
+        for err in rejected:
+            print(f"Chat message rejected by the server: {err.get('errmsg')}")
+        self._failed += len(rejected)
+        self._written += details.get("nInserted", 0) + len(duplicates)
+        if not self._ordered or not errors:
+            # Unordered inserts attempt every document
+            return []
+        # An ordered insert stops at the first error: skip that document and resume after it
+        return pending[errors[0]["index"] + 1:]
+
+    @property
+    def info(self) -> dict:
+        return {
+            "running": self._writer is not None and not self._writer.done(),
+            "ordered": self._ordered,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "submitted": self._submitted,
+            "written": self._written,
+            "batches": self._batches,
+            "avg_batch_size": round(self._written / self._batches, 1) if self._batches else 0.0,
+            "retries": self._retries,
+            "failed": self._failed,
+            "blocked_submits": self._blocked,
+        }
+
+
+# ─── Singleton ────────────────────────────────────────────────────────────────
+chat_writer = ChatWriter()
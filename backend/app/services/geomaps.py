@@ -0,0 +1,139 @@
+"""
+Process-wide GeoMaps (Geoapify) HTTP client.
+
+A single httpx.AsyncClient is opened in the FastAPI lifespan and shared by
+every request on the worker, so upstream calls reuse pooled keep-alive
+connections instead of paying a fresh TCP+TLS handshake per call.
+
+Usage:
+    from app.services.geomaps import geomaps_client
+
+    await geomaps_client.start()                       # app startup
+    places = await geomaps_client.autocomplete("Pune", limit=5)
+    route  = await geomaps_client.route(19.07, 72.87, 18.52, 73.85)
+    geomaps_client.stats                               # request counters
+    await geomaps_client.close()                       # app shutdown
+"""
+
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+
+
+class GeoMapsError(Exception):
+    """Raised when the upstream GeoMaps API returns an error or an unusable payload."""
+
+
+class GeoMapsClient:
+    """Async Geoapify client backed by one bounded, keep-alive connection pool."""
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._requests = 0
+        self._errors = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._total_latency_ms = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        """True once started with an API key configured."""
+        return self._client is not None
+
+    async def start(self) -> None:
+        if self._client is not None or not settings.GEOMAPS_API_KEY:
+            return
+        limits = httpx.Limits(
+            max_connections=settings.GEOMAPS_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.GEOMAPS_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.GEOMAPS_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        # Limits must live on the transport: the client ignores them when one is passed in.
+        self._client = httpx.AsyncClient(
+            base_url=settings.GEOMAPS_BASE_URL,
+            transport=httpx.AsyncHTTPTransport(limits=limits, retries=1),
+            timeout=httpx.Timeout(settings.GEOMAPS_HTTP_TIMEOUT_SECONDS),
+            params={"apiKey": settings.GEOMAPS_API_KEY},
+        )
+        print(f"GeoMaps client ready ({settings.GEOMAPS_BASE_URL}, "
+              f"max {settings.GEOMAPS_MAX_CONNECTIONS} connections)")
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            print("Closed GeoMaps client")
+
+    async def _get_json(self, path: str, params: Dict) -> Dict:
+        if self._client is None:
+            raise GeoMapsError("GeoMaps client is not started")
+        self._requests += 1
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        started = time.perf_counter()
+        try:
+            response = await self._client.get(path, params=params)
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            self._errors += 1
+            raise GeoMapsError(str(e)) from e
+        finally:
+            self._in_flight -= 1
+            self._total_latency_ms += (time.perf_counter() - started) * 1000
+
+    async def autocomplete(self, text: str, limit: int = 5) -> List[Dict]:
+        """Return `[{"name", "lat", "lng"}, ...]` place suggestions for `text`."""
+        data = await self._get_json(
+            "/v1/geocode/autocomplete",
+            {"text": text, "limit": limit, "format": "json"},
+        )
+        results = []
+        for res in data.get("results", []):
+            if res.get("lat") is None or res.get("lon") is None:
+                continue
+            results.append({
+                "name": res.get("formatted") or res.get("city") or text,
+                "lat": res["lat"],
+                "lng": res["lon"],
+            })
+        return results
+
+    async def route(self, src_lat: float, src_lng: float, dest_lat: float, dest_lng: float) -> Dict:
+        """Return `{"distance_km", "duration_minutes"}` for a driving route."""
+        data = await self._get_json(
+            "/v1/routing",
+            {
+                "waypoints": f"{src_lat},{src_lng}|{dest_lat},{dest_lng}",
+                "mode": "drive",
+                "format": "json",
+            },
+        )
+        results = data.get("results") or []
+        if not results:
+            raise GeoMapsError("No route found")
+        return {
+            "distance_km": float(results[0]["distance"]) / 1000,
+            "duration_minutes": float(results[0]["time"]) / 60,
+        }
+
+    @property
+    def stats(self) -> Dict:
+        """Return the configured pool limits and this client's own request counters."""
+        return {
+            "enabled": self.enabled,
+            "max_connections": settings.GEOMAPS_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.GEOMAPS_MAX_KEEPALIVE_CONNECTIONS,
+            "requests": self._requests,
+            "errors": self._errors,
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "avg_latency_ms": round(self._total_latency_ms / self._requests, 2) if self._requests else 0.0,
+        }
+
+
+# ─── Singleton ────────────────────────────────────────────────────────────────
+geomaps_client = GeoMapsClient()
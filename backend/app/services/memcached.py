@@ -0,0 +1,162 @@
+"""
+Minimal asyncio memcached client (text protocol) with a bounded connection pool.
+
+Values travel as raw bytes plus the protocol's 32-bit `flags` field, which the
+serializer below uses to record how the bytes should be decoded. Payloads are
+read with an exact length, so values may safely contain `\\r\\n` or any other
+binary data.
+
+Usage:
+    from app.services.memcached import MemcachedClient, dumps, loads
+
+    client = MemcachedClient("localhost:11211", pool_size=8)
+    await client.set("k", *dumps({"a": 1}), exptime=60)
+    hit = await client.get("k")             # (flags, data) or None
+    value = loads(*hit) if hit else None
+    await client.close()
+"""
+
+import asyncio
+import hashlib
+import json
+from contextlib import asynccontextmanager
+from typing import Any, List, Optional, Tuple
+
+
+# ─── Serializer ───────────────────────────────────────────────────────────────
+FLAG_BYTES = 0
+FLAG_STR = 1
+FLAG_JSON = 2
+
+
+def dumps(value: Any) -> Tuple[int, bytes]:
+    """Encode a value as `(flags, payload)`."""
+    if isinstance(value, (bytes, bytearray)):
+        return FLAG_BYTES, bytes(value)
+    if isinstance(value, str):
+        return FLAG_STR, value.encode("utf-8")
+    return FLAG_JSON, json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def loads(flags: int, payload: bytes) -> Any:
+    """Decode a `(flags, payload)` pair produced by `dumps`."""
+    if flags == FLAG_BYTES:
+        return payload
+    if flags == FLAG_STR:
+        return payload.decode("utf-8")
+    return json.loads(payload)
+
+
+def safe_key(key: str, prefix: str = "") -> str:
+    """Memcached keys are <=250 printable ASCII chars without spaces; hash anything else."""
+    full = f"{prefix}{key}"
+    if len(full) <= 200 and full.isascii() and full.isprintable() and " " not in full:
+        return full
+    return f"{prefix}h:{hashlib.sha1(key.encode('utf-8')).hexdigest()}"
+
+
+class MemcachedError(Exception):
+    """Raised on protocol errors or unexpected server replies."""
+
+
+class MemcachedClient:
+    """Pooled async memcached client. Connections are opened lazily, up to `pool_size`."""
+
+    def __init__(self, server: str, pool_size: int = 8, timeout: float = 0.5):
+        host, _, port = server.rpartition(":")
+        self._host = host or server
+        self._port = int(port) if host and port else 11211
+        self._pool_size = pool_size
+        self._timeout = timeout
+        self._slots = asyncio.Semaphore(pool_size)
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._open = 0
+
+    @asynccontextmanager
+    async def _connection(self):
+        await self._slots.acquire()
+        conn = None
+        healthy = False
+        try:
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                conn = await asyncio.wait_for(
+                    asyncio.open_connection(self._host, self._port), timeout=self._timeout
+                )
+                self._open += 1
+            yield conn
+            healthy = True
+        finally:
+            if conn is not None:
+                if healthy:
+                    self._idle.append(conn)
+                else:
+                    # A half-read reply would corrupt the next command; drop the socket.
+                    conn[1].close()
+                    self._open -= 1
+            self._slots.release()
+
+    async def _call(self, request: bytes, reply):
+        async with self._connection() as (reader, writer):
+            writer.write(request)
+            await writer.drain()
+            return await asyncio.wait_for(reply(reader), timeout=self._timeout)
+
+    async def get(self, key: str) -> Optional[Tuple[int, bytes]]:
+        async def _reply(reader: asyncio.StreamReader):
+            line = await reader.readline()
+            if line == b"END\r\n":
+                return None
+            parts = line.split()
+            if len(parts) != 4 or parts[0] != b"VALUE":
+                raise MemcachedError(f"unexpected reply: {line!r}")
+            flags, length = int(parts[2]), int(parts[3])
+            data = await reader.readexactly(length + 2)
+            if await reader.readline() != b"END\r\n":
+                raise MemcachedError("missing END after value")
+            return flags, data[:-2]
+
+        return await self._call(f"get {key}\r\n".encode("ascii"), _reply)
+
+    async def set(self, key: str, flags: int, data: bytes, exptime: int = 0) -> bool:
+        async def _reply(reader: asyncio.StreamReader):
+            line = await reader.readline()
+            if line not in (b"STORED\r\n", b"NOT_STORED\r\n"):
+                raise MemcachedError(f"unexpected reply: {line!r}")
+            return line == b"STORED\r\n"
+
+        header = f"set {key} {flags} {int(exptime)} {len(data)}\r\n".encode("ascii")
+        return await self._call(header + data + b"\r\n", _reply)
+
+    async def delete(self, key: str) -> bool:
+        async def _reply(reader: asyncio.StreamReader):
+            line = await reader.readline()
+            if line not in (b"DELETED\r\n", b"NOT_FOUND\r\n"):
+                raise MemcachedError(f"unexpected reply: {line!r}")
+            return line == b"DELETED\r\n"
+
+        return await self._call(f"delete {key}\r\n".encode("ascii"), _reply)
+
+    async def flush_all(self) -> None:
+        async def _reply(reader: asyncio.StreamReader):
+            line = await reader.readline()
+            if line != b"OK\r\n":
+                raise MemcachedError(f"unexpected reply: {line!r}")
+
+        await self._call(b"flush_all\r\n", _reply)
+
+    async def close(self) -> None:
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+            self._open -= 1
+
+    @property
+    def info(self) -> dict:
+        return {
+            "server": f"{self._host}:{self._port}",
+            "pool_size": self._pool_size,
+            "open_connections": self._open,
+            "idle_connections": len(self._idle),
+        }
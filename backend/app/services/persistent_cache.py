@@ -0,0 +1,156 @@
+"""
+Durable second-level cache for GeoMaps results, stored in MongoDB.
+
+Route and autocomplete results are expensive (paid upstream quota) and rarely
+change, so they are also kept in the `geo_cache` collection (indexes, including
+the TTL index on `expires_at`, live in app/core/indexes.py). That way they
+survive deploys and worker restarts. Reads happen only after a `shared_cache`
+miss. Writes and hit counting run in the background and never hold up a request.
+At startup the planner pre-warms its cache from `hottest()`.
+
+Usage:
+    from app.services.persistent_cache import persistent_cache
+
+    await persistent_cache.start()                   # app startup: starts the hit flusher
+    entries = await persistent_cache.hottest(500)    # [(key, value), ...] by hit count
+    value = await persistent_cache.get("route_...")  # None if missing/expired
+    persistent_cache.put_later("route_...", value)   # write-behind, returns immediately
+    persistent_cache.record_hit("route_...")         # feeds the pre-warm ranking
+    await persistent_cache.close()                   # app shutdown: flush pending writes
+"""
+
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.core.database import db
+
+COLLECTION = "geo_cache"
+HIT_FLUSH_INTERVAL_SECONDS = 60
+
+
+class PersistentCache:
+    def __init__(self):
+        self._pending: Set[asyncio.Task] = set()
+        self._hit_counts: Counter = Counter()
+        self._flusher: Optional[asyncio.Task] = None
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.GEO_CACHE_PERSIST_ENABLED
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        self._flusher = asyncio.create_task(self._flush_hits_periodically())
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        await self._flush_hits()
+
+    async def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        try:
+            doc = await db.db[COLLECTION].find_one(
+                {"key": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                {"value": 1},
+            )
+        except Exception as e:
+            self._errors += 1
+            print(f"Persistent cache read error: {e}")
+            return None
+        if doc is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self.record_hit(key)
+        return doc["value"]
+
+    def put_later(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """Schedule an upsert without waiting for it."""
+        if not self.enabled:
+            return
+        task = asyncio.create_task(self._put(key, value, ttl or settings.GEO_CACHE_PERSIST_TTL_SECONDS))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _put(self, key: str, value: Any, ttl: int) -> None:
+        now = datetime.now(timezone.utc)
+        try:
+            await db.db[COLLECTION].update_one(
+                {"key": key},
+                {
+                    "$set": {"value": value, "updated_at": now, "expires_at": now + timedelta(seconds=ttl)},
+                    "$setOnInsert": {"hits": 0},
+                },
+                upsert=True,
+            )
+            self._writes += 1
+        except Exception as e:
+            self._errors += 1
+            print(f"Persistent cache write error: {e}")
+
+    def record_hit(self, key: str) -> None:
+        """Count a cache hit locally; counts are flushed to Mongo in batches."""
+        if self.enabled:
+            self._hit_counts[key] += 1
+
+    async def _flush_hits(self) -> None:
+        if not self._hit_counts:
+            return
+        counts, self._hit_counts = self._hit_counts, Counter()
+        try:
+            await db.db[COLLECTION].bulk_write(
+                [UpdateOne({"key": k}, {"$inc": {"hits": n}}) for k, n in counts.items()],
+                ordered=False,
+            )
+        except Exception as e:
+            self._errors += 1
+            print(f"Persistent cache hit flush error: {e}")
+
+    async def _flush_hits_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(HIT_FLUSH_INTERVAL_SECONDS)
+            await self._flush_hits()
+
+    async def hottest(self, limit: int) -> List[Tuple[str, Any]]:
+        """Return `(key, value)` for the `limit` most-hit unexpired entries."""
+        if not self.enabled or limit <= 0:
+            return []
+        try:
+            cursor = db.db[COLLECTION].find(
+                {"expires_at": {"$gt": datetime.now(timezone.utc)}}, {"key": 1, "value": 1}
+            ).sort("hits", -1).limit(limit)
+            return [(doc["key"], doc["value"]) async for doc in cursor]
+        except Exception as e:
+            self._errors += 1
+            print(f"Persistent cache pre-warm error: {e}")
+            return []
+
+    @property
+    def info(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self._hits,
+            "misses": self._misses,
+            "writes": self._writes,
+            "pending_writes": len(self._pending),
+            "errors": self._errors,
+        }
+
+
+# ─── Singleton ────────────────────────────────────────────────────────────────
+persistent_cache = PersistentCache()
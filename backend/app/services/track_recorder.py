@@ -0,0 +1,340 @@
+"""
+Compact route history for live location streams.
+
+Fixes from the trip websocket are buffered in memory per (trip, user) and
+written as chunk documents in `track_chunks`, never one document per fix:
+
+    {"trip_id", "user_id", "start": datetime, "end": datetime,
+     "points": n, "raw_points": m, "path": "<polyline>", "times": "<deltas>"}
+
+- `path` uses the Google encoded-polyline format: 1e-5 degree precision
+  (about 1 m), with each point stored as its delta from the previous one.
+  A point costs a handful of bytes instead of a full BSON document.
+- `times` holds millisecond offsets between consecutive points, encoded the
+  same way (zig-zag varints in printable characters).
+- Before encoding, a chunk is simplified with Douglas–Peucker, so points
+  closer than TRACK_SIMPLIFY_METERS to the simplified line are dropped.
+  Straight highway stretches shrink to a few points, while corners keep
+  their shape.
+
+A buffer is flushed when it reaches TRACK_CHUNK_POINTS fixes, or
+TRACK_FLUSH_SECONDS after its first fix, whichever comes first. A background
+task sweeps due buffers and writes them in one `insert_many`. The
+websocket path only appends to a list.
+
+If a write fails, its chunks are kept and retried with the next sweeps, with
+backoff, together with newer chunks. Each chunk gets its `_id` when it is
+built, so a retry of a write that did land is a duplicate-key no-op, not a
+second copy. At most MAX_RETAINED_CHUNKS are kept; beyond that the oldest are
+dropped and counted.
+
+Usage:
+    from app.services.track_recorder import track_recorder
+
+    track_recorder.start()                                  # app startup
+    track_recorder.record(trip_id, user_id, lat, lng)       # per fix, never waits
+    async for chunk in track_recorder.stream(trip_id):      # stored chunks, per user, oldest first
+        points = decode_chunk(chunk)                        # [{"lat", "lng", "timestamp"}, ...]
+    await track_recorder.close()                            # app shutdown: writes all buffers
+"""
+
+import asyncio
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.core.database import db
+
+COLLECTION = "track_chunks"
+SWEEP_INTERVAL_SECONDS = 5.0
+POLYLINE_PRECISION = 1e5
+MAX_RETAINED_CHUNKS = 2000       # unwritten chunks kept for retry (a few KB each)
+MAX_RETRY_BACKOFF_SECONDS = 300.0
+DUPLICATE_KEY = 11000
+
+# (epoch milliseconds, lat, lng)
+Fix = Tuple[int, float, float]
+
+
+# ─── Encoding ─────────────────────────────────────────────────────────────────
+
+def _encode_value(value: int, out: List[str]) -> None:
+    v = ~(value << 1) if value < 0 else value << 1
+    while v >= 0x20:
+        out.append(chr((0x20 | (v & 0x1F)) + 63))
+        v >>= 5
+    out.append(chr(v + 63))
+
+
+def _decode_values(encoded: str) -> List[int]:
+    values, shift, result = [], 0, 0
+    for ch in encoded:
+        b = ord(ch) - 63
+        result |= (b & 0x1F) << shift
+        shift += 5
+        if b < 0x20:
+            values.append(~(result >> 1) if result & 1 else result >> 1)
+            shift, result = 0, 0
+    return values
+
+
+def encode_deltas(values: List[int]) -> str:
+    """Delta + zig-zag varint encoding of an integer series."""
+    out: List[str] = []
+    prev = 0
+    for v in values:
+        _encode_value(v - prev, out)
+        prev = v
+    return "".join(out)
+
+
+def decode_deltas(encoded: str) -> List[int]:
+    values, total = [], 0
+    for delta in _decode_values(encoded):
+        total += delta
+        values.append(total)
+    return values
+
+
+def encode_polyline(points: List[Tuple[float, float]]) -> str:
+    out: List[str] = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        ilat, ilng = round(lat * POLYLINE_PRECISION), round(lng * POLYLINE_PRECISION)
+        _encode_value(ilat - prev_lat, out)
+        _encode_value(ilng - prev_lng, out)
+        prev_lat, prev_lng = ilat, ilng
+    return "".join(out)
+
+
+def decode_polyline(encoded: str) -> List[Tuple[float, float]]:
+    values = _decode_values(encoded)
+    points, lat, lng = [], 0, 0
+    for i in range(0, len(values) - 1, 2):
+        lat += values[i]
+        lng += values[i + 1]
+        points.append((lat / POLYLINE_PRECISION, lng / POLYLINE_PRECISION))
+    return points
+
+
+# ─── Simplification ───────────────────────────────────────────────────────────
+
+def _to_metres(fixes: List[Fix]) -> List[Tuple[float, float]]:
+    # Local equirectangular projection around the chunk; fine over a few km
+    lat0 = math.radians(fixes[0][1])
+    k = 6_371_000 * math.pi / 180
+    return [(lng * k * math.cos(lat0), lat * k) for _, lat, lng in fixes]
+
+
+def _segment_distance(p, a, b) -> float:
+    (px, py), (ax, ay), (bx, by) = p, a, b
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+def simplify(fixes: List[Fix], tolerance_m: float) -> List[Fix]:
+    """Douglas–Peucker (iterative): keep the fixes needed to stay within `tolerance_m` of the raw track."""
+    if len(fixes) < 3 or tolerance_m <= 0:
+        return list(fixes)
+    xy = _to_metres(fixes)
+    keep = [False] * len(fixes)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(fixes) - 1)]
+    while stack:
+        first, last = stack.pop()
+        worst, worst_at = 0.0, -1
+        for i in range(first + 1, last):
+            d = _segment_distance(xy[i], xy[first], xy[last])
+            if d > worst:
+                worst, worst_at = d, i
+        if worst > tolerance_m:
+            keep[worst_at] = True
+            stack.append((first, worst_at))
+            stack.append((worst_at, last))
+    return [f for f, k in zip(fixes, keep) if k]
+
+
+def build_chunk(trip_id: str, user_id: str, fixes: List[Fix], tolerance_m: float) -> dict:
+    kept = simplify(fixes, tolerance_m)
+    return {
+        # Set here rather than by the driver so a retried insert cannot store the chunk twice
+        "_id": ObjectId(),
+        "trip_id": trip_id,
+        "user_id": user_id,
+        "start": datetime.fromtimestamp(kept[0][0] / 1000, tz=timezone.utc),
+        "end": datetime.fromtimestamp(kept[-1][0] / 1000, tz=timezone.utc),
+        "points": len(kept),
+        "raw_points": len(fixes),
+        "path": encode_polyline([(lat, lng) for _, lat, lng in kept]),
+        "times": encode_deltas([t for t, _, _ in kept]),
+    }
+
+
+def decode_chunk(chunk: dict) -> List[dict]:
+    """[{"lat", "lng", "timestamp"}, ...] for one stored chunk."""
+    path = decode_polyline(chunk["path"])
+    offsets = decode_deltas(chunk["times"])
+    base = offsets[0] if offsets else 0
+    return [
+        {"lat": lat, "lng": lng, "timestamp": (chunk["start"] + timedelta(milliseconds=t - base)).isoformat()}
+        for (lat, lng), t in zip(path, offsets)
+    ]
+
+
+# ─── Recorder ─────────────────────────────────────────────────────────────────
+
+class _Buffer:
+    __slots__ = ("fixes", "opened_at")
+
+    def __init__(self):
+        self.fixes: List[Fix] = []
+        self.opened_at = time.monotonic()
+
+
+class TrackRecorder:
+    def __init__(self):
+        self._buffers: Dict[Tuple[str, str], _Buffer] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+        # Built chunks whose write failed, oldest first
+        self._unwritten: List[dict] = []
+        self._failures = 0
+        self._retry_at = 0.0
+        self._recorded = 0
+        self._chunks = 0
+        self._points_written = 0
+        self._bytes_written = 0
+        self._errors = 0
+        self._dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.TRACK_RECORDING_ENABLED
+
+    def start(self) -> None:
+        if self.enabled and self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_periodically())
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        await self.flush(everything=True)
+        if self._unwritten:
+            print(f"Track recorder shut down with {len(self._unwritten)} chunks unwritten")
+
+    def record(self, trip_id: str, user_id: str, lat: float, lng: float, at_ms: Optional[int] = None) -> None:
+        if not self.enabled:
+            return
+        buf = self._buffers.get((trip_id, user_id))
+        if buf is None:
+            buf = self._buffers[(trip_id, user_id)] = _Buffer()
+        buf.fixes.append((at_ms if at_ms is not None else int(time.time() * 1000), lat, lng))
+        self._recorded += 1
+
+    async def flush(self, everything: bool = False) -> int:
+        """Write every full or expired buffer (all of them if `everything`) plus earlier failed chunks.
+
+        Returns chunks written. While backing off after a failed write, new chunks are only retained.
+        """
+        now = time.monotonic()
+        due = [
+            key for key, buf in self._buffers.items()
+            if everything
+            or len(buf.fixes) >= settings.TRACK_CHUNK_POINTS
+            or now - buf.opened_at >= settings.TRACK_FLUSH_SECONDS
+        ]
+        chunks, self._unwritten = self._unwritten, []
+        for trip_id, user_id in due:
+            buf = self._buffers.pop((trip_id, user_id))
+            if not buf.fixes:
+                continue
+            try:
+                chunks.append(build_chunk(trip_id, user_id, buf.fixes, settings.TRACK_SIMPLIFY_METERS))
+            except Exception as e:
+                # Drop only this buffer; the others still get written
+                self._errors += 1
+                print(f"Track chunk for trip {trip_id} / user {user_id} dropped: {e!r}")
+        if not chunks:
+            return 0
+        if not everything and now < self._retry_at:
+            self._retain(chunks)
+            return 0
+
+        try:
+            await db.db[COLLECTION].insert_many(chunks, ordered=False)
+        except BulkWriteError as e:
+            # Unordered: every chunk was attempted. Duplicates were stored by an earlier attempt;
+            # anything else the server rejected would be rejected again, so it is not retried.
+            rejected = {err["index"] for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY}
+            for index in sorted(rejected):
+                self._errors += 1
+                print(f"Track chunk for trip {chunks[index]['trip_id']} rejected by the server")
+            chunks = [c for index, c in enumerate(chunks) if index not in rejected]
+        except Exception as e:
+            self._errors += 1
+            self._failures += 1
+            backoff = min(SWEEP_INTERVAL_SECONDS * 2 ** (self._failures - 1), MAX_RETRY_BACKOFF_SECONDS)
+            self._retry_at = now + backoff
+            self._retain(chunks)
+            print(f"Track chunk write failed, retrying {len(self._unwritten)} chunks in {backoff:.0f}s: {e!r}")
+            return 0
+        self._failures = 0
+        self._retry_at = 0.0
+        self._chunks += len(chunks)
+        self._points_written += sum(c["points"] for c in chunks)
+        self._bytes_written += sum(len(c["path"]) + len(c["times"]) for c in chunks)
+        return len(chunks)
+
+    def _retain(self, chunks: List[dict]) -> None:
+        """Keep `chunks` for the next attempt, dropping the oldest beyond MAX_RETAINED_CHUNKS."""
+        self._unwritten = chunks + self._unwritten
+        overflow = len(self._unwritten) - MAX_RETAINED_CHUNKS
+        if overflow > 0:
+            del self._unwritten[:overflow]
+            self._dropped += overflow
+            print(f"Track recorder over its retry limit, dropped the {overflow} oldest chunks")
+
+    async def _sweep_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+            try:
+                await self.flush()
+            except Exception as e:
+                # One bad sweep must not stop route history for every trip
+                print(f"Track sweep failed: {e!r}")
+
+    async def stream(self, trip_id: str, user_id: Optional[str] = None) -> AsyncIterator[dict]:
+        """Stored chunks of a trip, grouped by user and oldest first. Fixes still buffered are not included."""
+        query = {"trip_id": trip_id}
+        if user_id:
+            query["user_id"] = user_id
+        async for chunk in db.db[COLLECTION].find(query).sort([("user_id", 1), ("start", 1)]):
+            yield chunk
+
+    @property
+    def info(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "buffered_tracks": len(self._buffers),
+            "buffered_fixes": sum(len(b.fixes) for b in self._buffers.values()),
+            "fixes_recorded": self._recorded,
+            "chunks_written": self._chunks,
+            "points_written": self._points_written,
+            "encoded_bytes_written": self._bytes_written,
+            "unwritten_chunks": len(self._unwritten),
+            "chunks_dropped": self._dropped,
+            "errors": self._errors,
+        }
+
+
+# ─── Singleton ────────────────────────────────────────────────────────────────
+track_recorder = TrackRecorder()
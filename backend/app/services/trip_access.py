@@ -0,0 +1,106 @@
+"""
+Trip permission checks that read as little as possible.
+
+There are three access levels:
+- VIEW: completed trips are public, otherwise members only.
+- MEMBER: the organizer or a participant.
+- ORGANIZER: the organizer only.
+
+Each level exists in two forms:
+
+- `access_filter(trip_id, user_id, level)`: a Mongo filter that only matches
+  when the caller may act. Put it in the filter of an update, and the check and
+  the write become one conditional round trip. A miss means "not found" or
+  "forbidden". `TripAccess.deny` tells the two apart, and only on that failure
+  path.
+- `TripAccess.require(trip_id, user_id, level)`: loads the trip with the
+  minimal TRIP_ACCESS_PROJECTION and raises 404/403. Documents are memoised for
+  the lifetime of the request, so a handler never loads the same trip twice.
+
+Usage:
+    from app.services.trip_access import TripAccess, get_trip_access, access_filter, MEMBER
+
+    @router.post("/{trip_id}/things")
+    async def add_thing(trip_id: str, access: TripAccess = Depends(get_trip_access), ...):
+        result = await db.db["trips"].update_one(access_filter(trip_id, user_id, MEMBER), {...})
+        if not result.matched_count:
+            await access.deny(trip_id, user_id, MEMBER)
+"""
+
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from app.core.database import db
+
+VIEW = "view"
+MEMBER = "member"
+ORGANIZER = "organizer"
+
+TRIP_ACCESS_PROJECTION = {"id": 1, "organizer_id": 1, "status": 1, "participants.user_id": 1}
+
+_DENIED_DETAIL = {
+    VIEW: "Not authorized to view this active trip",
+    MEMBER: "Only trip members can do this",
+    ORGANIZER: "Only organizer can do this",
+}
+
+
+def is_member(trip_data: dict, user_id: str) -> bool:
+    participant_ids = [p["user_id"] for p in trip_data.get("participants", [])]
+    return user_id == trip_data["organizer_id"] or user_id in participant_ids
+
+
+def can_access(trip_data: dict, user_id: str, level: str) -> bool:
+    if level == ORGANIZER:
+        return trip_data["organizer_id"] == user_id
+    if level == VIEW and trip_data["status"] == "completed":
+        return True
+    return is_member(trip_data, user_id)
+
+
+def access_filter(trip_id: str, user_id: str, level: str) -> dict:
+    """Mongo filter matching the trip only when `user_id` has `level` access to it."""
+    if level == ORGANIZER:
+        return {"id": trip_id, "organizer_id": user_id}
+    allowed = [{"organizer_id": user_id}, {"participants.user_id": user_id}]
+    if level == VIEW:
+        allowed.append({"status": "completed"})
+    return {"id": trip_id, "$or": allowed}
+
+
+class TripAccess:
+    """Per-request memo of trips loaded for permission checks."""
+
+    def __init__(self):
+        self._trips: Dict[str, Optional[dict]] = {}
+
+    def remember(self, trip_id: str, trip_data: Optional[dict]) -> None:
+        """Seed the memo with a lookup the handler already made (None = not found)."""
+        self._trips[trip_id] = trip_data
+
+    async def load(self, trip_id: str) -> Optional[dict]:
+        if trip_id not in self._trips:
+            self._trips[trip_id] = await db.db["trips"].find_one({"id": trip_id}, TRIP_ACCESS_PROJECTION)
+        return self._trips[trip_id]
+
+    async def require(self, trip_id: str, user_id: str, level: str, detail: Optional[str] = None) -> dict:
+        """Return the projected trip, or raise 404 if it does not exist and 403 if `user_id` lacks `level`."""
+        trip_data = await self.load(trip_id)
+        if not trip_data:
+            raise HTTPException(status_code=404, detail="Trip not found")
+        if not can_access(trip_data, user_id, level):
+            raise HTTPException(status_code=403, detail=detail or _DENIED_DETAIL[level])
+        return trip_data
+
+    async def deny(self, trip_id: str, user_id: str, level: str, detail: Optional[str] = None) -> None:
+        """Raise the right error after a conditional write built from `access_filter` matched nothing."""
+        self._trips.pop(trip_id, None)  # the memo may predate the write that just missed
+        await self.require(trip_id, user_id, level, detail)
+        # Access was granted on re-read: the trip changed between the write and the check
+        raise HTTPException(status_code=409, detail="Trip changed, please retry")
+
+
+def get_trip_access() -> TripAccess:
+    """FastAPI dependency: one TripAccess per request (FastAPI caches dependencies per request)."""
+    return TripAccess()
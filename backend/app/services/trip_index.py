@@ -0,0 +1,195 @@
+"""
+Precomputed per-user trip categories for the home screen.
+
+Every (user, trip) pair has one row in `user_trip_index`:
+
+    {"user_id", "id": trip_id, "category", "updated_at"}
+
+Here `category` is one of CATEGORIES. Rows are keyed by (user_id, id), and
+(user_id, category, updated_at, id) serves each home-screen list as a single
+indexed keyset scan. `user_trip_counts` holds one document per user with the
+size of each category, so counts are a single point read.
+
+Writers call `sync_trip(trip)` after anything that changes a trip's
+organizer, participants, status or updated_at: trip creation, participant
+changes and status updates. `sync_trip` diffs the trip's members against
+their existing rows, upserts or deletes the difference, and recounts only the
+(user, category) pairs it touched. Recounts read the index instead of
+applying $inc, so two racing syncs still converge on the true counts.
+
+On the first start after deploy `ensure_built` fills the index. Every worker
+runs the lifespan hook, but only the one that wins the lock document in
+`service_state` builds; the others skip. When the build finishes it leaves a
+"built" marker there. The first build does not clear anything, so the
+upserts of a `sync_trip` that runs concurrently are kept. Only
+`scripts/rebuild_trip_index.py` clears and rebuilds from scratch.
+
+Usage:
+    from app.services.trip_index import trip_index
+
+    await trip_index.sync_trip(trip_doc)       # needs id, organizer_id, status, participants, updated_at
+    docs, next_cursor = await trip_index.list_category(user_id, "planned_by_me", cursor, limit)
+    counts = await trip_index.counts(user_id)  # {"planned_by_me": 3, ...}
+"""
+
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.core.database import db
+from app.core.pagination import fetch_page
+from app.models.trip import TRIP_SUMMARY_PROJECTION
+
+INDEX_COLLECTION = "user_trip_index"
+COUNTS_COLLECTION = "user_trip_counts"
+CATEGORIES = ("planned_by_me", "completed_by_me", "participant_active", "participant_completed")
+TRIP_INDEX_PROJECTION = {"id": 1, "organizer_id": 1, "status": 1, "participants.user_id": 1, "updated_at": 1}
+REBUILD_BATCH_SIZE = 500
+STATE_COLLECTION = "service_state"
+BUILD_LOCK = "user_trip_index_build"
+BUILT_MARKER = "user_trip_index_built"
+BUILD_LOCK_SECONDS = 30 * 60  # a crashed builder's lock can be taken over after this
+_LOCK_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def categorise(trip: dict) -> Dict[str, str]:
+    """user_id -> category for every member of `trip`."""
+    done = trip["status"] == "completed"
+    members = {
+        p["user_id"]: "participant_completed" if done else "participant_active"
+        for p in trip.get("participants", [])
+    }
+    members[trip["organizer_id"]] = "completed_by_me" if done else "planned_by_me"
+    return members
+
+
+def _row_ops(trip: dict, members: Dict[str, str]) -> List[UpdateOne]:
+    return [
+        UpdateOne(
+            {"user_id": user_id, "id": trip["id"]},
+            {"$set": {"category": category, "updated_at": trip["updated_at"]}},
+            upsert=True,
+        )
+        for user_id, category in members.items()
+    ]
+
+
+class TripCategoryIndex:
+    async def sync_trip(self, trip: dict) -> None:
+        """Bring the rows and counts of every current and former member of `trip` up to date."""
+        members = categorise(trip)
+        existing = {
+            row["user_id"]: row["category"]
+            async for row in db.db[INDEX_COLLECTION].find({"id": trip["id"]}, {"user_id": 1, "category": 1})
+        }
+
+        ops = _row_ops(trip, members)
+        ops += [DeleteOne({"user_id": uid, "id": trip["id"]}) for uid in existing if uid not in members]
+        await db.db[INDEX_COLLECTION].bulk_write(ops, ordered=False)
+
+        changed = {(uid, cat) for uid, cat in members.items() if existing.get(uid) != cat}
+        changed |= {(uid, cat) for uid, cat in existing.items() if members.get(uid) != cat}
+        await self._recount(changed)
+
+    async def _recount(self, pairs) -> None:
+        if not pairs:
+            return
+        ops = []
+        for user_id, category in pairs:
+            n = await db.db[INDEX_COLLECTION].count_documents({"user_id": user_id, "category": category})
+            ops.append(UpdateOne({"user_id": user_id}, {"$set": {category: n}}, upsert=True))
+        await db.db[COUNTS_COLLECTION].bulk_write(ops, ordered=False)
+
+    async def list_category(
+        self, user_id: str, category: str, cursor: Optional[str] = None, limit: Optional[int] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """One page of trip summaries in `category`, most recently updated first."""
+        rows, next_cursor = await fetch_page(
+            db.db[INDEX_COLLECTION], {"user_id": user_id, "category": category},
+            cursor=cursor, limit=limit, projection={"id": 1, "updated_at": 1},
+        )
+        if not rows:
+            return [], next_cursor
+        ids = [row["id"] for row in rows]
+        found = {
+            doc["id"]: doc
+            async for doc in db.db["trips"].find({"id": {"$in": ids}}, TRIP_SUMMARY_PROJECTION)
+        }
+        return [found[trip_id] for trip_id in ids if trip_id in found], next_cursor
+
+    async def counts(self, user_id: str) -> Dict[str, int]:
+        doc = await db.db[COUNTS_COLLECTION].find_one({"user_id": user_id}) or {}
+        return {category: doc.get(category, 0) for category in CATEGORIES}
+
+    async def rebuild(self, clear: bool = True) -> int:
+        """Recreate every row and count from the trips collection. Returns the number of rows written."""
+        if clear:
+            await db.db[INDEX_COLLECTION].delete_many({})
+            await db.db[COUNTS_COLLECTION].delete_many({})
+
+        rows, ops = 0, []
+        async for trip in db.db["trips"].find({}, TRIP_INDEX_PROJECTION):
+            ops += _row_ops(trip, categorise(trip))
+            if len(ops) >= REBUILD_BATCH_SIZE:
+                await db.db[INDEX_COLLECTION].bulk_write(ops, ordered=False)
+                rows, ops = rows + len(ops), []
+        if ops:
+            await db.db[INDEX_COLLECTION].bulk_write(ops, ordered=False)
+            rows += len(ops)
+
+        counts: Dict[str, Dict[str, int]] = {}
+        pipeline = [{"$group": {"_id": {"user_id": "$user_id", "category": "$category"}, "n": {"$sum": 1}}}]
+        async for row in db.db[INDEX_COLLECTION].aggregate(pipeline):
+            counts.setdefault(row["_id"]["user_id"], {})[row["_id"]["category"]] = row["n"]
+        count_ops = [UpdateOne({"user_id": uid}, {"$set": c}, upsert=True) for uid, c in counts.items()]
+        for start in range(0, len(count_ops), REBUILD_BATCH_SIZE):
+            await db.db[COUNTS_COLLECTION].bulk_write(count_ops[start:start + REBUILD_BATCH_SIZE], ordered=False)
+        await _mark_built()
+        return rows
+
+    async def ensure_built(self) -> int:
+        """Build the index on first start after deploy, in one worker only."""
+        if await _is_built():
+            return 0
+        if not await _acquire_lock(BUILD_LOCK):
+            print("Trip category index is being built by another worker")
+            return 0
+        try:
+            # Another worker may have finished a build between the check above and taking the lock
+            if await _is_built():
+                return 0
+            return await self.rebuild(clear=False)
+        finally:
+            await db.db[STATE_COLLECTION].delete_one({"_id": BUILD_LOCK, "owner": _LOCK_OWNER})
+
+
+async def _is_built() -> bool:
+    return await db.db[STATE_COLLECTION].count_documents({"_id": BUILT_MARKER}, limit=1) > 0
+
+
+async def _mark_built() -> None:
+    await db.db[STATE_COLLECTION].update_one(
+        {"_id": BUILT_MARKER}, {"$set": {"at": datetime.utcnow(), "by": _LOCK_OWNER}}, upsert=True
+    )
+
+
+async def _acquire_lock(name: str) -> bool:
+    """Take the named lock document, or an expired one left by a crashed holder."""
+    now = datetime.utcnow()
+    lock = {"owner": _LOCK_OWNER, "expires_at": now + timedelta(seconds=BUILD_LOCK_SECONDS)}
+    try:
+        await db.db[STATE_COLLECTION].insert_one({"_id": name, **lock})
+        return True
+    except DuplicateKeyError:
+        result = await db.db[STATE_COLLECTION].update_one(
+            {"_id": name, "expires_at": {"$lt": now}}, {"$set": lock}
+        )
+        return result.modified_count == 1
+
+
+# ─── Singleton ────────────────────────────────────────────────────────────────
+trip_index = TripCategoryIndex()
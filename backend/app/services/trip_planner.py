@@ -1,23 +1,67 @@
+import asyncio
 import json
 import math
-from typing import List, Dict
+import time
+from typing import Any, Awaitable, Callable, List, Dict, Optional, Tuple
 
-from app.services.cache import cache_service
+from app.core.config import settings
+from app.services.autocomplete_index import autocomplete_index, normalise_query
+from app.services.cache import shared_cache
+from app.services.geomaps import geomaps_client
+from app.services.persistent_cache import persistent_cache
 from app.models.trip import Location, Leg
 
+LOCAL_CACHE_TTL_SECONDS = 3600
+AUTOCOMPLETE_LIMIT = 5
+
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Route-cache lookups split by how the entry matched the requested coordinates
+_route_cache_stats = {"exact_hits": 0, "quantised_hits": 0, "misses": 0}
+
+# Upstream routing failures that fell back to the haversine estimate
+_upstream_stats = {"upstream_timeouts": 0, "upstream_errors": 0}
+
+# Single-flight: cache key -> the one task computing it on this worker
+_inflight: Dict[str, asyncio.Task] = {}
+_flight_stats = {"computations": 0, "coalesced": 0, "stale_served": 0, "revalidations": 0}
 
-def _get_maps_client():
-    """Lazily initialise the GeoMaps client so settings are fully loaded from .env first."""
-    try:
-        from geomaps_sdk.maps_sdk import LocationClient, GeoapifyProvider
-        from app.core.config import settings
-        if not settings.GEOMAPS_API_KEY:
-            return None
-        provider = GeoapifyProvider(api_key=settings.GEOMAPS_API_KEY)
-        return LocationClient(provider=provider)
-    except Exception as e:
-        print(f"GeoMaps SDK init error: {e}")
-        return None
+
+def _geohash(lat: float, lng: float, length: int) -> str:
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < length:
+        rng, val = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if val >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def _quantise(loc: Location) -> str:
+    """Snap a coordinate to the configured route-cache cell."""
+    if settings.ROUTE_CACHE_KEY_MODE == "geohash":
+        return _geohash(loc.lat, loc.lng, settings.ROUTE_CACHE_GEOHASH_LENGTH)
+    p = settings.ROUTE_CACHE_PRECISION
+    # `+ 0.0` folds -0.0 into 0.0 so both sides of the equator/meridian share a key
+    return f"{round(loc.lat, p) + 0.0:.{p}f},{round(loc.lng, p) + 0.0:.{p}f}"
+
+
+def _route_cache_key(src: Location, dest: Location) -> str:
+    a, b = _quantise(src), _quantise(dest)
+    if settings.ROUTE_CACHE_SYMMETRIC and b < a:
+        a, b = b, a
+    return f"route_{a}_{b}"
 
 
 class TripPlannerService:
@@ -31,90 +75,217 @@ class TripPlannerService:
         return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
     @staticmethod
-    def get_autocomplete(query: str) -> List[Dict]:
-        cache_key = f"autocomplete_{query.replace(' ', '_')}"
-        cached = cache_service.get(cache_key)
-        if cached is not None:
-            return cached
-
-        results = []
-        maps_client = _get_maps_client()
-        if maps_client:
-            try:
-                api_results = maps_client.autocomplete(query, limit=5)
-                for res in api_results:
-                    results.append({
-                        "name": res.address.formatted_address or res.address.city or query,
-                        "lat": res.location.latitude,
-                        "lng": res.location.longitude,
-                    })
-            except Exception as e:
-                print(f"GeoMaps autocomplete error: {e}")
-
-        # Fallback: deterministic hash-derived coords so different cities differ
-        if not results:
-            h = sum(ord(c) * (i + 1) for i, c in enumerate(query.lower()))
-            lat  = -60.0 + (h % 1200) / 10.0
-            lng  = -170.0 + (h % 3400) / 10.0
-            lat2 = -60.0 + ((h + 137) % 1200) / 10.0
-            lng2 = -170.0 + ((h + 137) % 3400) / 10.0
-            results = [
-                {"name": f"{query} City", "lat": round(lat, 4),  "lng": round(lng, 4)},
-                {"name": f"{query} Town", "lat": round(lat2, 4), "lng": round(lng2, 4)},
-            ]
-
-        cache_service.set(cache_key, results, ttl=3600)
+    async def _store(cache_key: str, value: Any) -> None:
+        """Cache `value` as fresh for LOCAL_CACHE_TTL_SECONDS, then servable-but-stale for the SWR window."""
+        envelope = {"value": value, "fresh_until": time.time() + LOCAL_CACHE_TTL_SECONDS}
+        await shared_cache.set(
+            cache_key, envelope, ttl=LOCAL_CACHE_TTL_SECONDS + settings.PLANNER_STALE_WHILE_REVALIDATE_SECONDS
+        )
+
+    @staticmethod
+    async def _cached(cache_key: str) -> Optional[Tuple[Any, bool]]:
+        """Look up `shared_cache`, then the durable Mongo tier. Returns `(value, is_stale)` or None."""
+        envelope = await shared_cache.get(cache_key)
+        # Entries written by an older release (no envelope) are treated as misses
+        if isinstance(envelope, dict) and "fresh_until" in envelope:
+            persistent_cache.record_hit(cache_key)
+            return envelope["value"], time.time() >= envelope["fresh_until"]
+        value = await persistent_cache.get(cache_key)
+        if value is not None:
+            await TripPlannerService._store(cache_key, value)
+            return value, False
+        return None
+
+    @staticmethod
+    def _flight(cache_key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[asyncio.Task, bool]:
+        """Return the in-flight computation for `cache_key`, starting one if none is running.
+
+        The computation runs as its own task so a cancelled caller (client disconnect)
+        never cancels it for the other waiters.
+        """
+        task = _inflight.get(cache_key)
+        if task is not None:
+            return task, False
+        task = asyncio.create_task(compute())
+        _inflight[cache_key] = task
+
+        def _done(t: asyncio.Task) -> None:
+            _inflight.pop(cache_key, None)
+            if not t.cancelled():
+                t.exception()  # mark retrieved even if every waiter went away
+
+        task.add_done_callback(_done)
+        return task, True
+
+    @staticmethod
+    async def _get_or_compute(cache_key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Serve from cache, coalescing concurrent misses onto one computation.
+
+        Returns `(value, was_cached)`. Stale entries are returned immediately while
+        a single background refresh runs.
+        """
+        hit = await TripPlannerService._cached(cache_key)
+        if hit is not None:
+            value, stale = hit
+            if stale:
+                _flight_stats["stale_served"] += 1
+                _, started = TripPlannerService._flight(cache_key, compute)
+                if started:
+                    _flight_stats["revalidations"] += 1
+            return value, True
+
+        task, started = TripPlannerService._flight(cache_key, compute)
+        _flight_stats["computations" if started else "coalesced"] += 1
+        return await asyncio.shield(task), False
+
+    @staticmethod
+    async def get_autocomplete(query: str) -> List[Dict]:
+        normalised = normalise_query(query)
+        local = autocomplete_index.lookup(normalised, AUTOCOMPLETE_LIMIT)
+        if local is not None:
+            return local
+        cache_key = f"autocomplete_{normalised}"
+
+        async def _compute() -> List[Dict]:
+            results = []
+            if geomaps_client.enabled:
+                try:
+                    results = await geomaps_client.autocomplete(query, limit=AUTOCOMPLETE_LIMIT)
+                except Exception as e:
+                    print(f"GeoMaps autocomplete error: {e}")
+            if results:
+                autocomplete_index.add_results(normalised, results, AUTOCOMPLETE_LIMIT)
+                persistent_cache.put_later(cache_key, results)
+
+            # Fallback: deterministic hash-derived coords so different cities differ
+            if not results:
+                h = sum(ord(c) * (i + 1) for i, c in enumerate(query.lower()))
+                lat  = -60.0 + (h % 1200) / 10.0
+                lng  = -170.0 + (h % 3400) / 10.0
+                lat2 = -60.0 + ((h + 137) % 1200) / 10.0
+                lng2 = -170.0 + ((h + 137) % 3400) / 10.0
+                results = [
+                    {"name": f"{query} City", "lat": round(lat, 4),  "lng": round(lng, 4)},
+                    {"name": f"{query} Town", "lat": round(lat2, 4), "lng": round(lng2, 4)},
+                ]
+
+            await TripPlannerService._store(cache_key, results)
+            return results
+
+        results, _ = await TripPlannerService._get_or_compute(cache_key, _compute)
         return results
 
     @staticmethod
-    def calculate_leg(src: Location, dest: Location) -> Leg:
-        cache_key = f"route_{src.lat}_{src.lng}_{dest.lat}_{dest.lng}"
-        cached = cache_service.get(cache_key)
-        if cached is not None:
-            return Leg(**cached)
-
-        leg = None
-        maps_client = _get_maps_client()
-        if maps_client:
+    def _haversine_leg(src: Location, dest: Location) -> Leg:
+        dist_km = TripPlannerService._haversine(src.lat, src.lng, dest.lat, dest.lng)
+        return Leg(
+            distance_km=round(dist_km, 2),
+            estimated_time_mins=int((dist_km / 60) * 60),
+        )
+
+    @staticmethod
+    async def _route_upstream(src: Location, dest: Location) -> Optional[Leg]:
+        if not geomaps_client.enabled:
+            return None
+        route = await geomaps_client.route(src.lat, src.lng, dest.lat, dest.lng)
+        return Leg(
+            distance_km=round(float(route["distance_km"]), 2),
+            estimated_time_mins=int(route["duration_minutes"]),
+        )
+
+    @staticmethod
+    async def calculate_leg(src: Location, dest: Location, timeout: Optional[float] = None) -> Leg:
+        cache_key = _route_cache_key(src, dest)
+        timeout = timeout if timeout is not None else settings.GEOMAPS_LEG_TIMEOUT_SECONDS
+
+        async def _compute() -> Dict:
+            leg = None
+            timed_out = False
             try:
-                from geomaps_sdk.maps_sdk import GeoPoint
-                src_pt  = GeoPoint(latitude=src.lat,  longitude=src.lng)
-                dest_pt = GeoPoint(latitude=dest.lat, longitude=dest.lng)
-                route = maps_client.route(src_pt, dest_pt)
-                leg = Leg(
-                    distance_km=round(float(route.distance_km), 2),
-                    estimated_time_mins=int(route.duration_minutes),
+                leg = await asyncio.wait_for(
+                    TripPlannerService._route_upstream(src, dest),
+                    timeout=timeout,
                 )
+            except asyncio.TimeoutError:
+                timed_out = True
+                _upstream_stats["upstream_timeouts"] += 1
+                print(f"GeoMaps route timed out after {timeout}s, using haversine fallback")
             except Exception as e:
+                _upstream_stats["upstream_errors"] += 1
                 print(f"GeoMaps route error: {e}")
 
-        if not leg:
-            dist_km = TripPlannerService._haversine(src.lat, src.lng, dest.lat, dest.lng)
-            leg = Leg(
-                distance_km=round(dist_km, 2),
-                estimated_time_mins=int((dist_km / 60) * 60),
-            )
+            from_upstream = leg is not None
+            if not leg:
+                leg = TripPlannerService._haversine_leg(src, dest)
+
+            entry = {"leg": leg.dict(), "src": [src.lat, src.lng], "dest": [dest.lat, dest.lng]}
+            # A timeout is transient — don't pin the straight-line estimate for an hour.
+            if not timed_out:
+                await TripPlannerService._store(cache_key, entry)
+            # Only real upstream routes are worth keeping across restarts.
+            if from_upstream:
+                persistent_cache.put_later(cache_key, entry)
+            return entry
+
+        entry, was_cached = await TripPlannerService._get_or_compute(cache_key, _compute)
+        if not was_cached:
+            _route_cache_stats["misses"] += 1
+        elif {tuple(entry["src"]), tuple(entry["dest"])} == {(src.lat, src.lng), (dest.lat, dest.lng)}:
+            _route_cache_stats["exact_hits"] += 1
+        else:
+            _route_cache_stats["quantised_hits"] += 1
+        return Leg(**entry["leg"])
+
+    @staticmethod
+    def single_flight_stats() -> Dict:
+        """Upstream computations started vs. callers coalesced onto one, plus stale-while-revalidate counts."""
+        return {**_flight_stats, "in_flight": len(_inflight)}
+
+    @staticmethod
+    async def prewarm(limit: int) -> int:
+        """Load the hottest durable entries into `shared_cache`. Returns how many were loaded."""
+        warmed = 0
+        for key, value in await persistent_cache.hottest(limit):
+            await TripPlannerService._store(key, value)
+            warmed += 1
+        return warmed
 
-        cache_service.set(cache_key, leg.dict(), ttl=3600)
-        return leg
+    @staticmethod
+    def route_cache_stats() -> Dict:
+        """Route-cache hit counts split into exact-coordinate and quantised (nearby) hits, plus upstream fallbacks."""
+        lookups = sum(_route_cache_stats.values())
+        hits = _route_cache_stats["exact_hits"] + _route_cache_stats["quantised_hits"]
+        return {
+            **_route_cache_stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "key_mode": settings.ROUTE_CACHE_KEY_MODE,
+            "precision": (settings.ROUTE_CACHE_GEOHASH_LENGTH if settings.ROUTE_CACHE_KEY_MODE == "geohash"
+                          else settings.ROUTE_CACHE_PRECISION),
+            "symmetric": settings.ROUTE_CACHE_SYMMETRIC,
+            **_upstream_stats,
+        }
 
     @staticmethod
-    def calculate_trip_itinerary(
+    async def calculate_trip_itinerary(
         source: Location,
         destination: Location,
         stops: List[Location],
         avg_daily_dist: float,
+        concurrency: Optional[int] = None,
     ) -> Dict:
         points = [source] + stops + [destination]
-        legs = []
-        total_dist = 0.0
-        total_time = 0
-
-        for i in range(len(points) - 1):
-            leg = TripPlannerService.calculate_leg(points[i], points[i + 1])
-            legs.append(leg)
-            total_dist += leg.distance_km
-            total_time += leg.estimated_time_mins
+        semaphore = asyncio.Semaphore(max(1, concurrency or settings.GEOMAPS_ROUTE_CONCURRENCY))
+
+        async def _bounded_leg(src: Location, dest: Location) -> Leg:
+            async with semaphore:
+                return await TripPlannerService.calculate_leg(src, dest)
+
+        # All legs are routed concurrently; gather keeps them in itinerary order.
+        legs: List[Leg] = await asyncio.gather(
+            *(_bounded_leg(points[i], points[i + 1]) for i in range(len(points) - 1))
+        )
+        total_dist = sum(leg.distance_km for leg in legs)
+        total_time = sum(leg.estimated_time_mins for leg in legs)
 
         days_needed = math.ceil(total_dist / avg_daily_dist) if avg_daily_dist > 0 else 1
 
@@ -0,0 +1,139 @@
+"""
+Full-text search over completed trips for the home feed.
+
+The search box queries as the user types, so the last term of a query is
+usually unfinished ("man" on the way to "manali"). Whole words and that
+trailing prefix are matched differently:
+
+- Finished words use the `trips_text` index (see app/core/indexes.py). It is
+  a compound text index: `status` is the equality prefix, then title,
+  destination, source and stop names, with title weighted highest. Text
+  indexes match whole tokens only.
+- The trailing term is matched as an escaped, anchored `^prefix` regex on
+  `search_terms`, the normalised words of those same fields (see
+  `trip_search_terms`). It is written on insert and backfilled by
+  scripts/backfill_trip_search.py. Alone it is an index range scan on
+  (status, search_terms). Next to finished words it filters the text-index
+  matches.
+
+A query that ends in whitespace has no trailing prefix: every term is
+treated as finished.
+
+Ranking mixes relevance with recency, and the rank does not depend on the
+current time:
+
+    rank = ln(textScore) + updated_at / FEED_SEARCH_RECENCY_DAYS
+
+(a prefix-only query has no text score and ranks by recency alone). Each
+FEED_SEARCH_RECENCY_DAYS of recency counts as much as an e-times (≈2.7×)
+better text match. Because the rank is stable, it works as a keyset
+pagination key. The ranked (rank, id) list for a normalised query (the best
+FEED_SEARCH_MAX_RESULTS matches) is cached per worker, so paging and repeated
+searches only fetch the page's summaries by id.
+
+Usage:
+    from app.services.trip_search import search_completed_trips, trip_search_terms
+
+    terms = trip_search_terms(trip_doc)        # store as `search_terms` on insert
+    docs, next_cursor = await search_completed_trips("goa bea", cursor=None, limit=20)
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.pagination import clamp_page_size, decode_cursor, encode_cursor
+from app.models.trip import TRIP_SUMMARY_PROJECTION
+from app.services.autocomplete_index import normalise_query
+from app.services.cache import InMemoryCache
+
+MAX_TERMS = 8
+_MS_PER_DAY = 24 * 3600 * 1000
+
+# "words|prefix" -> [(rank, id), ...] best first
+_ranking_cache = InMemoryCache(maxsize=2000, ttl=settings.FEED_SEARCH_CACHE_TTL_SECONDS)
+
+
+def _words(text: str) -> List[str]:
+    return [w for w in re.split(r"[^\w]+", normalise_query(text)) if w]
+
+
+def trip_search_terms(trip: dict) -> List[str]:
+    """Normalised words of the title and place names; store as `search_terms` on the trip document."""
+    names = [trip.get("title") or ""]
+    names += [(place or {}).get("name") or "" for place in (trip.get("source"), trip.get("destination"))]
+    names += [stop.get("name") or "" for stop in trip.get("stops") or []]
+    return list(dict.fromkeys(w for name in names for w in _words(name)))
+
+
+def parse_search(text: str) -> Tuple[str, str]:
+    """(finished words for $search, trailing prefix) with operators stripped; words sorted so order doesn't matter."""
+    terms = _words(text)
+    prefix = "" if not terms or text[-1:].isspace() else terms.pop()
+    words = sorted(set(terms) - {prefix})[:MAX_TERMS]
+    return " ".join(words), prefix
+
+
+def build_rank_pipeline(words: str, prefix: str, max_results: int) -> list:
+    """Aggregation returning [{"id", "rank"}] for completed trips matching `words` and `prefix`, best first."""
+    recency_ms = settings.FEED_SEARCH_RECENCY_DAYS * _MS_PER_DAY
+    match: dict = {"status": "completed"}
+    rank: list = [{"$divide": [{"$toLong": "$updated_at"}, recency_ms]}]
+    if words:
+        match["$text"] = {"$search": words}
+        rank.insert(0, {"$ln": {"$meta": "textScore"}})
+    if prefix:
+        match["search_terms"] = {"$regex": "^" + re.escape(prefix)}
+    return [
+        {"$match": match},
+        {"$project": {"_id": 0, "id": 1, "rank": {"$add": rank}}},
+        {"$sort": {"rank": -1, "id": -1}},
+        {"$limit": max_results},
+    ]
+
+
+async def _ranking(words: str, prefix: str) -> List[Tuple[float, str]]:
+    key = f"{words}|{prefix}"
+    ranked = _ranking_cache.get(key)
+    if ranked is None:
+        cursor = db.db["trips"].aggregate(build_rank_pipeline(words, prefix, settings.FEED_SEARCH_MAX_RESULTS))
+        ranked = [(doc["rank"], doc["id"]) async for doc in cursor]
+        _ranking_cache.set(key, ranked)
+    return ranked
+
+
+async def search_completed_trips(
+    text: str, cursor: Optional[str] = None, limit: Optional[int] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """One page of trip summaries for `text`, best first, and the token for the next page."""
+    words, prefix = parse_search(text)
+    if not words and not prefix:
+        return [], None
+    limit = clamp_page_size(limit)
+    ranked = await _ranking(words, prefix)
+
+    start = 0
+    if cursor:
+        after = decode_cursor(cursor)
+        start = next((i for i, entry in enumerate(ranked) if entry < after), len(ranked))
+    page = ranked[start:start + limit]
+    if not page:
+        return [], None
+
+    ids = [trip_id for _, trip_id in page]
+    found = {
+        doc["id"]: doc
+        async for doc in db.db["trips"].find({"id": {"$in": ids}, "status": "completed"}, TRIP_SUMMARY_PROJECTION)
+    }
+    docs = [found[trip_id] for trip_id in ids if trip_id in found]
+
+    next_cursor = None
+    if start + limit < len(ranked):
+        rank, trip_id = page[-1]
+        next_cursor = encode_cursor({"rank": rank, "id": trip_id}, "rank")
+    return docs, next_cursor
+
+
+def search_cache_stats() -> dict:
+    return _ranking_cache.info
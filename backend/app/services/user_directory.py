@@ -0,0 +1,129 @@
+"""
+User directory: batched display-info lookups and indexed user search.
+
+Anywhere a response renders user references (crew request senders, comment
+authors, expense payers, crew lists), load them through a `UserLoader`: all
+ids in one `$in` query with a display-only projection instead of one
+`find_one` per row. Each loader memoises what it has fetched (including ids
+that do not exist), so a request never looks up the same user twice.
+
+Usage:
+    from app.services.user_directory import UserLoader, get_user_loader
+
+    @router.get("/things")
+    async def list_things(users: UserLoader = Depends(get_user_loader)):
+        people = await users.load_many(t["user_id"] for t in things)   # {id: display dict}
+        author = await users.load(thing["user_id"])                    # dict or None
+
+    crew = await UserLoader(CREW_MEMBER_PROJECTION).load_many(ids)      # display info + profile_settings
+
+Search matches lower-cased, accent-stripped word prefixes stored on each user
+as `search_terms` (username, email, email local part, full name and its words).
+That field has a multikey index. The escaped, anchored `^prefix` regex becomes
+an index range scan, never a collection scan. Results are cached per prefix
+for a few seconds. A cached prefix that returned a complete result set answers
+every longer prefix locally, so typing "jo", "joh", "john" costs one query.
+
+    terms = user_search_terms(username, email, full_name)   # store on insert/update
+    results = await search_users("Joh", exclude_id=me.id)   # [{"id", "username", "email"}]
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.database import db
+from app.services.autocomplete_index import normalise_query
+from app.services.cache import InMemoryCache
+
+USER_DISPLAY_PROJECTION = {"id": 1, "username": 1, "email": 1, "full_name": 1, "profile_photo": 1}
+# Crew lists also carry each member's vehicles, which trip planning offers as seats
+CREW_MEMBER_PROJECTION = {**USER_DISPLAY_PROJECTION, "profile_settings": 1}
+SEARCH_RESULT_PROJECTION = {"id": 1, "username": 1, "email": 1, "search_terms": 1}
+SEARCH_LIMIT = 20
+MAX_QUERY_LENGTH = 64
+
+
+class UserLoader:
+    """Per-request memo of user display info, filled in batches."""
+
+    def __init__(self, projection: Optional[dict] = None):
+        self._projection = projection or USER_DISPLAY_PROJECTION
+        self._users: Dict[str, Optional[dict]] = {}
+
+    async def load_many(self, user_ids: Iterable[str]) -> Dict[str, dict]:
+        """Display info for every existing id in `user_ids`, fetched in at most one query."""
+        wanted = list(dict.fromkeys(user_ids))
+        missing = [uid for uid in wanted if uid not in self._users]
+        if missing:
+            cursor = db.db["users"].find({"id": {"$in": missing}}, self._projection)
+            found = {u["id"]: u async for u in cursor}
+            for uid in missing:
+                self._users[uid] = found.get(uid)
+        return {uid: self._users[uid] for uid in wanted if self._users[uid] is not None}
+
+    async def load(self, user_id: str) -> Optional[dict]:
+        return (await self.load_many([user_id])).get(user_id)
+
+
+def get_user_loader() -> UserLoader:
+    """FastAPI dependency: one UserLoader per request."""
+    return UserLoader()
+
+
+# ─── Search ───────────────────────────────────────────────────────────────────
+
+def user_search_terms(username: str, email: str, full_name: Optional[str] = None) -> List[str]:
+    """Normalised prefixes a user can be found by; store as `search_terms` on the user document."""
+    terms = [normalise_query(username), normalise_query(email), normalise_query(email.split("@")[0])]
+    if full_name:
+        name = normalise_query(full_name)
+        terms += [name, *name.split()]
+    return [t for t in dict.fromkeys(terms) if t]
+
+
+# normalised prefix -> (raw results incl. search_terms, complete?)
+_search_cache = InMemoryCache(maxsize=5000, ttl=settings.USER_SEARCH_CACHE_TTL_SECONDS)
+
+
+def _matches(user: dict, prefix: str) -> bool:
+    return any(t.startswith(prefix) for t in user.get("search_terms", []))
+
+
+async def _search_prefix(prefix: str) -> List[dict]:
+    """Users with a search term starting with `prefix`, served from the cache when possible."""
+    cached = _search_cache.get(prefix)
+    if cached is not None:
+        return cached[0]
+
+    # A shorter prefix whose result set was complete already contains every match
+    for end in range(len(prefix) - 1, 0, -1):
+        shorter = _search_cache.get(prefix[:end])
+        if shorter is not None and shorter[1]:
+            results = [u for u in shorter[0] if _matches(u, prefix)]
+            _search_cache.set(prefix, (results, True))
+            return results
+
+    # +1 so a page stays full after the caller is filtered out
+    fetch = SEARCH_LIMIT + 1
+    cursor = db.db["users"].find(
+        {"search_terms": {"$regex": "^" + re.escape(prefix)}}, SEARCH_RESULT_PROJECTION
+    ).limit(fetch)
+    results = await cursor.to_list(length=fetch)
+    _search_cache.set(prefix, (results, len(results) < fetch))
+    return results
+
+
+async def search_users(query: str, exclude_id: Optional[str] = None, limit: int = SEARCH_LIMIT) -> List[dict]:
+    prefix = normalise_query(query)[:MAX_QUERY_LENGTH]
+    if not prefix:
+        return []
+    results = await _search_prefix(prefix)
+    return [
+        {"id": u["id"], "username": u["username"], "email": u["email"]}
+        for u in results if u["id"] != exclude_id
+    ][:limit]
+
+
+def search_cache_stats() -> dict:
+    return _search_cache.info
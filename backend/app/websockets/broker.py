@@ -0,0 +1,320 @@
+"""
+Pub/sub broker under ConnectionManager, so trip rooms span uvicorn workers.
+
+`ConnectionManager` delivers a broadcast to its own sockets directly and
+publishes it through the broker. Other workers that have sockets in the same
+trip receive it and deliver it locally. Workers subscribe to a trip when its
+first local socket joins and unsubscribe when the last one leaves.
+
+Backends (WS_BROKER):
+- memory: in-process only. Correct only with a single worker; chosen with
+  WORKERS > 1 it logs a warning at startup, because members on different
+  workers would not see each other.
+- mongo (default): events are appended to a small capped collection (`ws_events`,
+  WS_BROKER_CAPPED_BYTES). Each worker with at least one subscribed trip
+  follows it with one tailable/await cursor, which the server wakes as soon as
+  an event is inserted. Events from unsubscribed trips and the worker's own
+  events are skipped. This needs nothing beyond the MongoDB the API already
+  uses and works across nodes. A replica set is not required, unlike change
+  streams.
+
+Publishing never waits on Mongo: `publish()` appends to a bounded outbox
+(WS_BROKER_PUBLISH_QUEUE_SIZE) and one background task writes whatever has
+queued up in a single ordered `insert_many`, up to WS_BROKER_PUBLISH_BATCH_SIZE
+events at a time. If the database falls that far behind, the oldest queued
+events are dropped (live frames are worth less the older they get) and
+counted in `info["dropped"]`.
+
+A tail that has to reopen its cursor resumes in insertion (`$natural`) order
+just after the last event it saw. ObjectIds from different processes are not
+ordered, so `_id > last` would skip or repeat events.
+
+Usage:
+    from app.websockets.broker import build_broker
+
+    broker = build_broker(settings.WS_BROKER, on_message=deliver_local)
+    await broker.start()
+    await broker.subscribe(trip_id)                    # first local socket joined
+    broker.publish(trip_id, payload, coalesce_key)     # queued, never waits
+    await broker.unsubscribe(trip_id)                  # last local socket left
+    await broker.close()                               # writes out the outbox
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional, Set
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from app.core.config import settings
+from app.core.database import db
+
+# on_message(trip_id, payload, coalesce_key)
+MessageHandler = Callable[[str, str, Optional[str]], Awaitable[None]]
+
+EVENTS_COLLECTION = "ws_events"
+CLOSE_TIMEOUT_SECONDS = 5.0
+RETRY_PAUSE_SECONDS = 0.5
+# A reopened tail only re-reads events published this recently (publisher clock) to find its place
+RESUME_WINDOW_SECONDS = 300
+
+
+class Broker(ABC):
+    def __init__(self, on_message: MessageHandler):
+        self._on_message = on_message
+        self._subscriptions: Set[str] = set()
+        self._published = 0
+        self._received = 0
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def subscribe(self, trip_id: str) -> None:
+        self._subscriptions.add(trip_id)
+
+    async def unsubscribe(self, trip_id: str) -> None:
+        self._subscriptions.discard(trip_id)
+
+    @abstractmethod
+    def publish(self, trip_id: str, payload: str, coalesce_key: Optional[str] = None) -> None:
+        """Deliver to every *other* worker's sockets in `trip_id` (local delivery is the caller's job). Never waits."""
+
+    @property
+    def info(self) -> dict:
+        return {
+            "backend": type(self).__name__,
+            "subscriptions": len(self._subscriptions),
+            "published": self._published,
+            "received": self._received,
+        }
+
+
+class InProcessBroker(Broker):
+    """Single-process deployments: there are no other workers to reach."""
+
+    def publish(self, trip_id: str, payload: str, coalesce_key: Optional[str] = None) -> None:
+        self._published += 1
+
+
+class MongoBroker(Broker):
+    def __init__(
+        self,
+        on_message: MessageHandler,
+        capped_bytes: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ):
+        super().__init__(on_message)
+        self._capped_bytes = capped_bytes or settings.WS_BROKER_CAPPED_BYTES
+        self._batch_size = batch_size or settings.WS_BROKER_PUBLISH_BATCH_SIZE
+        self._origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._collection_ready = False
+        # Outbox: a full deque drops its oldest event on append
+        self._outbox: Deque[dict] = deque(maxlen=queue_size or settings.WS_BROKER_PUBLISH_QUEUE_SIZE)
+        self._outbox_ready = asyncio.Event()
+        self._publisher: Optional[asyncio.Task] = None
+        self._writing = False
+        self._tailer: Optional[asyncio.Task] = None
+        # Serialises starting/stopping the tailer: subscribe and unsubscribe await in between
+        self._tailer_lock = asyncio.Lock()
+        # (_id, ts) of the last event the tail saw, (None, 0) if there was none; None = not placed yet
+        self._position: Optional[tuple] = None
+        self._batches = 0
+        self._dropped = 0
+        self._errors = 0
+        self._lag_total = 0.0
+
+    @property
+    def _events(self):
+        # Raw Motor collection: events keep their _id, which the tail resumes from
+        return db.db._delegate[EVENTS_COLLECTION]
+
+    async def _ensure_collection(self) -> bool:
+        """Create the capped collection once. A plain insert would create an uncapped one that cannot be tailed."""
+        if self._collection_ready:
+            return True
+        try:
+            await db.db._delegate.create_collection(EVENTS_COLLECTION, capped=True, size=self._capped_bytes)
+        except CollectionInvalid:
+            pass  # already exists (another worker created it)
+        except PyMongoError as e:
+            self._errors += 1
+            print(f"WS broker could not create {EVENTS_COLLECTION}, will retry: {e}")
+            return False
+        self._collection_ready = True
+        return True
+
+    async def start(self) -> None:
+        await self._ensure_collection()
+        if self._publisher is None:
+            self._publisher = asyncio.create_task(self._publish_loop())
+
+    async def close(self) -> None:
+        async with self._tailer_lock:
+            self._subscriptions.clear()
+            await self._stop_tailer()
+        if self._publisher is not None:
+            deadline = time.monotonic() + CLOSE_TIMEOUT_SECONDS
+            while (self._outbox or self._writing) and not self._publisher.done() and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            if self._outbox:
+                print(f"WS broker shut down with {len(self._outbox)} events unpublished")
+            self._publisher.cancel()
+            await asyncio.gather(self._publisher, return_exceptions=True)
+            self._publisher = None
+
+    async def subscribe(self, trip_id: str) -> None:
+        async with self._tailer_lock:
+            await super().subscribe(trip_id)
+            if self._tailer is None:
+                # Place the tail at the newest event now, so nothing published after this returns is missed
+                await self._place_at_newest()
+                self._tailer = asyncio.create_task(self._tail())
+
+    async def unsubscribe(self, trip_id: str) -> None:
+        async with self._tailer_lock:
+            await super().unsubscribe(trip_id)
+            # A subscribe may have re-added trips while this waited for the lock
+            if not self._subscriptions:
+                await self._stop_tailer()
+
+    def publish(self, trip_id: str, payload: str, coalesce_key: Optional[str] = None) -> None:
+        if len(self._outbox) == self._outbox.maxlen:
+            self._dropped += 1
+        self._outbox.append({
+            "trip_id": trip_id,
+            "payload": payload,
+            "key": coalesce_key,
+            "origin": self._origin,
+            "ts": time.time(),
+        })
+        self._outbox_ready.set()
+
+    def _next_batch(self) -> List[dict]:
+        batch = []
+        while self._outbox and len(batch) < self._batch_size:
+            batch.append(self._outbox.popleft())
+        if not self._outbox:
+            self._outbox_ready.clear()
+        return batch
+
+    async def _publish_loop(self) -> None:
+        while True:
+            await self._outbox_ready.wait()
+            # Everything queued while the previous insert was in flight goes out together
+            batch = self._next_batch()
+            if not batch:
+                continue
+            self._writing = True
+            try:
+                if await self._ensure_collection():
+                    await self._events.insert_many(batch, ordered=True)
+                    self._published += len(batch)
+                    self._batches += 1
+                    continue
+            except Exception as e:
+                self._errors += 1
+                print(f"WS broker publish of {len(batch)} events failed: {e!r}")
+            finally:
+                self._writing = False
+            # Live frames go stale fast: drop this batch rather than retry it, and back off
+            self._dropped += len(batch)
+            await asyncio.sleep(RETRY_PAUSE_SECONDS)
+
+    async def _stop_tailer(self) -> None:
+        # Callers hold _tailer_lock
+        tailer, self._tailer = self._tailer, None
+        if tailer:
+            tailer.cancel()
+            await asyncio.gather(tailer, return_exceptions=True)
+        self._position = None
+
+    async def _place_at_newest(self) -> bool:
+        """Point the tail at the newest stored event. Returns False if Mongo could not be asked."""
+        try:
+            newest = await self._events.find_one({}, {"_id": 1, "ts": 1}, sort=[("$natural", -1)])
+        except PyMongoError as e:
+            # The tail retries; until then events are skipped, not delivered twice
+            self._errors += 1
+            print(f"WS broker could not find the newest event: {e}")
+            return False
+        self._position = (newest["_id"], newest["ts"]) if newest else (None, 0.0)
+        return True
+
+    async def _resume_query(self) -> Optional[dict]:
+        """Filter for reopening the tail at `_position`, or None to start from the oldest event."""
+        last_id, last_ts = self._position
+        if last_id is None:
+            return None  # the collection was empty when placed: every event is new
+        if not await self._events.find_one({"_id": last_id}, {"_id": 1}):
+            # The capped collection wrapped past our place; whatever was in between is gone
+            print("WS broker tail fell behind the capped collection; resuming at the newest event")
+            await self._place_at_newest()
+            return await self._resume_query()
+        return {"ts": {"$gte": last_ts - RESUME_WINDOW_SECONDS}}
+
+    async def _tail(self) -> None:
+        while True:
+            cursor = None
+            try:
+                if self._position is None and not await self._place_at_newest():
+                    raise PyMongoError("tail is not placed")
+                query = await self._resume_query()
+                # Natural order; events up to and including our last one are skipped client side
+                skip_until = self._position[0] if query is not None else None
+                cursor = self._events.find(query or {}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for event in cursor:
+                        if skip_until is not None:
+                            if event["_id"] == skip_until:
+                                skip_until = None
+                            continue
+                        self._position = (event["_id"], event["ts"])
+                        if event["origin"] == self._origin or event["trip_id"] not in self._subscriptions:
+                            continue
+                        self._received += 1
+                        self._lag_total += time.time() - event["ts"]
+                        await self._on_message(event["trip_id"], event["payload"], event.get("key"))
+                    # No new events within the await window; the server keeps the cursor open
+                    await asyncio.sleep(0)
+            except PyMongoError as e:
+                self._errors += 1
+                print(f"WS broker tail interrupted, resuming: {e}")
+            finally:
+                if cursor is not None:
+                    await cursor.close()
+            # Dead cursor (e.g. empty collection at open time); reopen after a short pause
+            await asyncio.sleep(RETRY_PAUSE_SECONDS)
+
+    @property
+    def info(self) -> dict:
+        return {
+            **super().info,
+            "tailing": self._tailer is not None,
+            "publishing": self._publisher is not None and not self._publisher.done(),
+            "queued": len(self._outbox),
+            "batches": self._batches,
+            "avg_batch_size": round(self._published / self._batches, 1) if self._batches else 0.0,
+            "dropped": self._dropped,
+            "errors": self._errors,
+            "avg_delivery_lag_ms": round(self._lag_total / self._received * 1000, 2) if self._received else 0.0,
+        }
+
+
+def build_broker(kind: str, on_message: MessageHandler) -> Broker:
+    if kind == "memory":
+        if settings.WORKERS > 1:
+            print(f"WARNING: WS_BROKER=memory with {settings.WORKERS} workers: "
+                  "trip members on different workers will not see each other's messages")
+        return InProcessBroker(on_message)
+    if kind != "mongo":
+        print(f"Unknown WS_BROKER '{kind}', using the mongo broker")
+    return MongoBroker(on_message)
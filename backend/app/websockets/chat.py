@@ -1,7 +1,13 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
-from typing import Dict, List
+from typing import Dict, Optional, Set
+import asyncio
 import json
-from app.core.database import db
+from app.core.config import settings
+from app.services.chat_store import chat_writer
+from app.services.track_recorder import track_recorder
+from app.websockets.broker import build_broker
+from app.websockets.fanout import ClientConnection, fanout_stats
+from app.websockets.location import LocationAggregator, valid_coordinates
 from datetime import datetime
 import uuid
 
@@ -9,26 +15,71 @@ router = APIRouter()
 
 class ConnectionManager:
     def __init__(self):
-        # Dictionary mapping trip_id to a list of active WebSockets
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+        # Dictionary mapping trip_id to this worker's sockets, each with its own outbound queue
+        self.active_connections: Dict[str, Dict[WebSocket, ClientConnection]] = {}
+        # Carries broadcasts to the same trip's sockets on other workers
+        self.broker = build_broker(settings.WS_BROKER, on_message=self._deliver_from_broker)
+        self._releasing: Set[asyncio.Task] = set()
 
     async def connect(self, websocket: WebSocket, trip_id: str):
         await websocket.accept()
+        conn = ClientConnection(websocket, on_evict=lambda c: self._remove(c.websocket, trip_id))
+        conn.start()
         if trip_id not in self.active_connections:
-            self.active_connections[trip_id] = []
-        self.active_connections[trip_id].append(websocket)
+            self.active_connections[trip_id] = {}
+            await self.broker.subscribe(trip_id)
+        self.active_connections[trip_id][websocket] = conn
 
-    def disconnect(self, websocket: WebSocket, trip_id: str):
-        self.active_connections[trip_id].remove(websocket)
-        if not self.active_connections[trip_id]:
+    def _remove(self, websocket: WebSocket, trip_id: str) -> Optional[ClientConnection]:
+        room = self.active_connections.get(trip_id)
+        if room is None:
+            return None
+        conn = room.pop(websocket, None)
+        if not room:
             del self.active_connections[trip_id]
+            task = asyncio.create_task(self._release(trip_id))
+            self._releasing.add(task)
+            task.add_done_callback(self._releasing.discard)
+        return conn
 
-    async def broadcast_to_trip(self, message: str, trip_id: str):
-        if trip_id in self.active_connections:
-            for connection in self.active_connections[trip_id]:
-                await connection.send_text(message)
+    async def _release(self, trip_id: str):
+        # Someone may have rejoined between the room emptying and this running
+        if trip_id not in self.active_connections:
+            await self.broker.unsubscribe(trip_id)
+
+    async def disconnect(self, websocket: WebSocket, trip_id: str):
+        # Safe to call twice, or after the writer already evicted a dead socket
+        conn = self._remove(websocket, trip_id)
+        if conn:
+            await conn.close()
+
+    def _deliver_local(self, message: str, trip_id: str, coalesce_key: Optional[str] = None):
+        for conn in list(self.active_connections.get(trip_id, {}).values()):
+            conn.enqueue(message, coalesce_key)
+
+    async def _deliver_from_broker(self, trip_id: str, message: str, coalesce_key: Optional[str]):
+        self._deliver_local(message, trip_id, coalesce_key)
+
+    async def broadcast_to_trip(self, message: str, trip_id: str, coalesce_key: Optional[str] = None):
+        """Queue `message` for every socket in the trip on every worker; never waits on a receiver."""
+        self._deliver_local(message, trip_id, coalesce_key)
+        self.broker.publish(trip_id, message, coalesce_key)
+
+    def room_size(self, trip_id: str) -> int:
+        return len(self.active_connections.get(trip_id, {}))
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "rooms": len(self.active_connections),
+            "connections": sum(len(room) for room in self.active_connections.values()),
+            **fanout_stats,
+            "broker": self.broker.info,
+        }
 
 manager = ConnectionManager()
+# Batches location fixes into one snapshot per trip per tick
+locations = LocationAggregator(broadcast=manager.broadcast_to_trip, receivers=manager.room_size)
 
 # In an actual prod environment, you would use JWT token extraction from Query parameters 
 # since WebSockets don't easily support headers natively in all JS clients without subprotocols.
@@ -61,21 +112,34 @@ async def websocket_endpoint(websocket: WebSocket, trip_id: str, user_id: str =
             }
             
             if msg_type == "chat":
-                broadcast_data["text"] = message_data.get("text", "")
-                # Optional: Save chat history to DB
-                await db.db["trip_chats"].insert_one({
-                    **broadcast_data,
-                    "trip_id": trip_id
-                })
+                # Clients may send any JSON here; store and relay text only
+                broadcast_data["text"] = str(message_data.get("text", ""))
             elif msg_type == "location":
                 broadcast_data["lat"] = message_data.get("lat")
                 broadcast_data["lng"] = message_data.get("lng")
-                # Location updates are usually ephemeral, but could be saved to track route history
+                # json.loads accepts NaN/Infinity; a fix that is not a real position goes nowhere
+                if not valid_coordinates(broadcast_data["lat"], broadcast_data["lng"]):
+                    continue
+                # Buffered and stored as compact chunks for the trip's route history
+                track_recorder.record(trip_id, user_id, broadcast_data["lat"], broadcast_data["lng"])
+                if locations.enabled:
+                    locations.submit(trip_id, user_id, username, broadcast_data["lat"], broadcast_data["lng"])
+                    continue
                 
-            await manager.broadcast_to_trip(json.dumps(broadcast_data), trip_id)
+            # A newer fix from the same user replaces one still queued for a slow receiver
+            coalesce_key = f"location:{user_id}" if msg_type == "location" else None
+            await manager.broadcast_to_trip(json.dumps(broadcast_data), trip_id, coalesce_key)
+
+            if msg_type == "chat":
+                # Save chat history after the broadcast; the writer batches inserts off the hot path
+                await chat_writer.submit({**broadcast_data, "trip_id": trip_id})
             
     except WebSocketDisconnect:
-        manager.disconnect(websocket, trip_id)
+        pass
+    finally:
+        # Also reached when the socket was evicted as dead or a frame was malformed
+        await manager.disconnect(websocket, trip_id)
+        locations.forget(trip_id, user_id)
         leave_msg = {
             "type": "system",
             "message": f"{username} left the trip live view",
@@ -0,0 +1,175 @@
+"""
+Per-connection outbound queues for websocket fan-out.
+
+Each connected socket gets a `ClientConnection`: a bounded queue plus its own
+writer task that drains it. A broadcast only enqueues, so what it costs the
+sender does not depend on how fast any receiver reads. One stalled phone
+delays only its own frames.
+
+When a queue is full, the slow-consumer policy decides what happens:
+- drop_oldest (default): discard the oldest queued frame. Live views care
+  about the newest state.
+- drop_newest: discard the frame being enqueued.
+- disconnect: evict the connection.
+
+Frames enqueued with a `coalesce_key` (e.g. one user's location) replace a
+still-queued frame with the same key instead of queueing behind it. A
+consumer that falls behind gets the latest position, not the backlog.
+
+A send that raises or exceeds WS_SEND_TIMEOUT_SECONDS marks the socket dead.
+The writer then stops, closes the socket and calls `on_evict`, so the owner
+drops it from its room.
+
+Usage:
+    conn = ClientConnection(websocket, on_evict=lambda c: rooms[trip_id].discard(c))
+    conn.start()
+    conn.enqueue(json_text, coalesce_key=f"location:{user_id}")
+    await conn.close()
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from fastapi import WebSocket
+
+from app.core.config import settings
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+DISCONNECT = "disconnect"
+
+# Process-wide counters, exposed through /api/metrics
+fanout_stats = {"enqueued": 0, "sent": 0, "dropped": 0, "coalesced": 0, "evicted": 0, "send_errors": 0}
+
+# Strong references to socket-close tasks started from sync code
+_closing: set = set()
+
+
+class _Frame:
+    __slots__ = ("payload", "key", "enqueued_at")
+
+    def __init__(self, payload: str, key: Optional[str]):
+        self.payload = payload
+        self.key = key
+        self.enqueued_at = time.perf_counter()
+
+
+class ClientConnection:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        on_evict: Optional[Callable[["ClientConnection"], None]] = None,
+        queue_size: Optional[int] = None,
+        policy: Optional[str] = None,
+        send_timeout: Optional[float] = None,
+    ):
+        self.websocket = websocket
+        self._on_evict = on_evict
+        self._queue_size = queue_size or settings.WS_SEND_QUEUE_SIZE
+        self._policy = policy or settings.WS_SLOW_CONSUMER_POLICY
+        self._send_timeout = send_timeout or settings.WS_SEND_TIMEOUT_SECONDS
+        self._frames: Deque[_Frame] = deque()
+        self._keyed: Dict[str, _Frame] = {}
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self.closed = False
+        # Seconds between enqueue and send completion, for load testing
+        self.latencies: Optional[List[float]] = None
+
+    def start(self) -> None:
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, payload: str, coalesce_key: Optional[str] = None) -> bool:
+        """Queue a frame without waiting. Returns False if it was dropped."""
+        if self.closed:
+            return False
+        fanout_stats["enqueued"] += 1
+
+        if coalesce_key is not None:
+            pending = self._keyed.get(coalesce_key)
+            if pending is not None:
+                pending.payload = payload
+                fanout_stats["coalesced"] += 1
+                return True
+
+        if len(self._frames) >= self._queue_size:
+            if self._policy == DROP_NEWEST:
+                fanout_stats["dropped"] += 1
+                return False
+            if self._policy == DISCONNECT:
+                self._evict()
+                return False
+            oldest = self._frames.popleft()
+            if oldest.key is not None:
+                self._keyed.pop(oldest.key, None)
+            fanout_stats["dropped"] += 1
+
+        frame = _Frame(payload, coalesce_key)
+        self._frames.append(frame)
+        if coalesce_key is not None:
+            self._keyed[coalesce_key] = frame
+        self._wakeup.set()
+        return True
+
+    async def _write_loop(self) -> None:
+        try:
+            while not self.closed:
+                if not self._frames:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                frame = self._frames.popleft()
+                if frame.key is not None:
+                    self._keyed.pop(frame.key, None)
+                try:
+                    await asyncio.wait_for(self.websocket.send_text(frame.payload), self._send_timeout)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    fanout_stats["send_errors"] += 1
+                    self._evict()
+                    return
+                fanout_stats["sent"] += 1
+                if self.latencies is not None:
+                    self.latencies.append(time.perf_counter() - frame.enqueued_at)
+        except asyncio.CancelledError:
+            pass
+
+    def _evict(self) -> None:
+        if self.closed:
+            return
+        fanout_stats["evicted"] += 1
+        self._shutdown()
+        task = asyncio.create_task(self._close_socket())
+        _closing.add(task)
+        task.add_done_callback(_closing.discard)
+        if self._on_evict:
+            self._on_evict(self)
+
+    def _shutdown(self) -> None:
+        self.closed = True
+        self._frames.clear()
+        self._keyed.clear()
+        self._wakeup.set()
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
+    async def _close_socket(self) -> None:
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass  # already gone
+
+    async def close(self) -> None:
+        """Stop the writer after a normal disconnect; queued frames are discarded."""
+        if self.closed:
+            return
+        self._shutdown()
+        if self._writer:
+            await asyncio.gather(self._writer, return_exceptions=True)
+
+    @property
+    def pending(self) -> int:
+        return len(self._frames)
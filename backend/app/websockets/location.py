@@ -0,0 +1,195 @@
+"""
+Server-side aggregation of live location updates.
+
+Phones send GPS fixes several times per second while driving. Rebroadcasting
+each one to every member costs O(members² × fix rate) frames per trip. The
+aggregator instead keeps only the latest fix per user and flushes one
+snapshot frame per trip every LOCATION_FLUSH_INTERVAL_SECONDS:
+
+    {"type": "locations", "timestamp": ..., "locations": [
+        {"user_id", "username", "lat", "lng", "timestamp"}, ...]}
+
+A snapshot holds every user reporting through this worker, and it is only
+sent when at least one of them moved. It is broadcast with a per-worker
+coalesce key, so a slow receiver's queue holds at most one snapshot per
+worker, always the newest. Fixes less than LOCATION_MIN_MOVE_METERS from
+the user's last accepted fix are dropped (GPS jitter at a standstill).
+
+Set LOCATION_FLUSH_INTERVAL_SECONDS=0 to turn aggregation off. Fixes are then
+broadcast one by one as before.
+
+Usage:
+    locations = LocationAggregator(broadcast=manager.broadcast_to_trip, receivers=manager.room_size)
+    locations.start()                                   # lifespan startup
+    locations.submit(trip_id, user_id, username, lat, lng)
+    locations.forget(trip_id, user_id)                  # socket closed
+    await locations.close()                             # lifespan shutdown
+"""
+
+import asyncio
+import json
+import math
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+# Window over which per-trip frames/bytes per second are reported
+RATE_WINDOW_SECONDS = 10.0
+
+# Snapshots from different workers must not coalesce each other away
+_WORKER_KEY = f"locations:{uuid.uuid4().hex[:8]}"
+
+EARTH_RADIUS_M = 6_371_000
+
+
+def distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Equirectangular approximation; accurate to well under 1% over the few metres compared here."""
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return EARTH_RADIUS_M * math.hypot(x, y)
+
+
+def valid_coordinates(lat, lng) -> bool:
+    """Finite numbers (not bools, which JSON clients can send) within latitude/longitude range."""
+    for value, bound in ((lat, 90), (lng, 180)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        if not math.isfinite(value) or abs(value) > bound:
+            return False
+    return True
+
+
+class _TripLocations:
+    __slots__ = ("latest", "dirty", "fixes_in", "fixes_dropped", "flushes")
+
+    def __init__(self):
+        # user_id -> {"user_id", "username", "lat", "lng", "timestamp"}
+        self.latest: Dict[str, dict] = {}
+        self.dirty = False
+        self.fixes_in = 0
+        self.fixes_dropped = 0
+        # (monotonic time, frames sent, bytes sent) per flush, for the rate window
+        self.flushes: Deque[Tuple[float, int, int]] = deque()
+
+
+class LocationAggregator:
+    def __init__(
+        self,
+        broadcast: Callable[[str, str, Optional[str]], Awaitable[None]],
+        receivers: Callable[[str], int],
+        interval: Optional[float] = None,
+        min_move_m: Optional[float] = None,
+    ):
+        self._broadcast = broadcast
+        self._receivers = receivers
+        self._interval = settings.LOCATION_FLUSH_INTERVAL_SECONDS if interval is None else interval
+        self._min_move_m = settings.LOCATION_MIN_MOVE_METERS if min_move_m is None else min_move_m
+        self._trips: Dict[str, _TripLocations] = {}
+        self._ticker: Optional[asyncio.Task] = None
+        self._totals = {"fixes_in": 0, "fixes_dropped": 0, "frames_sent": 0, "bytes_sent": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self._interval > 0
+
+    def start(self) -> None:
+        if self.enabled and self._ticker is None:
+            self._ticker = asyncio.create_task(self._tick())
+
+    async def close(self) -> None:
+        if self._ticker:
+            self._ticker.cancel()
+            await asyncio.gather(self._ticker, return_exceptions=True)
+            self._ticker = None
+
+    def submit(self, trip_id: str, user_id: str, username: str, lat: float, lng: float) -> bool:
+        """Record a fix for the next snapshot. Returns False if it was dropped as jitter."""
+        trip = self._trips.setdefault(trip_id, _TripLocations())
+        trip.fixes_in += 1
+        self._totals["fixes_in"] += 1
+
+        last = trip.latest.get(user_id)
+        if last is not None and distance_m(last["lat"], last["lng"], lat, lng) < self._min_move_m:
+            trip.fixes_dropped += 1
+            self._totals["fixes_dropped"] += 1
+            return False
+
+        trip.latest[user_id] = {
+            "user_id": user_id,
+            "username": username,
+            "lat": lat,
+            "lng": lng,
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+        trip.dirty = True
+        return True
+
+    def forget(self, trip_id: str, user_id: str) -> None:
+        """Stop including `user_id` in the trip's snapshots."""
+        trip = self._trips.get(trip_id)
+        if trip is None:
+            return
+        trip.latest.pop(user_id, None)
+        if not trip.latest:
+            del self._trips[trip_id]
+
+    async def flush(self) -> int:
+        """Broadcast one snapshot for every trip with new fixes. Returns the number of snapshots sent."""
+        sent = 0
+        for trip_id, trip in list(self._trips.items()):
+            if not trip.dirty:
+                continue
+            trip.dirty = False
+            payload = json.dumps({
+                "type": "locations",
+                "timestamp": datetime.utcnow().isoformat(),
+                "locations": list(trip.latest.values()),
+            })
+            await self._broadcast(payload, trip_id, _WORKER_KEY)
+            receivers = self._receivers(trip_id)
+            trip.flushes.append((time.monotonic(), receivers, receivers * len(payload)))
+            self._totals["frames_sent"] += receivers
+            self._totals["bytes_sent"] += receivers * len(payload)
+            sent += 1
+        return sent
+
+    async def _tick(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                # One bad flush must not stop live locations for every trip
+                print(f"Location snapshot flush failed: {e}")
+
+    def _rates(self, trip: _TripLocations) -> Tuple[float, float]:
+        horizon = time.monotonic() - RATE_WINDOW_SECONDS
+        while trip.flushes and trip.flushes[0][0] < horizon:
+            trip.flushes.popleft()
+        frames = sum(f for _, f, _ in trip.flushes)
+        sent = sum(b for _, _, b in trip.flushes)
+        return frames / RATE_WINDOW_SECONDS, sent / RATE_WINDOW_SECONDS
+
+    @property
+    def stats(self) -> dict:
+        trips = {}
+        for trip_id, trip in self._trips.items():
+            frames_per_sec, bytes_per_sec = self._rates(trip)
+            trips[trip_id] = {
+                "users": len(trip.latest),
+                "fixes_in": trip.fixes_in,
+                "fixes_dropped": trip.fixes_dropped,
+                "frames_per_sec": round(frames_per_sec, 2),
+                "bytes_per_sec": round(bytes_per_sec, 1),
+            }
+        return {
+            "enabled": self.enabled,
+            "interval_seconds": self._interval,
+            "min_move_m": self._min_move_m,
+            **self._totals,
+            "trips": trips,
+        }
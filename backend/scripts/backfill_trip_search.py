@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Backfill `search_terms` on existing trips for prefix matching in feed search.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/backfill_trip_search.py [--batch-size 500] [--all]
+
+The script will:
+  1. Find trips without `search_terms` (or every trip with --all, e.g. after
+     changing how terms are built in app/services/trip_search.py).
+  2. Compute the terms from the title and place names and write them in
+     batched bulk updates.
+
+New trips get their terms from the API; this only needs to run once per
+deployment of the search change. Until it has run, older trips are found by
+whole words only.
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Allow running from backend/ directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(env_path, override=True)
+
+# Use the same env var names as app/core/config.py
+MONGO_URI = os.getenv("MONGODB_URL")
+if not MONGO_URI:
+    print(f"ERROR: MONGODB_URL not found in {env_path}")
+    sys.exit(1)
+DB_NAME = os.getenv("MONGODB_DB_NAME", "triptracksdb")
+print(f"Connecting to: {MONGO_URI[:40]}... / DB: {DB_NAME}")
+
+
+def backfill(batch_size: int, everything: bool) -> None:
+    import certifi
+    from pymongo import MongoClient, UpdateOne
+
+    from app.services.trip_search import trip_search_terms
+
+    client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
+    trips = client[DB_NAME]["trips"]
+
+    query = {} if everything else {"search_terms": {"$exists": False}}
+    projection = {"_id": 0, "id": 1, "title": 1, "source.name": 1, "destination.name": 1, "stops.name": 1}
+    batch, updated = [], 0
+    for trip in trips.find(query, projection):
+        batch.append(UpdateOne({"id": trip["id"]}, {"$set": {"search_terms": trip_search_terms(trip)}}))
+        if len(batch) >= batch_size:
+            updated += trips.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += trips.bulk_write(batch, ordered=False).modified_count
+
+    client.close()
+    print(f"Updated search terms for {updated} trips.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--all", action="store_true", help="recompute terms for every trip")
+    args = parser.parse_args()
+    backfill(args.batch_size, args.all)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Backfill `search_terms` on existing users for the indexed crew search.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/backfill_user_search.py [--batch-size 500] [--all]
+
+The script will:
+  1. Find users without `search_terms` (or every user with --all, e.g. after
+     changing how terms are built in app/services/user_directory.py).
+  2. Compute the terms from username, email and full name and write them in
+     batched bulk updates.
+
+New and updated users get their terms from the API; this only needs to run
+once per deployment of the search change.
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Allow running from backend/ directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(env_path, override=True)
+
+# Use the same env var names as app/core/config.py
+MONGO_URI = os.getenv("MONGODB_URL")
+if not MONGO_URI:
+    print(f"ERROR: MONGODB_URL not found in {env_path}")
+    sys.exit(1)
+DB_NAME = os.getenv("MONGODB_DB_NAME", "triptracksdb")
+print(f"Connecting to: {MONGO_URI[:40]}... / DB: {DB_NAME}")
+
+
+def backfill(batch_size: int, everyone: bool) -> None:
+    import certifi
+    from pymongo import MongoClient, UpdateOne
+
+    from app.services.user_directory import user_search_terms
+
+    client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
+    users = client[DB_NAME]["users"]
+
+    query = {} if everyone else {"search_terms": {"$exists": False}}
+    cursor = users.find(query, {"_id": 0, "id": 1, "username": 1, "email": 1, "full_name": 1})
+    batch, updated = [], 0
+    for user in cursor:
+        terms = user_search_terms(user["username"], user["email"], user.get("full_name"))
+        batch.append(UpdateOne({"id": user["id"]}, {"$set": {"search_terms": terms}}))
+        if len(batch) >= batch_size:
+            updated += users.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += users.bulk_write(batch, ordered=False).modified_count
+
+    client.close()
+    print(f"Updated search terms for {updated} users.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--all", action="store_true", help="recompute terms for every user")
+    args = parser.parse_args()
+    backfill(args.batch_size, args.all)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: InMemoryCache vs. the previous bucket-per-TTL implementation.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/bench_cache.py [--ops 200000] [--ttls 8]
+
+Both caches get the same workload: keys spread across `--ttls` distinct TTL
+values (the way OTP / verified / route / autocomplete entries are), then a mix
+of hits and misses. The legacy cache needs cachetools (already in
+requirements.txt).
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+# Allow running from backend/ directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cachetools import TTLCache
+
+from app.services.cache import InMemoryCache
+
+
+class LegacyInMemoryCache:
+    """The pre-rewrite cache: one cachetools.TTLCache per distinct TTL value."""
+
+    def __init__(self, maxsize: int, ttl: int):
+        self._default_ttl = ttl
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._ttl_caches: dict[int, TTLCache] = {}
+
+    def _get_cache_for_ttl(self, ttl: int) -> TTLCache:
+        if ttl == self._default_ttl:
+            return self._cache
+        if ttl not in self._ttl_caches:
+            self._ttl_caches[ttl] = TTLCache(maxsize=self._maxsize, ttl=ttl)
+        return self._ttl_caches[ttl]
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                return value
+            for ttl_cache in self._ttl_caches.values():
+                value = ttl_cache.get(key)
+                if value is not None:
+                    return value
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        with self._lock:
+            self._get_cache_for_ttl(ttl if ttl is not None else self._default_ttl)[key] = value
+
+    def entries(self) -> int:
+        return len(self._cache) + sum(len(c) for c in self._ttl_caches.values())
+
+
+def run(cache, ops: int, ttls: list[int], keyspace: int) -> dict:
+    rng = random.Random(42)
+    value = {"distance_km": 148.2, "estimated_time_mins": 171}
+
+    started = time.perf_counter()
+    for i in range(keyspace):
+        cache.set(f"route_{i}", value, ttl=ttls[i % len(ttls)])
+    set_secs = time.perf_counter() - started
+
+    hit_keys = [f"route_{rng.randrange(keyspace)}" for _ in range(ops)]
+    miss_keys = [f"missing_{i}" for i in range(ops)]
+
+    started = time.perf_counter()
+    for k in hit_keys:
+        cache.get(k)
+    hit_secs = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for k in miss_keys:
+        cache.get(k)
+    miss_secs = time.perf_counter() - started
+
+    return {
+        "set_us": set_secs / keyspace * 1e6,
+        "get_hit_us": hit_secs / ops * 1e6,
+        "get_miss_us": miss_secs / ops * 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=200_000)
+    parser.add_argument("--ttls", type=int, default=8, help="number of distinct TTL values")
+    parser.add_argument("--maxsize", type=int, default=1000)
+    args = parser.parse_args()
+
+    ttls = [600 + 300 * i for i in range(args.ttls)]
+    keyspace = args.maxsize * 2
+
+    legacy = LegacyInMemoryCache(maxsize=args.maxsize, ttl=3600)
+    current = InMemoryCache(maxsize=args.maxsize, ttl=3600)
+
+    print(f"{args.ops} ops, {len(ttls)} TTLs, maxsize={args.maxsize}, {keyspace} keys written\n")
+    print(f"{'':10} {'set µs':>10} {'hit µs':>10} {'miss µs':>10} {'entries':>10}")
+    for name, cache, entries in (
+        ("legacy", legacy, lambda: legacy.entries()),
+        ("current", current, lambda: current.info["entries"]),
+    ):
+        r = run(cache, args.ops, ttls, keyspace)
+        print(f"{name:10} {r['set_us']:10.2f} {r['get_hit_us']:10.2f} {r['get_miss_us']:10.2f} {entries():10}")
+
+
+if __name__ == "__main__":
+    main()
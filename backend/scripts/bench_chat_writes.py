@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark chat persistence: awaited insert_one per message vs the write-behind batcher.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/bench_chat_writes.py [--senders 50] [--messages 200] [--batch 100] [--flush-ms 200]
+
+`--senders` concurrent clients each send `--messages` chat messages into
+10 trips, as fast as the write path lets them, in two modes:
+
+  insert_one  - the old path: every message awaits its own insert before the broadcast
+  batched     - ChatWriter (app/services/chat_store.py): submit() queues, insert_many drains
+
+For each mode the script reports the time the sender spent per message, overall
+throughput and the number of write round trips. Writes go to a scratch database
+(`<MONGODB_DB_NAME>_chatbench`), which is dropped at the end.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+# Allow running from backend/ directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(env_path, override=True)
+
+# Use the same env var names as app/core/config.py
+MONGO_URI = os.getenv("MONGODB_URL")
+if not MONGO_URI:
+    print(f"ERROR: MONGODB_URL not found in {env_path}")
+    sys.exit(1)
+DB_NAME = os.getenv("MONGODB_DB_NAME", "triptracksdb") + "_chatbench"
+print(f"Connecting to: {MONGO_URI[:40]}... / DB: {DB_NAME}")
+
+
+def _message(sender: int, i: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "type": "chat",
+        "user_id": f"user-{sender}",
+        "username": f"rider{sender}",
+        "timestamp": datetime.utcnow().isoformat(),
+        "text": f"message {i} from rider{sender}",
+        "trip_id": f"trip-{sender % 10}",
+    }
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000
+
+
+async def _run(args, write):
+    costs = []
+
+    async def sender(s: int):
+        for i in range(args.messages):
+            started = time.perf_counter()
+            await write(_message(s, i))
+            costs.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender(s) for s in range(args.senders)))
+    return costs, started
+
+
+def _report(mode: str, costs, elapsed: float, round_trips: int) -> None:
+    print(f"\n== {mode}")
+    print(f"  sender time per message  p50={_pct(costs, 50):8.3f} ms  p99={_pct(costs, 99):8.3f} ms")
+    print(f"  {len(costs)} messages stored in {elapsed:.2f}s ({len(costs) / elapsed:,.0f} msg/s), "
+          f"{round_trips} write round trips")
+
+
+async def bench(args) -> None:
+    import certifi
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from app.core.database import db
+    from app.services.chat_store import COLLECTION, ChatWriter
+
+    db.client = AsyncIOMotorClient(MONGO_URI, tlsCAFile=certifi.where())
+    db.db._db = db.client[DB_NAME]
+    try:
+        await db.db[COLLECTION].create_index("id", unique=True)
+
+        costs, started = await _run(args, db.db[COLLECTION].insert_one)
+        _report("insert_one", costs, time.perf_counter() - started, len(costs))
+
+        await db.db[COLLECTION].delete_many({})
+        writer = ChatWriter(batch_size=args.batch, flush_ms=args.flush_ms, ordered=not args.unordered)
+        await writer.start()
+        costs, started = await _run(args, writer.submit)
+        await writer.close()  # time until everything is actually in Mongo
+        elapsed = time.perf_counter() - started
+        stored = await db.db[COLLECTION].count_documents({})
+        _report(f"batched (batch={args.batch}, flush={args.flush_ms}ms)", costs, elapsed, writer.info["batches"])
+        print(f"  stored={stored}  blocked submits={writer.info['blocked_submits']}  failed={writer.info['failed']}")
+    finally:
+        await db.client.drop_database(DB_NAME)
+        db.client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--senders", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=200, help="per sender")
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--flush-ms", type=int, default=200)
+    parser.add_argument("--unordered", action="store_true")
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark feed search: legacy regex scan vs the ranked index-backed search.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/bench_feed_search.py [--trips 100000] [--runs 20] [--keep]
+
+The script will:
+  1. Seed a scratch database (`<MONGODB_DB_NAME>_feedbench`) with synthetic
+     trips (80% completed) and create the registered trips indexes.
+  2. For a set of queries, time:
+       regex   - the old `$regex`/`$options: i` on title + destination, sorted by updated_at
+       ranked  - build_rank_pipeline() plus the page fetch by id (a cache miss);
+                 queries ending in an unfinished word use the search_terms prefix match
+       cached  - only the page fetch by id (ranking served from the per-worker cache)
+     and report median latency, matches and documents examined.
+  3. Drop the scratch database unless --keep is given (re-runs reuse it).
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Allow running from backend/ directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(env_path, override=True)
+
+# Use the same env var names as app/core/config.py
+MONGO_URI = os.getenv("MONGODB_URL")
+if not MONGO_URI:
+    print(f"ERROR: MONGODB_URL not found in {env_path}")
+    sys.exit(1)
+DB_NAME = os.getenv("MONGODB_DB_NAME", "triptracksdb") + "_feedbench"
+print(f"Connecting to: {MONGO_URI[:40]}... / DB: {DB_NAME}")
+
+PLACES = [
+    "Goa", "Manali", "Leh", "Ladakh", "Munnar", "Ooty", "Coorg", "Hampi", "Pondicherry", "Rishikesh",
+    "Jaipur", "Udaipur", "Jaisalmer", "Darjeeling", "Gangtok", "Shillong", "Kodaikanal", "Wayanad",
+    "Gokarna", "Varkala", "Spiti", "Kasol", "Mussoorie", "Nainital", "Mumbai", "Pune", "Bengaluru",
+    "Chennai", "Hyderabad", "Kolkata", "Delhi", "Ahmedabad", "Mysuru", "Alleppey", "Kochi", "Lonavala",
+]
+THEMES = ["beach", "monsoon", "road trip", "weekend", "ride", "trek", "family", "food trail", "sunrise", "camping"]
+QUERIES = ["goa ", "goa beach ", "manali ride ", "monsoon ", "spiti trek ", "weekend kochi ", "sunrise camping ", "zzz ",
+           "man", "goa bea", "mumb", "sunrise cam"]  # trailing space: every word finished
+
+
+def _place(name: str) -> dict:
+    return {"name": f"{name}, India", "lat": 8 + random.random() * 25, "lng": 68 + random.random() * 28}
+
+
+def seed(db, trips: int) -> None:
+    from app.core.indexes import INDEXES
+    from app.services.trip_search import trip_search_terms
+
+    existing = db.trips.estimated_document_count()
+    if existing >= trips:
+        print(f"Reusing {existing} seeded trips")
+        return
+    db.trips.drop()
+    now = datetime.utcnow()
+    batch = []
+    for i in range(trips):
+        dest, src = random.sample(PLACES, 2)
+        batch.append({
+            "id": str(uuid.uuid4()),
+            "organizer_id": str(uuid.uuid4()),
+            "title": f"{random.choice(THEMES).title()} to {dest}",
+            "status": "completed" if random.random() < 0.8 else "planned",
+            "source": _place(src),
+            "destination": _place(dest),
+            "stops": [_place(p) for p in random.sample(PLACES, random.randint(0, 3))],
+            "created_at": now - timedelta(days=random.randint(0, 730)),
+            "updated_at": now - timedelta(minutes=random.randint(0, 730 * 24 * 60)),
+        })
+        batch[-1]["search_terms"] = trip_search_terms(batch[-1])
+        if len(batch) == 5000:
+            db.trips.insert_many(batch)
+            batch = []
+            print(f"  seeded {i + 1}/{trips}", end="\r")
+    if batch:
+        db.trips.insert_many(batch)
+    for model in INDEXES["trips"]:
+        spec = dict(model.document)
+        db.trips.create_index(list(spec.pop("key").items()), **spec)
+    print(f"Seeded {trips} trips and created indexes")
+
+
+def _median_ms(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def bench(db, runs: int) -> None:
+    from app.models.trip import TRIP_SUMMARY_PROJECTION
+    from app.services.trip_search import build_rank_pipeline, parse_search
+
+    page = 20
+    print(f"\n{'query':<18} {'mode':<7} {'median ms':>10} {'matches':>8} {'docs examined':>14}")
+    for q in QUERIES:
+        regex = {"$regex": q.strip(), "$options": "i"}
+        legacy = {"status": "completed", "$or": [{"title": regex}, {"destination.name": regex}]}
+
+        def run_regex():
+            return list(db.trips.find(legacy, {"_id": 0}).sort("updated_at", -1).limit(page))
+
+        words, prefix = parse_search(q)
+        pipeline = build_rank_pipeline(words, prefix, 500)
+
+        def run_ranking():
+            return list(db.trips.aggregate(pipeline))
+
+        ranked = run_ranking()
+        ids = [d["id"] for d in ranked[:page]]
+
+        def run_page():
+            return list(db.trips.find({"id": {"$in": ids}, "status": "completed"},
+                                      {**TRIP_SUMMARY_PROJECTION, "_id": 0}))
+
+        regex_stats = db.command("explain", {"find": "trips", "filter": legacy, "sort": {"updated_at": -1},
+                                             "limit": page}, verbosity="executionStats")["executionStats"]
+        text_stats = db.command("explain", {"aggregate": "trips", "pipeline": pipeline, "cursor": {}},
+                                verbosity="executionStats")
+        text_docs = text_stats.get("executionStats", {}).get("totalDocsExamined")
+        if text_docs is None:  # sharded/$cursor-wrapped explain output
+            stages = text_stats.get("stages", [{}])
+            text_docs = stages[0].get("$cursor", {}).get("executionStats", {}).get("totalDocsExamined", "?")
+
+        regex_matches = db.trips.count_documents(legacy)
+        print(f"{q!r:<18} {'regex':<7} {_median_ms(run_regex, runs):>10.2f} {regex_matches:>8} "
+              f"{regex_stats['totalDocsExamined']:>14}")
+        print(f"{'':<18} {'ranked':<7} {_median_ms(lambda: (run_ranking(), run_page()), runs):>10.2f} "
+              f"{len(ranked):>8} {text_docs:>14}")
+        print(f"{'':<18} {'cached':<7} {_median_ms(run_page, runs):>10.2f} {len(ranked):>8} {len(ids):>14}")
+
+
+def main() -> None:
+    import certifi
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database for re-runs")
+    args = parser.parse_args()
+
+    random.seed(42)
+    client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
+    try:
+        seed(client[DB_NAME], args.trips)
+        bench(client[DB_NAME], args.runs)
+    finally:
+        if not args.keep:
+            client.drop_database(DB_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
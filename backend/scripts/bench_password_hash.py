@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark bcrypt throughput per cost factor and worker count.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/bench_password_hash.py [--rounds 10 11 12 13] [--workers 1 2 4] [--hashes 32]
+
+For each (rounds, workers) pair this hashes `--hashes` passwords through a
+dedicated thread pool (the same way PasswordHashPool does) and reports
+hashes/sec and per-hash latency. Use it to pick BCRYPT_ROUNDS and
+PASSWORD_HASH_WORKERS for the deployment's CPU budget.
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pwdlib import PasswordHash
+from pwdlib.hashers.bcrypt import BcryptHasher
+
+
+def bench(rounds: int, workers: int, hashes: int) -> tuple[float, float]:
+    ctx = PasswordHash([BcryptHasher(rounds=rounds)])
+
+    def _one(i: int) -> float:
+        started = time.perf_counter()
+        ctx.hash(f"correct horse battery staple {i}")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(pool.map(_one, range(hashes)))
+    elapsed = time.perf_counter() - started
+    return hashes / elapsed, sum(latencies) / len(latencies) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--hashes", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"{'rounds':>6} {'workers':>7} {'hashes/s':>10} {'ms/hash':>10}")
+    for rounds in args.rounds:
+        for workers in args.workers:
+            rate, latency = bench(rounds, workers, args.hashes)
+            print(f"{rounds:>6} {workers:>7} {rate:>10.1f} {latency:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
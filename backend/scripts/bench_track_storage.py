@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark route-history storage: one document per fix vs encoded track chunks.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/bench_track_storage.py [--riders 10] [--hz 1] [--hours 1] [--tolerance 5]
+
+Simulates `--riders` riders driving for `--hours` at 30-100 km/h. Each sends
+`--hz` fixes per second with a few metres of GPS noise. The same fixes are
+stored twice in a scratch database (`<MONGODB_DB_NAME>_trackbench`):
+
+  per-fix  - one {trip_id, user_id, lat, lng, timestamp} document per fix
+             (insert_one, as a naive recorder would do)
+  chunked  - build_chunk() from app/services/track_recorder.py: TRACK_CHUNK_POINTS
+             fixes per document, Douglas-Peucker at `--tolerance` metres,
+             polyline + delta-encoded times
+
+and the script reports write operations, write time, data and index size per
+rider-hour, plus the worst deviation of the simplified track from the raw fixes.
+The scratch database is dropped at the end.
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Allow running from backend/ directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(env_path, override=True)
+
+# Use the same env var names as app/core/config.py
+MONGO_URI = os.getenv("MONGODB_URL")
+if not MONGO_URI:
+    print(f"ERROR: MONGODB_URL not found in {env_path}")
+    sys.exit(1)
+DB_NAME = os.getenv("MONGODB_DB_NAME", "triptracksdb") + "_trackbench"
+print(f"Connecting to: {MONGO_URI[:40]}... / DB: {DB_NAME}")
+
+TRIP_ID = "bench-trip"
+
+
+def drive(seconds: int, hz: float):
+    """[(epoch ms, lat, lng), ...] for one simulated rider."""
+    lat, lng = 12.9 + random.random(), 77.5 + random.random()
+    heading, speed = random.random() * 2 * math.pi, random.uniform(30, 100) / 3.6
+    t = int(time.time() * 1000)
+    fixes = []
+    for _ in range(int(seconds * hz)):
+        heading += random.gauss(0, 0.03)
+        lat += speed / hz * math.cos(heading) / 111_320
+        lng += speed / hz * math.sin(heading) / (111_320 * math.cos(math.radians(lat)))
+        t += int(1000 / hz)
+        fixes.append((t, lat + random.gauss(0, 2) / 111_320, lng + random.gauss(0, 2) / 111_320))
+    return fixes
+
+
+def max_deviation_m(raw, kept) -> float:
+    from app.services.track_recorder import _segment_distance, _to_metres
+
+    xy, by_time = _to_metres(raw), {f[0]: i for i, f in enumerate(raw)}
+    anchors = [by_time[f[0]] for f in kept]
+    worst = 0.0
+    for a, b in zip(anchors, anchors[1:]):
+        for i in range(a + 1, b):
+            worst = max(worst, _segment_distance(xy[i], xy[a], xy[b]))
+    return worst
+
+
+def main() -> None:
+    import certifi
+    from pymongo import ASCENDING, MongoClient
+
+    from app.core.config import settings
+    from app.services.track_recorder import build_chunk, simplify
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--riders", type=int, default=10)
+    parser.add_argument("--hz", type=float, default=1.0, help="fixes per second per rider")
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--tolerance", type=float, default=settings.TRACK_SIMPLIFY_METERS, help="metres")
+    args = parser.parse_args()
+
+    random.seed(3)
+    tracks = {f"rider-{r}": drive(int(args.hours * 3600), args.hz) for r in range(args.riders)}
+    rider_hours = args.riders * args.hours
+    fixes = sum(len(f) for f in tracks.values())
+
+    client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
+    db = client[DB_NAME]
+    try:
+        db.track_points.create_index([("trip_id", ASCENDING), ("user_id", ASCENDING), ("timestamp", ASCENDING)])
+        db.track_chunks.create_index([("trip_id", ASCENDING), ("user_id", ASCENDING), ("start", ASCENDING)])
+
+        started = time.perf_counter()
+        for user_id, track in tracks.items():
+            for t, lat, lng in track:
+                db.track_points.insert_one({"trip_id": TRIP_ID, "user_id": user_id, "lat": lat, "lng": lng,
+                                            "timestamp": datetime.fromtimestamp(t / 1000, tz=timezone.utc)})
+        naive_time, naive_ops = time.perf_counter() - started, fixes
+
+        started, chunk_ops, kept_points, worst = time.perf_counter(), 0, 0, 0.0
+        size = settings.TRACK_CHUNK_POINTS
+        for user_id, track in tracks.items():
+            chunks = [build_chunk(TRIP_ID, user_id, track[i:i + size], args.tolerance)
+                      for i in range(0, len(track), size)]
+            db.track_chunks.insert_many(chunks)
+            chunk_ops += 1
+            kept_points += sum(c["points"] for c in chunks)
+        chunk_time = time.perf_counter() - started
+        for track in list(tracks.values())[:3]:
+            for i in range(0, len(track), size):
+                part = track[i:i + size]
+                worst = max(worst, max_deviation_m(part, simplify(part, args.tolerance)))
+
+        print(f"\n{args.riders} riders x {args.hours:g} h at {args.hz:g} Hz = {fixes} fixes; "
+              f"simplified to {kept_points} points ({kept_points / fixes:.1%}), max deviation {worst:.1f} m")
+        print(f"{'':<9} {'docs':>8} {'write ops':>10} {'write s':>8} {'KB/rider-h':>11} {'index KB':>9}")
+        for name, coll, ops, elapsed in (("per-fix", "track_points", naive_ops, naive_time),
+                                         ("chunked", "track_chunks", chunk_ops, chunk_time)):
+            stats = db.command("collStats", coll)
+            print(f"{name:<9} {stats['count']:>8} {ops:>10} {elapsed:>8.2f} "
+                  f"{stats['size'] / 1024 / rider_hours:>11.1f} {stats['totalIndexSize'] / 1024:>9.1f}")
+    finally:
+        client.drop_database(DB_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
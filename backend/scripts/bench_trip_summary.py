@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark full TripDB list payloads against TripSummary cards.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/bench_trip_summary.py [--trips 20] [--expenses 200] [--comments 300] [--runs 200]
+
+Builds a page of synthetic trips shaped like long real ones (many expenses,
+comments, stops and photos) and, for each response model, measures what the
+list handlers do per request: validate the page of documents, then serialize
+it to JSON the way FastAPI does for `response_model`. The summary side first
+applies TRIP_SUMMARY_PROJECTION (the counts Mongo would compute server-side),
+so the document sizes reflect what actually crosses the wire from Mongo.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+# Allow running from backend/ directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pydantic import TypeAdapter
+
+from app.models.trip import TRIP_SUMMARY_PROJECTION, TripDB, TripSummary
+
+
+def _place(i: int) -> dict:
+    return {"name": f"Place {i}, Some District, Some State", "lat": 12 + random.random(), "lng": 77 + random.random()}
+
+
+def make_trip(expenses: int, comments: int) -> dict:
+    users = [str(uuid.uuid4()) for _ in range(8)]
+    now = datetime.utcnow()
+    stops = [_place(i) for i in range(6)]
+    return {
+        "id": str(uuid.uuid4()),
+        "organizer_id": users[0],
+        "title": "Long weekend run to the hills",
+        "status": "completed",
+        "source": _place(100),
+        "destination": _place(200),
+        "stops": stops,
+        "participants": [{"user_id": u, "is_driver": i < 2, "vehicle_id": None, "role": "passenger"}
+                         for i, u in enumerate(users)],
+        "start_date": now - timedelta(days=3),
+        "end_date": now,
+        "fuel_cost_per_unit": 104.5,
+        "legs": [{"distance_km": 80.0 + i, "estimated_time_mins": 95 + i} for i in range(len(stops) + 1)],
+        "total_distance_km": 612.4,
+        "total_estimated_time_mins": 720,
+        "expenses": [{"id": str(uuid.uuid4()), "description": f"Fuel stop {i}", "amount": 1500.0 + i,
+                      "paid_by": random.choice(users), "split_ratio": {u: 1 / len(users) for u in users},
+                      "date": now} for i in range(expenses)],
+        "comments": [{"id": str(uuid.uuid4()), "user_id": random.choice(users), "username": "traveller",
+                      "text": "What a view from the ghat section, stopping for chai!", "timestamp": now.isoformat()}
+                     for _ in range(comments)],
+        "expense_count": expenses,
+        "expense_total": sum(1500.0 + i for i in range(expenses)),
+        "comment_count": comments,
+        "photos": [f"https://cdn.example.com/trips/{uuid.uuid4()}.jpg" for _ in range(40)],
+        "created_at": now - timedelta(days=10),
+        "updated_at": now,
+    }
+
+
+def project_summary(doc: dict) -> dict:
+    """Apply TRIP_SUMMARY_PROJECTION in Python, mirroring what the server returns."""
+    out = {}
+    for field, spec in TRIP_SUMMARY_PROJECTION.items():
+        if spec == 1:
+            if field in doc:
+                out[field] = doc[field]
+        else:
+            source = spec["$size"]["$ifNull"][0].lstrip("$")
+            out[field] = len(doc.get(source) or [])
+    return out
+
+
+def bench(name: str, model, docs: List[dict], runs: int) -> None:
+    adapter = TypeAdapter(List[model])
+    raw_bytes = len(json.dumps(docs, default=str))
+    started = time.perf_counter()
+    for _ in range(runs):
+        payload = adapter.dump_json([model(**d) for d in docs])
+    per_request_ms = (time.perf_counter() - started) / runs * 1000
+    print(f"{name:<12} {raw_bytes / 1024:>12.1f} {len(payload) / 1024:>14.1f} {per_request_ms:>12.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=20, help="trips per page")
+    parser.add_argument("--expenses", type=int, default=200, help="expenses per trip")
+    parser.add_argument("--comments", type=int, default=300, help="comments per trip")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(7)
+    full_docs = [make_trip(args.expenses, args.comments) for _ in range(args.trips)]
+    summary_docs = [project_summary(d) for d in full_docs]
+
+    print(f"{args.trips} trips/page, {args.expenses} expenses + {args.comments} comments per trip\n")
+    print(f"{'model':<12} {'mongo KB':>12} {'response KB':>14} {'ms/request':>12}")
+    bench("TripDB", TripDB, full_docs, args.runs)
+    bench("TripSummary", TripSummary, summary_docs, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Measure cross-worker websocket broadcast latency through the Mongo broker.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/bench_ws_broker.py [--workers 4] [--messages 500] [--rate 100]
+
+Starts `--workers` processes, each with its own MongoBroker (like separate
+uvicorn workers) subscribed to one trip. Worker 0 also publishes
+`--messages` broadcasts at `--rate` per second. Every other worker records
+how long each broadcast took from publish to its on_message callback. The
+script then reports p50/p95/p99 latency and how many were delivered. Events
+go to the `ws_events` capped collection of a scratch database
+(`<MONGODB_DB_NAME>_wsbench`), which is dropped at the end.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+# Allow running from backend/ directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(env_path, override=True)
+
+# Use the same env var names as app/core/config.py
+MONGO_URI = os.getenv("MONGODB_URL")
+if not MONGO_URI:
+    print(f"ERROR: MONGODB_URL not found in {env_path}")
+    sys.exit(1)
+DB_NAME = os.getenv("MONGODB_DB_NAME", "triptracksdb") + "_wsbench"
+
+TRIP_ID = "bench-trip"
+
+
+async def _worker(index: int, args, ready, go, results) -> None:
+    import certifi
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from app.core.database import db
+    from app.websockets.broker import MongoBroker
+
+    latencies = []
+
+    async def on_message(trip_id, payload, coalesce_key):
+        latencies.append(time.time() - json.loads(payload)["sent_at"])
+
+    db.client = AsyncIOMotorClient(MONGO_URI, tlsCAFile=certifi.where())
+    db.db._db = db.client[DB_NAME]
+    broker = MongoBroker(on_message)
+    try:
+        await broker.start()
+        await broker.subscribe(TRIP_ID)
+        ready.release()
+        await asyncio.get_running_loop().run_in_executor(None, go.wait)
+
+        if index == 0:
+            for i in range(args.messages):
+                broker.publish(TRIP_ID, json.dumps({"seq": i, "sent_at": time.time()}))
+                await asyncio.sleep(1 / args.rate)
+        # Give the tails time to catch up with the last broadcasts
+        deadline = time.time() + args.messages / args.rate + 5
+        while index != 0 and len(latencies) < args.messages and time.time() < deadline:
+            await asyncio.sleep(0.05)
+        results.put((index, latencies, broker.info))
+    finally:
+        await broker.close()
+        db.client.close()
+
+
+def _run_worker(index: int, args, ready, go, results) -> None:
+    asyncio.run(_worker(index, args, ready, go, results))
+
+
+def _pct(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000
+
+
+def main() -> None:
+    import certifi
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=100, help="broadcasts per second")
+    args = parser.parse_args()
+    print(f"Connecting to: {MONGO_URI[:40]}... / DB: {DB_NAME}")
+
+    ready = multiprocessing.Semaphore(0)
+    go = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_run_worker, args=(i, args, ready, go, results))
+        for i in range(args.workers)
+    ]
+    try:
+        for p in procs:
+            p.start()
+        for _ in procs:
+            ready.acquire()
+        go.set()
+        collected = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+    finally:
+        client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
+        client.drop_database(DB_NAME)
+        client.close()
+
+    latencies = []
+    print(f"\n{args.workers} workers, {args.messages} broadcasts at {args.rate:g}/s from worker 0")
+    for index, lats, info in sorted(collected, key=lambda r: r[0]):
+        latencies += lats
+        print(f"  worker {index}: received={info['received']} published={info['published']} "
+              f"errors={info['errors']}")
+    expected = args.messages * (args.workers - 1)
+    print(f"  delivered {len(latencies)}/{expected}")
+    print(f"  publish -> remote delivery  p50={_pct(latencies, 50):.2f} ms  p95={_pct(latencies, 95):.2f} ms"
+          f"  p99={_pct(latencies, 99):.2f} ms  max={_pct(latencies, 100):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
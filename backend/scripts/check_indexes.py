@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Report on MongoDB indexes against the registry in app/core/indexes.py.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/check_indexes.py [--explain] [--create]
+
+The script will:
+  1. List registered indexes that are missing from the database.
+  2. List indexes present in the database but not in the registry.
+  3. Show `$indexStats` usage counts and flag indexes with zero ops since the
+     last server restart.
+  4. With --explain, run `explain()` for every route's query shape and print
+     the winning plan (IXSCAN vs COLLSCAN), keys examined and docs examined.
+  5. With --create, create the missing registered indexes.
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Allow running from backend/ directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(env_path, override=True)
+
+# Use the same env var names as app/core/config.py
+MONGO_URI = os.getenv("MONGODB_URL")
+if not MONGO_URI:
+    print(f"ERROR: MONGODB_URL not found in {env_path}")
+    sys.exit(1)
+DB_NAME = os.getenv("MONGODB_DB_NAME", "triptracksdb")
+print(f"Connecting to: {MONGO_URI[:40]}... / DB: {DB_NAME}")
+
+
+def _key_tuple(key) -> tuple:
+    return tuple((field, int(direction)) for field, direction in key.items())
+
+
+def _winning_stages(plan: dict) -> list:
+    """Flatten a winning plan into its stage names, outermost first."""
+    stages = []
+    while plan:
+        stages.append(plan.get("stage", "?") + (f"({plan['indexName']})" if "indexName" in plan else ""))
+        if "inputStage" in plan:
+            plan = plan["inputStage"]
+        elif "inputStages" in plan:
+            stages.append("[" + " | ".join(" > ".join(_winning_stages(p)) for p in plan["inputStages"]) + "]")
+            break
+        else:
+            break
+    return stages
+
+
+def check(explain: bool, create: bool) -> None:
+    import certifi
+    from pymongo import MongoClient
+
+    from app.core.indexes import INDEXES, QUERY_SHAPES
+
+    client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
+    db = client[DB_NAME]
+
+    for collection, models in INDEXES.items():
+        col = db[collection]
+        existing = {_key_tuple(info["key"]): name for name, info in col.index_information().items()}
+        registered = {_key_tuple(m.document["key"]): m for m in models}
+
+        print(f"\n== {collection}")
+        missing = [k for k in registered if k not in existing]
+        extra = [existing[k] for k in existing if k not in registered and existing[k] != "_id_"]
+        for k in missing:
+            print(f"  MISSING   {registered[k].document['name']}")
+            if create:
+                spec = dict(registered[k].document)
+                col.create_index(list(spec.pop("key").items()), **spec)
+                print(f"  CREATED   {registered[k].document['name']}")
+        for name in extra:
+            print(f"  UNREGISTERED {name}")
+
+        try:
+            for stat in col.aggregate([{"$indexStats": {}}]):
+                ops = stat["accesses"]["ops"]
+                flag = "  UNUSED" if ops == 0 and stat["name"] != "_id_" else ""
+                print(f"  {stat['name']:<45} ops={ops:<8} since={stat['accesses']['since']:%Y-%m-%d}{flag}")
+        except Exception as e:
+            print(f"  ($indexStats unavailable: {e})")
+
+    if explain:
+        print("\n== Query plans")
+        for route, collection, filter_, sort in QUERY_SHAPES:
+            cursor = db[collection].find(filter_)
+            if sort:
+                cursor = cursor.sort(sort)
+            result = cursor.explain()
+            stats = result.get("executionStats", {})
+            winning = result["queryPlanner"]["winningPlan"]
+            # Slot-based engine (MongoDB 7+) nests the classic plan under `queryPlan`
+            stages = " > ".join(_winning_stages(winning.get("queryPlan", winning)))
+            scan = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+            print(f"  [{scan:<8}] {route:<40} {stages}"
+                  f"  keys={stats.get('totalKeysExamined', '?')} docs={stats.get('totalDocsExamined', '?')}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--explain", action="store_true", help="explain() every registered route query shape")
+    parser.add_argument("--create", action="store_true", help="create missing registered indexes")
+    args = parser.parse_args()
+    check(args.explain, args.create)
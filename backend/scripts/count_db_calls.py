@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Count MongoDB round trips per API endpoint.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/count_db_calls.py
+
+Runs the app in-process over ASGI against the database in .env, with a
+pymongo CommandListener attached to the client. The script will:
+  1. Insert a throwaway user and a trip they organise.
+  2. Warm the principal cache with GET /api/users/me, so auth is not counted.
+  3. Call each measured endpoint once and print the commands it sent
+     (find, update, findAndModify, ...) and the HTTP status.
+  4. Delete the throwaway user, trip and uploaded photo.
+
+Use it to check that a handler stays at the round trips it is meant to cost.
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from collections import Counter
+from pathlib import Path
+
+# Allow running from backend/ directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(env_path, override=True)
+
+# Use the same env var names as app/core/config.py
+MONGO_URI = os.getenv("MONGODB_URL")
+if not MONGO_URI:
+    print(f"ERROR: MONGODB_URL not found in {env_path}")
+    sys.exit(1)
+DB_NAME = os.getenv("MONGODB_DB_NAME", "triptracksdb")
+print(f"Connecting to: {MONGO_URI[:40]}... / DB: {DB_NAME}")
+
+# Commands issued by the driver itself, not by handlers
+DRIVER_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "endSessions", "saslStart", "saslContinue"}
+
+
+def _make_listener():
+    from pymongo import monitoring
+
+    class CommandCounter(monitoring.CommandListener):
+        def __init__(self):
+            self.commands = Counter()
+
+        def started(self, event):
+            if event.command_name not in DRIVER_COMMANDS:
+                self.commands[f"{event.database_name}.{event.command_name}"] += 1
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    return CommandCounter()
+
+
+async def run() -> None:
+    import certifi
+    import httpx
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from app.core.database import db
+    from app.core.security import create_access_token
+    from app.main import app
+
+    listener = _make_listener()
+    db.client = AsyncIOMotorClient(MONGO_URI, tlsCAFile=certifi.where(), event_listeners=[listener])
+    db.db._db = db.client[DB_NAME]
+
+    user_id, trip_id = str(uuid.uuid4()), str(uuid.uuid4())
+    suffix = user_id[:8]
+    await db.db["users"].insert_one({
+        "id": user_id, "email": f"dbcalls-{suffix}@example.com", "username": f"dbcalls_{suffix}",
+        "hashed_password": "!", "profile_settings": {},
+    })
+    await db.db["trips"].insert_one({
+        "id": trip_id, "title": "DB call count", "organizer_id": user_id, "status": "planned",
+        "source": {"name": "A", "lat": 0.0, "lng": 0.0}, "destination": {"name": "B", "lat": 1.0, "lng": 1.0},
+    })
+
+    token = create_access_token({"sub": user_id})
+    vehicle_id = str(uuid.uuid4())
+    calls = [
+        ("PUT /api/users/me/profile", "PUT", "/api/users/me/profile", {"json": {"full_name": "Count Me"}}),
+        ("POST /api/users/me/photo", "POST", "/api/users/me/photo",
+            {"files": {"file": ("p.png", b"\x89PNG\r\n\x1a\n", "image/png")}}),
+        ("PUT /api/users/me/settings", "PUT", "/api/users/me/settings", {"json": {"currency": "INR"}}),
+        ("POST /api/users/me/vehicles", "POST", "/api/users/me/vehicles", {"json": {
+            "id": vehicle_id, "type": "car", "seats": 5, "mileage_per_liter": 15, "avg_distance_per_day": 300}}),
+        ("DELETE /api/users/me/vehicles/{id}", "DELETE", f"/api/users/me/vehicles/{vehicle_id}", {}),
+        ("PUT /api/trips/{id}/status", "PUT", f"/api/trips/{trip_id}/status", {"params": {"status": "in_progress"}}),
+        ("GET /api/trips/{id}", "GET", f"/api/trips/{trip_id}", {}),
+        ("GET /api/crew/requests/pending", "GET", "/api/crew/requests/pending", {}),
+    ]
+
+    photo_url = None
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                     headers={"Authorization": f"Bearer {token}"}) as client:
+            await client.get("/api/users/me")
+            print(f"\n{'endpoint':<38} {'status':>6} {'calls':>5}  commands")
+            for label, method, url, kwargs in calls:
+                listener.commands.clear()
+                resp = await client.request(method, url, **kwargs)
+                if url == "/api/users/me/photo" and resp.status_code == 200:
+                    photo_url = resp.json().get("profile_photo")
+                commands = ", ".join(f"{name} x{n}" for name, n in sorted(listener.commands.items()))
+                print(f"{label:<38} {resp.status_code:>6} {sum(listener.commands.values()):>5}  {commands}")
+    finally:
+        await db.db["users"].delete_one({"id": user_id})
+        await db.db["trips"].delete_one({"id": trip_id})
+        if photo_url:
+            Path(photo_url.lstrip("/")).unlink(missing_ok=True)
+        db.client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
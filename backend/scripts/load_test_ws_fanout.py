@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Load-test websocket fan-out: sequential sends vs per-connection queues.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/load_test_ws_fanout.py [--sockets 300] [--messages 200] [--rate 50]
+                                          [--slow 0.05] [--dead 0.01]
+
+Simulates one trip room of `--sockets` in-process websockets. Most receive in
+1-5 ms, a `--slow` fraction takes 200-1000 ms per frame (a phone on a bad
+connection), and a `--dead` fraction raises on send. `--messages` broadcasts
+are sent at `--rate` per second through:
+
+  sequential - the old loop: await send_text on each socket in turn
+  queued     - ClientConnection per socket (app/websockets/fanout.py)
+
+For each mode the script reports what one broadcast costs the sender, the
+enqueue-to-delivery latency distribution over all delivered frames, and
+delivered / dropped / evicted counts.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+# Allow running from backend/ directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+class SimulatedSocket:
+    def __init__(self, delay_range, dead: bool):
+        self._delay_range = delay_range
+        self._dead = dead
+        self.received = 0
+
+    async def send_text(self, payload: str) -> None:
+        if self._dead:
+            raise ConnectionResetError("socket closed by peer")
+        await asyncio.sleep(random.uniform(*self._delay_range))
+        self.received += 1
+
+    async def close(self) -> None:
+        pass
+
+
+def make_room(n: int, slow: float, dead: float) -> list:
+    sockets = []
+    for _ in range(n):
+        r = random.random()
+        if r < dead:
+            sockets.append(SimulatedSocket((0, 0), dead=True))
+        elif r < dead + slow:
+            sockets.append(SimulatedSocket((0.2, 1.0), dead=False))
+        else:
+            sockets.append(SimulatedSocket((0.001, 0.005), dead=False))
+    return sockets
+
+
+def _pct(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000
+
+
+def report(mode, broadcast_costs, latencies, delivered, dropped, evicted, aborted=0):
+    print(f"\n== {mode}")
+    print(f"  sender cost per broadcast  p50={_pct(broadcast_costs, 50):9.2f} ms"
+          f"  p99={_pct(broadcast_costs, 99):9.2f} ms")
+    print(f"  delivery latency           p50={_pct(latencies, 50):9.2f} ms  p95={_pct(latencies, 95):9.2f} ms"
+          f"  p99={_pct(latencies, 99):9.2f} ms  max={_pct(latencies, 100):9.2f} ms")
+    print(f"  delivered={delivered}  dropped={dropped}  evicted={evicted}  aborted broadcasts={aborted}")
+
+
+async def run_sequential(sockets, messages: int, rate: float) -> None:
+    costs, latencies, aborted = [], [], 0
+    backlog = []
+
+    async def broadcast(i):
+        nonlocal aborted
+        started = time.perf_counter()
+        try:
+            for ws in sockets:
+                await ws.send_text(f"frame {i}")
+                latencies.append(time.perf_counter() - started)
+        except ConnectionResetError:
+            aborted += 1  # the old loop stops at the first dead socket
+        costs.append(time.perf_counter() - started)
+
+    for i in range(messages):
+        backlog.append(asyncio.create_task(broadcast(i)))
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*backlog)
+    report("sequential", costs, latencies, sum(ws.received for ws in sockets), 0, 0, aborted)
+
+
+async def run_queued(sockets, messages: int, rate: float, queue_size: int, policy: str) -> None:
+    from app.websockets.fanout import ClientConnection, fanout_stats
+
+    room = {}
+    for ws in sockets:
+        conn = ClientConnection(ws, on_evict=lambda c: room.pop(c.websocket, None),
+                                queue_size=queue_size, policy=policy, send_timeout=5.0)
+        conn.latencies = []
+        conn.start()
+        room[ws] = conn
+    connections = list(room.values())
+
+    costs = []
+    for i in range(messages):
+        started = time.perf_counter()
+        for conn in list(room.values()):
+            conn.enqueue(f"frame {i}")
+        costs.append(time.perf_counter() - started)
+        await asyncio.sleep(1 / rate)
+
+    # Let the fast sockets drain; slow ones keep only what their queue allowed
+    deadline = time.perf_counter() + 10
+    while any(c.pending for c in room.values()) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    for conn in list(room.values()):
+        await conn.close()
+
+    latencies = [lat for c in connections for lat in c.latencies]
+    report(f"queued ({policy}, queue={queue_size})", costs, latencies,
+           sum(ws.received for ws in sockets), fanout_stats["dropped"], fanout_stats["evicted"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=300)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=50, help="broadcasts per second")
+    parser.add_argument("--slow", type=float, default=0.05, help="fraction of slow receivers")
+    parser.add_argument("--dead", type=float, default=0.01, help="fraction of dead sockets")
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--policy", default="drop_oldest", choices=["drop_oldest", "drop_newest", "disconnect"])
+    parser.add_argument("--skip-sequential", action="store_true", help="the sequential run can take minutes")
+    args = parser.parse_args()
+
+    print(f"{args.sockets} sockets ({args.slow:.0%} slow, {args.dead:.0%} dead), "
+          f"{args.messages} broadcasts at {args.rate:g}/s")
+    if not args.skip_sequential:
+        random.seed(1)
+        asyncio.run(run_sequential(make_room(args.sockets, args.slow, args.dead), args.messages, args.rate))
+    random.seed(1)
+    asyncio.run(run_queued(make_room(args.sockets, args.slow, args.dead), args.messages, args.rate,
+                           args.queue_size, args.policy))
+
+
+if __name__ == "__main__":
+    main()
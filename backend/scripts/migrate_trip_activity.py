@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Move embedded trip comments and expenses into their own collections.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/migrate_trip_activity.py [--batch-size 200] [--dry-run]
+
+The script will:
+  1. Find trips that still carry non-empty `comments` / `expenses` arrays.
+  2. For each batch, upsert every entry into `trip_comments` / `trip_expenses`
+     (keyed by entry id, with `trip_id` added), so re-running is safe.
+  3. Recompute `comment_count`, `expense_count` and `expense_total` on each trip
+     from the collections (this also counts entries written by the API since
+     the deploy), then `$unset` the embedded arrays.
+  4. Drop the leftover empty arrays from every other trip.
+
+Run it once after deploying the API version that writes to the collections.
+"""
+
+import argparse
+import os
+import sys
+import uuid
+from pathlib import Path
+
+# Allow running from backend/ directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(env_path, override=True)
+
+# Use the same env var names as app/core/config.py
+MONGO_URI = os.getenv("MONGODB_URL")
+if not MONGO_URI:
+    print(f"ERROR: MONGODB_URL not found in {env_path}")
+    sys.exit(1)
+DB_NAME = os.getenv("MONGODB_DB_NAME", "triptracksdb")
+print(f"Connecting to: {MONGO_URI[:40]}... / DB: {DB_NAME}")
+
+PENDING = {"$or": [{"comments.0": {"$exists": True}}, {"expenses.0": {"$exists": True}}]}
+
+
+def _upserts(entries: list, trip_id: str, ReplaceOne) -> list:
+    ops = []
+    for entry in entries:
+        doc = {**entry, "trip_id": trip_id}
+        doc.setdefault("id", str(uuid.uuid4()))
+        ops.append(ReplaceOne({"id": doc["id"]}, doc, upsert=True))
+    return ops
+
+
+def migrate(batch_size: int, dry_run: bool) -> None:
+    import certifi
+    from pymongo import MongoClient, ReplaceOne, UpdateOne
+
+    client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
+    db = client[DB_NAME]
+
+    pending = db.trips.count_documents(PENDING)
+    print(f"{pending} trips carry embedded comments/expenses")
+    if dry_run or not pending:
+        client.close()
+        return
+
+    migrated = moved_comments = moved_expenses = 0
+    while True:
+        batch = list(db.trips.find(PENDING, {"_id": 0, "id": 1, "comments": 1, "expenses": 1}).limit(batch_size))
+        if not batch:
+            break
+
+        comment_ops, expense_ops = [], []
+        for trip in batch:
+            comment_ops += _upserts(trip.get("comments") or [], trip["id"], ReplaceOne)
+            expense_ops += _upserts(trip.get("expenses") or [], trip["id"], ReplaceOne)
+        if comment_ops:
+            db.trip_comments.bulk_write(comment_ops, ordered=False)
+        if expense_ops:
+            db.trip_expenses.bulk_write(expense_ops, ordered=False)
+
+        trip_ids = [trip["id"] for trip in batch]
+        comment_counts = {
+            row["_id"]: row["count"] for row in db.trip_comments.aggregate([
+                {"$match": {"trip_id": {"$in": trip_ids}}},
+                {"$group": {"_id": "$trip_id", "count": {"$sum": 1}}},
+            ])
+        }
+        expense_totals = {
+            row["_id"]: row for row in db.trip_expenses.aggregate([
+                {"$match": {"trip_id": {"$in": trip_ids}}},
+                {"$group": {"_id": "$trip_id", "count": {"$sum": 1}, "total": {"$sum": "$amount"}}},
+            ])
+        }
+        db.trips.bulk_write([
+            UpdateOne({"id": trip_id}, {
+                "$set": {
+                    "comment_count": comment_counts.get(trip_id, 0),
+                    "expense_count": expense_totals.get(trip_id, {}).get("count", 0),
+                    "expense_total": float(expense_totals.get(trip_id, {}).get("total", 0.0)),
+                },
+                "$unset": {"comments": "", "expenses": ""},
+            })
+            for trip_id in trip_ids
+        ], ordered=False)
+
+        migrated += len(batch)
+        moved_comments += len(comment_ops)
+        moved_expenses += len(expense_ops)
+        print(f"  {migrated}/{pending} trips, {moved_comments} comments, {moved_expenses} expenses moved")
+
+    for field in ("comments", "expenses"):
+        result = db.trips.update_many({field: []}, {"$unset": {field: ""}})
+        print(f"Dropped empty `{field}` from {result.modified_count} trips")
+
+    client.close()
+    print("Done.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true", help="only count trips that need migrating")
+    args = parser.parse_args()
+    migrate(args.batch_size, args.dry_run)
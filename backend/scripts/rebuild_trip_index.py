@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Rebuild the per-user trip category index from the trips collection.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/rebuild_trip_index.py
+
+The API builds the index by itself on the first start where it is empty. Run
+this after editing trips directly in the database, or if the category counts
+look wrong. It clears the index first, so home-screen lists are incomplete
+while it runs. Running it at deploy time, before the API starts, also avoids
+the first-start build in the API.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+# Allow running from backend/ directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(env_path, override=True)
+
+# Use the same env var names as app/core/config.py
+MONGO_URI = os.getenv("MONGODB_URL")
+if not MONGO_URI:
+    print(f"ERROR: MONGODB_URL not found in {env_path}")
+    sys.exit(1)
+DB_NAME = os.getenv("MONGODB_DB_NAME", "triptracksdb")
+print(f"Connecting to: {MONGO_URI[:40]}... / DB: {DB_NAME}")
+
+
+async def run() -> None:
+    import certifi
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from app.core.database import db
+    from app.services.trip_index import trip_index
+
+    db.client = AsyncIOMotorClient(MONGO_URI, tlsCAFile=certifi.where())
+    db.db._db = db.client[DB_NAME]
+    try:
+        started = time.perf_counter()
+        rows = await trip_index.rebuild()
+        print(f"Wrote {rows} category rows in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
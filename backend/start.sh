@@ -6,7 +6,8 @@ set -e
 # Production Configuration Variables (can be overridden by environment variables)
 HOST=${HOST:-0.0.0.0}
 PORT=${PORT:-8001}
-WORKERS=${WORKERS:-4}
+# Exported so the app can check that its settings suit a multi-worker run (e.g. WS_BROKER)
+export WORKERS=${WORKERS:-4}
 LOG_LEVEL=${LOG_LEVEL:-info}
 
 echo "Starting Triptracks API (Production Setup)..."
@@ -0,0 +1,209 @@
+"""
+MongoBroker against an in-memory stand-in for the capped `ws_events` collection.
+
+`FakeEvents` keeps documents in insertion ($natural) order and serves
+tailable cursors over them. Tests can make the next cursor break part-way,
+make `find_one` or `create_collection` fail, or hold inserts back.
+
+Run:
+    cd backend && python -m pytest -q
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, OperationFailure
+
+from app.websockets import broker as broker_module
+from app.websockets.broker import Broker, MongoBroker
+
+TRIP = "trip-1"
+
+
+class FakeTailCursor:
+    def __init__(self, events: "FakeEvents", query: dict):
+        self._events = events
+        self._since = query.get("ts", {}).get("$gte")
+        self._pos = 0
+        # Like Mongo, a tailable cursor opened on an empty capped collection is dead at once
+        self.alive = bool(events.docs)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        while self._pos < len(self._events.docs):
+            if self._events.break_at == self._pos:
+                self._events.break_at = None
+                raise AutoReconnect("connection reset")
+            doc = self._events.docs[self._pos]
+            self._pos += 1
+            if self._since is None or doc["ts"] >= self._since:
+                yield dict(doc)
+        await asyncio.sleep(0.01)  # the await window ends with no new events
+
+    async def close(self):
+        self.alive = False
+
+
+class FakeEvents:
+    def __init__(self):
+        self.docs = []
+        self.break_at = None        # doc index at which the next cursor fails
+        self.find_one_failures = 0
+        self.create_failures = 0
+        self.created = False
+        self.insert_gate = None     # asyncio.Event holding inserts back while unset
+        self.insert_calls = 0
+
+    def add(self, trip_id: str, payload: str, oid: str, origin: str = "other-worker") -> None:
+        """An event published by another process, with an ObjectId of its choosing."""
+        self.docs.append({"_id": ObjectId(oid), "trip_id": trip_id, "payload": payload,
+                          "key": None, "origin": origin, "ts": time.time()})
+
+    async def create_collection(self, name, capped=False, size=None):
+        if self.create_failures:
+            self.create_failures -= 1
+            raise AutoReconnect("not reachable")
+        self.created = True
+
+    def __getitem__(self, name):
+        return self
+
+    async def insert_many(self, docs, ordered=True):
+        self.insert_calls += 1
+        if self.insert_gate is not None:
+            await self.insert_gate.wait()
+        for doc in docs:
+            self.docs.append({"_id": ObjectId(), **doc})
+
+    async def find_one(self, query, projection=None, sort=None):
+        if self.find_one_failures:
+            self.find_one_failures -= 1
+            raise OperationFailure("not primary")
+        if "_id" in query:
+            return next((d for d in self.docs if d["_id"] == query["_id"]), None)
+        return self.docs[-1] if self.docs else None
+
+    def find(self, query, cursor_type=None):
+        return FakeTailCursor(self, query)
+
+
+@pytest.fixture
+def events(monkeypatch):
+    fake = FakeEvents()
+    monkeypatch.setattr(broker_module, "db", SimpleNamespace(db=SimpleNamespace(_delegate=fake)))
+    monkeypatch.setattr(broker_module, "RETRY_PAUSE_SECONDS", 0.01)
+    return fake
+
+
+def _receiver():
+    received = []
+
+    async def on_message(trip_id, payload, coalesce_key):
+        received.append(payload)
+
+    return received, on_message
+
+
+async def _until(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_publish_is_abstract():
+    with pytest.raises(TypeError):
+        Broker(on_message=None)
+
+
+def test_publish_queues_and_batches_behind_a_slow_insert(events):
+    async def scenario():
+        broker = MongoBroker(_receiver()[1], queue_size=100, batch_size=50)
+        await broker.start()
+        events.insert_gate = asyncio.Event()
+
+        broker.publish(TRIP, "first")
+        await _until(lambda: events.insert_calls == 1)
+        # The insert is stuck; publishing must not wait for it
+        started = time.perf_counter()
+        for i in range(30):
+            broker.publish(TRIP, f"m{i}")
+        assert time.perf_counter() - started < 0.05
+
+        events.insert_gate.set()
+        await _until(lambda: len(events.docs) == 31)
+        info = broker.info
+        await broker.close()
+        return info
+
+    info = asyncio.run(scenario())
+    assert [d["payload"] for d in events.docs] == ["first"] + [f"m{i}" for i in range(30)]
+    assert info["published"] == 31
+    assert info["batches"] == 2
+    assert info["dropped"] == 0
+
+
+def test_full_outbox_drops_oldest_and_counts(events):
+    async def scenario():
+        broker = MongoBroker(_receiver()[1], queue_size=3)
+        for i in range(5):
+            broker.publish(TRIP, f"m{i}")
+        assert broker.info["dropped"] == 2
+        assert broker.info["queued"] == 3
+        await broker.start()
+        await broker.close()  # drains the outbox
+
+    asyncio.run(scenario())
+    assert [d["payload"] for d in events.docs] == ["m2", "m3", "m4"]
+
+
+def test_tail_resumes_in_insertion_order_not_id_order(events):
+    received, on_message = _receiver()
+    events.add(TRIP, "before-subscribe", "ffffffffffffffffffffff00")
+
+    async def scenario():
+        broker = MongoBroker(on_message)
+        await broker.start()
+        await broker.subscribe(TRIP)
+        # Other workers' ObjectIds do not follow insertion order
+        events.add(TRIP, "e1", "000000000000000000000050")
+        events.add(TRIP, "e2", "000000000000000000000010")
+        events.add(TRIP, "e3", "000000000000000000000030")
+        events.break_at = 2  # the cursor fails right after delivering e1
+        await _until(lambda: len(received) == 3)
+        await asyncio.sleep(0.05)  # nothing gets delivered twice
+        info = broker.info
+        await broker.close()
+        return info
+
+    info = asyncio.run(scenario())
+    assert received == ["e1", "e2", "e3"]
+    assert info["errors"] == 1
+
+
+def test_mongo_errors_do_not_escape_start_or_subscribe(events):
+    received, on_message = _receiver()
+    events.create_failures = 1
+    events.find_one_failures = 1
+
+    async def scenario():
+        broker = MongoBroker(on_message)
+        await broker.start()
+        await broker.subscribe(TRIP)
+        assert broker.info["errors"] == 2
+
+        # The publisher creates the capped collection once Mongo answers again
+        broker.publish(TRIP, "own")
+        await _until(lambda: len(events.docs) == 1)
+        assert events.created
+
+        events.add(TRIP, "remote", "000000000000000000000001")
+        await _until(lambda: received == ["remote"])
+        await broker.close()
+
+    asyncio.run(scenario())
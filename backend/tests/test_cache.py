@@ -0,0 +1,149 @@
+"""
+Shared cache backends against an in-process memcached stand-in.
+
+`FakeMemcached` speaks the subset of the text protocol MemcachedClient uses
+(get, set, delete, flush_all) on a local port, with a clock the tests move
+forward by hand so expiry needs no sleeping.
+
+Run:
+    cd backend && python -m pytest -q
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.cache import (
+    CacheBackend,
+    InMemoryCache,
+    LocalCacheBackend,
+    MemcachedCacheBackend,
+    TieredCacheBackend,
+)
+from app.services.memcached import MemcachedClient
+
+
+class FakeMemcached:
+    def __init__(self):
+        self.now = 0.0
+        self.items = {}  # key -> (flags, data, expires_at or None)
+        self._server = None
+        self.port = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _live(self, key: str):
+        item = self.items.get(key)
+        if item is not None and item[2] is not None and item[2] <= self.now:
+            del self.items[key]
+            return None
+        return item
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        while line := await reader.readline():
+            cmd, *args = line.decode("ascii").split()
+            if cmd == "get":
+                item = self._live(args[0])
+                if item is not None:
+                    writer.write(f"VALUE {args[0]} {item[0]} {len(item[1])}\r\n".encode() + item[1] + b"\r\n")
+                writer.write(b"END\r\n")
+            elif cmd == "set":
+                key, flags, exptime, length = args[0], int(args[1]), int(args[2]), int(args[3])
+                data = (await reader.readexactly(length + 2))[:-2]
+                self.items[key] = (flags, data, self.now + exptime if exptime else None)
+                writer.write(b"STORED\r\n")
+            elif cmd == "delete":
+                writer.write(b"DELETED\r\n" if self.items.pop(args[0], None) else b"NOT_FOUND\r\n")
+            elif cmd == "flush_all":
+                self.items.clear()
+                writer.write(b"OK\r\n")
+            else:
+                writer.write(b"ERROR\r\n")
+            await writer.drain()
+        writer.close()
+
+
+def _run_with_memcached(scenario):
+    """Run `scenario(server, backend)` against a fresh fake server and a prefixed memcached backend."""
+    async def _main():
+        server = FakeMemcached()
+        await server.start()
+        backend = MemcachedCacheBackend(MemcachedClient(f"127.0.0.1:{server.port}", pool_size=2), prefix="t:")
+        try:
+            await scenario(server, backend)
+        finally:
+            await backend.close()
+            await server.close()
+
+    asyncio.run(_main())
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend()
+
+
+def test_memcached_get_set_delete():
+    async def scenario(server, backend):
+        assert await backend.get("route") is None
+        await backend.set("route", {"distance_km": 12.5})
+        assert await backend.get("route") == {"distance_km": 12.5}
+        assert "t:route" in server.items
+
+        await backend.delete("route")
+        assert await backend.get("route") is None
+        assert backend.info["hits"] == 1
+        assert backend.info["misses"] == 2
+        assert backend.info["errors"] == 0
+
+    _run_with_memcached(scenario)
+
+
+def test_memcached_entries_expire():
+    async def scenario(server, backend):
+        await backend.set("otp", "123456", ttl=60)
+        server.now += 59
+        assert await backend.get("otp") == "123456"
+        server.now += 2
+        assert await backend.get("otp") is None
+
+    _run_with_memcached(scenario)
+
+
+def test_memcached_failures_degrade_to_misses():
+    async def scenario(server, backend):
+        await backend.set("k", "v")
+        await server.close()
+        await backend.close()  # drop pooled sockets so the next call has to reconnect
+        assert await backend.get("k") is None
+        assert backend.info["errors"] == 1
+
+    _run_with_memcached(scenario)
+
+
+def test_tiered_serves_l1_until_bypassed():
+    async def scenario(server, l2):
+        l1 = LocalCacheBackend(InMemoryCache())
+        tiered = TieredCacheBackend(l1, l2, l1_ttl=30)
+
+        await tiered.set("otp", "123456")
+        # Another worker consumes the OTP: only the shared tier sees the delete
+        await l2.delete("otp")
+
+        assert await tiered.get("otp") == "123456"                 # stale L1 copy
+        assert await tiered.get("otp", bypass_local=True) is None   # shared tier is authoritative
+
+        # A bypassed read must not repopulate L1 either
+        await l2.set("fresh", "value")
+        assert await tiered.get("fresh", bypass_local=True) == "value"
+        assert await l1.get("fresh") is None
+        assert await tiered.get("fresh") == "value"
+        assert await l1.get("fresh") == "value"
+
+    _run_with_memcached(scenario)
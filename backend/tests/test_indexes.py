@@ -0,0 +1,51 @@
+"""
+Startup index creation: which failures stop the app.
+
+Run:
+    cd backend && python -m pytest -q
+"""
+
+import asyncio
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from app.core.indexes import INDEXES, IndexBuildError, ensure_indexes
+
+
+class FakeDatabase:
+    """Records create_index calls; raises for the (collection, first key) pairs in `broken`."""
+
+    def __init__(self, broken=()):
+        self.broken = set(broken)
+        self.created = []
+
+    def __getitem__(self, collection):
+        database = self
+
+        class _Collection:
+            async def create_index(self, keys, **spec):
+                if (collection, keys[0][0]) in database.broken:
+                    raise OperationFailure("E11000 duplicate key error", code=11000)
+                database.created.append((collection, keys))
+
+        return _Collection()
+
+
+def test_creates_every_registered_index():
+    database = FakeDatabase()
+    asyncio.run(ensure_indexes(database))
+    assert len(database.created) == sum(len(models) for models in INDEXES.values())
+
+
+def test_missing_lookup_index_does_not_stop_startup():
+    database = FakeDatabase(broken={("users", "search_terms")})
+    asyncio.run(ensure_indexes(database))
+    assert ("users", [("search_terms", 1)]) not in database.created
+
+
+def test_missing_unique_index_fails_startup_after_trying_the_rest():
+    database = FakeDatabase(broken={("users", "username")})
+    with pytest.raises(IndexBuildError, match="users.username_1"):
+        asyncio.run(ensure_indexes(database))
+    assert len(database.created) == sum(len(models) for models in INDEXES.values()) - 1
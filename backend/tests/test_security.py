@@ -0,0 +1,47 @@
+"""
+PasswordHashPool slot accounting.
+
+Run:
+    cd backend && python -m pytest -q
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from app.core.security import HasherBusyError, PasswordHashPool
+
+
+def test_rejects_beyond_backlog_and_frees_slots():
+    pool = PasswordHashPool(workers=1, max_queue=1)
+    gate = threading.Event()
+
+    async def _main():
+        first = asyncio.ensure_future(pool.run(gate.wait))
+        second = asyncio.ensure_future(pool.run(gate.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(HasherBusyError):
+            await pool.run(gate.wait)
+        gate.set()
+        await asyncio.gather(first, second)
+
+    asyncio.run(_main())
+    pool.shutdown()
+    assert pool.info["pending"] == 0
+    assert pool.info["rejected"] == 1
+    assert pool.info["completed"] == 2
+
+
+def test_failed_submit_does_not_leak_a_slot():
+    pool = PasswordHashPool(workers=1, max_queue=0)
+    pool.shutdown()
+
+    async def _main():
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                await pool.run(len, "secret")
+
+    asyncio.run(_main())
+    assert pool.info["pending"] == 0
+    assert pool.info["rejected"] == 0
@@ -0,0 +1,132 @@
+"""
+TrackRecorder chunk building and write retries against an in-memory collection.
+
+Run:
+    cd backend && python -m pytest -q
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from app.services import track_recorder as recorder_module
+from app.services.track_recorder import TrackRecorder, build_chunk, decode_chunk
+
+T0 = 1_700_000_000_000  # epoch ms
+HOUR_MS = 3_600_000
+
+
+class FakeChunks:
+    """Unique `_id`s like Mongo. `failures` makes the next writes raise a network error,
+    and with `land_then_fail` the documents are stored before the error (reply lost)."""
+
+    def __init__(self):
+        self.docs = {}
+        self.failures = 0
+        self.land_then_fail = False
+        self.calls = 0
+
+    def __getitem__(self, name):
+        return self
+
+    async def insert_many(self, documents, ordered=True):
+        self.calls += 1
+        if self.failures and not self.land_then_fail:
+            self.failures -= 1
+            raise AutoReconnect("connection reset")
+        errors = []
+        for index, doc in enumerate(documents):
+            if doc["_id"] in self.docs:
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key"})
+            else:
+                self.docs[doc["_id"]] = dict(doc)
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("reply lost")
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(documents) - len(errors)})
+
+
+@pytest.fixture
+def chunks(monkeypatch):
+    fake = FakeChunks()
+    monkeypatch.setattr(recorder_module, "db", SimpleNamespace(db=fake))
+    monkeypatch.setattr(recorder_module.settings, "TRACK_RECORDING_ENABLED", True)
+    return fake
+
+
+def _record(recorder: TrackRecorder, users: int, fixes: int = 3, offset_ms: int = 0) -> None:
+    for u in range(users):
+        for i in range(fixes):
+            at_ms = T0 + offset_ms + u * 10_000 + i * 1000
+            recorder.record("trip", f"user-{u}", 18.5 + i * 0.001, 73.8, at_ms=at_ms)
+
+
+def test_chunk_times_are_utc_aware_and_round_trip():
+    fixes = [(T0, 18.5, 73.8), (T0 + 1500, 18.51, 73.81)]
+    chunk = build_chunk("trip", "user", fixes, tolerance_m=0)
+
+    assert chunk["start"] == datetime.fromtimestamp(T0 / 1000, tz=timezone.utc)
+    assert chunk["start"].tzinfo is timezone.utc
+    points = decode_chunk(chunk)
+    assert [(p["lat"], p["lng"]) for p in points] == [(18.5, 73.8), (18.51, 73.81)]
+    assert points[1]["timestamp"] == datetime.fromtimestamp((T0 + 1500) / 1000, tz=timezone.utc).isoformat()
+
+
+def test_failed_write_is_retried_after_backoff(chunks):
+    recorder = TrackRecorder()
+    chunks.failures = 1
+    _record(recorder, users=2)
+
+    async def scenario():
+        assert await recorder.flush(everything=True) == 0
+        assert recorder.info["unwritten_chunks"] == 2
+        # Backing off: a regular sweep only retains, it does not hit the database
+        _record(recorder, users=1)
+        recorder._buffers[("trip", "user-0")].opened_at -= recorder_module.settings.TRACK_FLUSH_SECONDS
+        assert await recorder.flush() == 0
+        assert chunks.calls == 1
+        assert recorder.info["unwritten_chunks"] == 3
+        return await recorder.flush(everything=True)
+
+    assert asyncio.run(scenario()) == 3
+    assert len(chunks.docs) == 3
+    assert recorder.info["unwritten_chunks"] == 0
+    assert recorder.info["chunks_written"] == 3
+
+
+def test_retry_of_a_write_that_landed_stores_no_duplicates(chunks):
+    recorder = TrackRecorder()
+    chunks.failures = 1
+    chunks.land_then_fail = True
+    _record(recorder, users=2)
+
+    async def scenario():
+        await recorder.flush(everything=True)
+        return await recorder.flush(everything=True)
+
+    assert asyncio.run(scenario()) == 2
+    assert len(chunks.docs) == 2
+    assert recorder.info["chunks_written"] == 2
+
+
+def test_retained_chunks_are_capped_oldest_first(chunks, monkeypatch):
+    monkeypatch.setattr(recorder_module, "MAX_RETAINED_CHUNKS", 3)
+    recorder = TrackRecorder()
+    chunks.failures = 2
+    _record(recorder, users=2)
+
+    async def scenario():
+        await recorder.flush(everything=True)           # 2 retained
+        _record(recorder, users=3, offset_ms=HOUR_MS)   # an hour later
+        await recorder.flush(everything=True)           # 5 would be retained, cap is 3
+        assert recorder.info["chunks_dropped"] == 2
+        return await recorder.flush(everything=True)
+
+    assert asyncio.run(scenario()) == 3
+    # Only the newer round survived
+    oldest = min(doc["start"] for doc in chunks.docs.values())
+    assert oldest == datetime.fromtimestamp((T0 + HOUR_MS) / 1000, tz=timezone.utc)
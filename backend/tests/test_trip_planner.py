@@ -0,0 +1,100 @@
+"""
+Routing behaviour of TripPlannerService against a fake upstream provider.
+
+Run:
+    cd backend && python -m pytest -q
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.models.trip import Leg, Location
+from app.services import trip_planner
+from app.services.cache import InMemoryCache, LocalCacheBackend
+from app.services.trip_planner import TripPlannerService, _route_cache_key
+
+
+class FakeRouter:
+    """Stands in for `_route_upstream`: leg i is i+1 km long, and `slow` legs never answer in time."""
+
+    def __init__(self, delay: float = 0.05, slow=()):
+        self.delay = delay
+        self.delays = {}
+        self.slow = set(slow)
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def __call__(self, src: Location, dest: Location) -> Leg:
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(60 if src.name in self.slow else self.delays.get(src.name, self.delay))
+        finally:
+            self.active -= 1
+        index = int(src.name[1:])
+        return Leg(distance_km=float(index + 1), estimated_time_mins=10 * (index + 1))
+
+
+def _points(n: int):
+    # One degree apart: every leg gets its own cache key
+    return [Location(name=f"p{i}", lat=10.0 + i, lng=20.0 + i) for i in range(n)]
+
+
+@pytest.fixture
+def router(monkeypatch):
+    fake = FakeRouter()
+    monkeypatch.setattr(TripPlannerService, "_route_upstream", staticmethod(fake))
+    monkeypatch.setattr(trip_planner, "shared_cache", LocalCacheBackend(InMemoryCache()))
+    monkeypatch.setattr(settings, "GEO_CACHE_PERSIST_ENABLED", False)
+    return fake
+
+
+def test_legs_run_concurrently_under_the_semaphore(router):
+    points = _points(9)  # 8 legs, 4 at a time
+
+    result = asyncio.run(TripPlannerService.calculate_trip_itinerary(
+        points[0], points[-1], points[1:-1], avg_daily_dist=0, concurrency=4,
+    ))
+
+    assert router.calls == 8
+    assert router.peak == 4
+    assert len(result["legs"]) == 8
+
+
+def test_leg_order_is_preserved(router):
+    # Later legs answer first; the itinerary must still follow the stops
+    router.delays = {f"p{i}": 0.02 * (5 - i) for i in range(5)}
+    points = _points(6)
+
+    result = asyncio.run(TripPlannerService.calculate_trip_itinerary(
+        points[0], points[-1], points[1:-1], avg_daily_dist=0, concurrency=5,
+    ))
+
+    assert [leg.distance_km for leg in result["legs"]] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert result["total_distance_km"] == 15.0
+
+
+def test_timed_out_leg_is_reported_and_not_cached(router):
+    router.slow = {"p1"}
+    points = _points(4)
+    timeouts_before = TripPlannerService.route_cache_stats()["upstream_timeouts"]
+
+    async def _plan():
+        legs = await asyncio.gather(*(
+            TripPlannerService.calculate_leg(points[i], points[i + 1], timeout=0.2) for i in range(3)
+        ))
+        cached = [await trip_planner.shared_cache.get(_route_cache_key(points[i], points[i + 1])) for i in range(3)]
+        return legs, cached
+
+    legs, cached = asyncio.run(_plan())
+
+    # The slow leg falls back to the straight-line estimate, the others keep the fake's answer
+    assert legs[0].distance_km == 1.0 and legs[2].distance_km == 3.0
+    assert legs[1] == TripPlannerService._haversine_leg(points[1], points[2])
+    assert TripPlannerService.route_cache_stats()["upstream_timeouts"] == timeouts_before + 1
+    assert cached[0] is not None and cached[2] is not None
+    assert cached[1] is None